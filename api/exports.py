@@ -0,0 +1,110 @@
+"""
+Streaming CSV and NDJSON exports of the reconciliation tables. Rows are
+read with values_list().iterator(), which uses a server-side cursor on
+Postgres, and written out as they arrive, so memory use does not grow
+with the size of the export.
+"""
+import csv
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from savings.models import SavingsContribution
+from transaction.models import Transaction
+
+EXPORTS = {
+    'transactions': {
+        'model': Transaction,
+        'fields': [
+            'id', 'created_at', 'completed_at', 'transaction_type', 'account_type',
+            'payment_transaction_status', 'amount_transacted', 'checkout_request_id',
+            'account_reference', 'member_id', 'recipient_phone_number', 'paybill_number',
+        ],
+        'filters': {
+            'account_type': 'account_type',
+            'transaction_type': 'transaction_type',
+            'status': 'payment_transaction_status',
+        },
+    },
+    'contributions': {
+        'model': SavingsContribution,
+        'fields': [
+            'id', 'created_at', 'completed_at', 'member_id', 'saving_id', 'contributed_amount',
+            'pension_amount', 'vsla_amount', 'transaction_id_c2b_id', 'transaction_id_b2b_id',
+        ],
+        'filters': {
+            'account_type': 'transaction_id_c2b__account_type',
+            'member': 'member_id',
+        },
+    },
+}
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _day_start(value, name):
+    day = parse_date(value) if value else None
+    if value and day is None:
+        raise ValueError(f"{name} must be a date in YYYY-MM-DD format.")
+    return timezone.make_aware(datetime.combine(day, time.min)) if day else None
+
+
+def export_queryset(name, date_from=None, date_to=None, **filters):
+    """
+    Rows of export ``name`` as tuples in ``EXPORTS[name]['fields']`` order.
+    ``date_from`` and ``date_to`` are inclusive YYYY-MM-DD dates on
+    created_at; other keyword filters must be listed in the export's
+    ``filters``. Raises ValueError for an unknown filter or a bad date.
+    """
+    export = EXPORTS[name]
+    queryset = export['model'].objects.all()
+    for key, value in filters.items():
+        if key not in export['filters']:
+            raise ValueError(f"{name} cannot be filtered by {key}.")
+        if value:
+            queryset = queryset.filter(**{export['filters'][key]: value})
+
+    start = _day_start(date_from, 'from')
+    end = _day_start(date_to, 'to')
+    if start:
+        queryset = queryset.filter(created_at__gte=start)
+    if end:
+        queryset = queryset.filter(created_at__lt=end + timedelta(days=1))
+
+    return queryset.order_by('pk').values_list(*export['fields']).iterator(
+        chunk_size=settings.EXPORT_CHUNK_SIZE
+    )
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def render_csv(fields, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def render_ndjson(fields, rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(fields, row))) + '\n'
+
+
+RENDERERS = {
+    'csv': render_csv,
+    'ndjson': render_ndjson,
+}
+
+
+def render(name, fmt, rows):
+    return RENDERERS[fmt](EXPORTS[name]['fields'], rows)
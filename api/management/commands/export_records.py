@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import exports
+
+
+class Command(BaseCommand):
+    help = "Stream transactions or savings contributions to CSV or NDJSON for reconciliation."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--format', dest='fmt', choices=sorted(exports.RENDERERS), default='csv')
+        parser.add_argument('--from', dest='date_from', help="First created_at date to include (YYYY-MM-DD).")
+        parser.add_argument('--to', dest='date_to', help="Last created_at date to include (YYYY-MM-DD).")
+        parser.add_argument('--account-type')
+        parser.add_argument('--output', help="File to write to instead of stdout.")
+
+    def handle(self, *args, **options):
+        name = options['name']
+        filters = {'account_type': options['account_type']} if options['account_type'] else {}
+        try:
+            rows = exports.export_queryset(name, options['date_from'], options['date_to'], **filters)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = exports.render(name, options['fmt'], rows)
+        if options['output']:
+            with open(options['output'], 'w', newline='') as out:
+                out.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,16 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (created_at, pk), newest first. Each page is one
+    indexed range scan, so deep pages cost the same as the first; pk breaks
+    ties between rows created in the same instant.
+    """
+    ordering = ('-created_at', '-pk')
+    page_size_query_param = 'page_size'
+
+    @property
+    def max_page_size(self):
+        return settings.API_MAX_PAGE_SIZE
@@ -1,23 +1,31 @@
 from rest_framework import serializers
-from loans.models import LoanAccount, LoanRepayment, Guarantor
+from loans.models import LoanAccount, LoanInstallment, LoanRepayment, Guarantor, GuarantorExposure
 from transaction.models import Transaction
-from savings.models import SavingsAccount, SavingsContribution
+from savings import rollups
+from savings.models import MonthlySavingsRollup, SavingsAccount, SavingsContribution
 from vsla.models import VSLA_Account
 from pension.models import PensionProvider, PensionAccount
 from policy.models import Policy
 from django.contrib.auth import authenticate
 from users.models import User
 import random
-from django.core.cache import cache
+from malipoflex.cache import Namespace
 from rest_framework.validators import UniqueValidator
-from django.core.mail import send_mail
+from notifications.email import queue_email
 from django.utils import timezone
 from datetime import timedelta
 from django.conf import settings
 from pension.models import PensionAccount, PensionProvider
 from decimal import Decimal, InvalidOperation
-from django.db.models import Sum
+from django.db.models import Count, Q, Sum
 from django.utils.timezone import now
+from django.db import transaction as db_transaction
+from transaction import balances
+from loans import eligibility, exposure
+
+# One-time codes must be readable by whichever worker handles the next
+# request, so they live in the shared cache.
+otp_codes = Namespace('otp', timeout=600)
 
 
 class GuarantorSerializer(serializers.ModelSerializer):
@@ -39,10 +47,12 @@ class GuarantorSerializer(serializers.ModelSerializer):
     def validate(self, data):
         user = self.context.get('user')
         loan = data.get('loan')
-        if Guarantor.objects.filter(loan=loan, member=user).exists():
+        existing = Guarantor.objects.filter(loan=loan).aggregate(
+            total=Count('id'), mine=Count('id', filter=Q(member=user))
+        )
+        if existing['mine']:
             raise serializers.ValidationError("This user is already a guarantor for this loan.")
-        count = Guarantor.objects.filter(loan=loan).count()
-        if count >= 2:
+        if existing['total'] >= 2:
             raise serializers.ValidationError("Cannot add more than two guarantors for a loan.")
         return data
 
@@ -50,7 +60,9 @@ class GuarantorSerializer(serializers.ModelSerializer):
         user = self.context.pop('user')
         validated_data.pop('user_identifier')
         validated_data['member'] = user
-        guarantor = super().create(validated_data)
+        with db_transaction.atomic():
+            guarantor = super().create(validated_data)
+            exposure.refresh([user.pk])
         return guarantor
 
     def to_representation(self, instance):
@@ -80,6 +92,11 @@ class GuarantorHistorySerializer(serializers.ModelSerializer):
     def get_guarantor_name(self, obj):
         return f"{obj.member.first_name} {obj.member.last_name}"
 
+class GuarantorExposureSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GuarantorExposure
+        fields = ['member', 'open_amount', 'active_guarantees', 'updated_at']
+
 class LoanRepaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = LoanRepayment
@@ -96,17 +113,18 @@ class LoanRepaymentSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
-        repayment = super().create(validated_data)
-        loan = repayment.loan
-        loan.total_loan_repaid += repayment.loan_amount_repaid
-        loan.save()
-        if loan.outstanding_balance < 0:
-            loan.outstanding_balance = 0
-        if loan.outstanding_balance == 0:
-            loan.loan_status = 'Paid'
-        loan.save()
+        with db_transaction.atomic():
+            repayment = super().create(validated_data)
+            repayment.loan = balances.apply_loan_repayment(repayment.loan_id, repayment.loan_amount_repaid)
         return repayment
 
+class LoanInstallmentSerializer(serializers.ModelSerializer):
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = LoanInstallment
+        fields = ['number', 'due_date', 'principal', 'interest', 'amount']
+
 class LoanAccountSerializer(serializers.ModelSerializer):
     guarantor_id = serializers.ReadOnlyField()
     total_interest = serializers.SerializerMethodField()
@@ -155,17 +173,22 @@ class LoanAccountSerializer(serializers.ModelSerializer):
         ]
 
     def validate(self, data):
-        member = data.get('member')
-        requested_amount = data.get('requested_amount')
-        try:
-            savings = SavingsAccount.objects.get(member=member)
-        except SavingsAccount.DoesNotExist:
-            raise serializers.ValidationError("You must have a savings account to apply for a loan.")
-        max_loan = savings.member_account_balance * 3
-        if requested_amount > max_loan:
-            raise serializers.ValidationError(f"Loan amount cannot exceed 3x your savings balance (KES {max_loan:.2f}).")
+        if self.instance is not None:
+            return data
+        member, requested_amount = data.get('member'), data.get('requested_amount')
+        decision = eligibility.assess(member.pk, requested_amount, self.context.setdefault('eligibility', {}))
+        if not decision.eligible:
+            raise serializers.ValidationError(decision.message)
         return data
 
+    def create(self, validated_data):
+        member, requested_amount = validated_data['member'], validated_data['requested_amount']
+        loan = LoanAccount(**validated_data)
+        # Answered from the snapshot validate() read.
+        loan.eligibility = eligibility.assess(member.pk, requested_amount, self.context.setdefault('eligibility', {}))
+        loan.save()
+        return loan
+
     def get_member_first_name(self, obj):
         return obj.member.first_name
 
@@ -176,11 +199,10 @@ class LoanAccountSerializer(serializers.ModelSerializer):
         return obj.member.phone_number 
 
     def get_total_interest(self, obj):
-        years = Decimal(obj.timeline_months) / Decimal('12')
-        return (obj.requested_amount * obj.interest_rate * years) / Decimal('100')
+        return obj.total_interest if obj.total_interest is not None else obj.calculate_total_interest()
 
     def get_total_repayment(self, obj):
-        return obj.requested_amount + self.get_total_interest(obj)
+        return obj.total_repayment if obj.total_repayment is not None else obj.calculate_total_repayment()
 
 class LoanApplicationSerializer(serializers.Serializer):
     loan = LoanAccountSerializer()
@@ -191,32 +213,16 @@ class LoanApplicationSerializer(serializers.Serializer):
             raise serializers.ValidationError("Exactly two guarantors are required.")
         return value
 
-    def validate_requested_amount(self, value):
-        member_id = self.initial_data.get('member')
-        if member_id:
-            try:
-                member_obj = User.objects.get(pk=member_id)
-                savings = member_obj.savings_account
-                max_allowed = savings.member_account_balance * Decimal("3")
-                if Decimal(value) > max_allowed:
-                    raise serializers.ValidationError(
-                        f"You can only borrow up to 3x your savings (KES {max_allowed:.2f}). "
-                        f"Your current savings: KES {savings.member_account_balance:.2f}"
-                    )
-            except User.DoesNotExist:
-                raise serializers.ValidationError("Member not found.")
-            except SavingsAccount.DoesNotExist:
-                raise serializers.ValidationError("You must have a savings account to apply for a loan.")
-        return value
-
     def create(self, validated_data):
         loan_data = validated_data.pop('loan')
         guarantor_data = validated_data.pop('guarantors')
-        loan_serializer = LoanAccountSerializer(data=loan_data)
-        loan_serializer.is_valid(raise_exception=True)
-        loan = loan_serializer.save(loan_status='DRAFT')
-        for guarantor in guarantor_data:
-            Guarantor.objects.create(loan=loan, **guarantor)
+        # loan_data was validated as the nested loan field, which shares this
+        # serializer's context and so its eligibility snapshot.
+        with db_transaction.atomic():
+            loan = LoanAccountSerializer(context=self.context).create({**loan_data, 'loan_status': 'DRAFT'})
+            for guarantor in guarantor_data:
+                Guarantor.objects.create(loan=loan, **guarantor)
+            exposure.refresh_loan(loan.pk)
         return loan
 
 class UserSerializer(serializers.ModelSerializer):
@@ -275,20 +281,18 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         
         if user.email:
             otp_code = str(random.randint(1000, 9999))
-            cache.set(
-                f"email_otp_{user.id}",
+            otp_codes.set(
+                f"email:{user.id}",
                 {
                     'code': otp_code,
                     'expires_at': timezone.now() + timedelta(minutes=10)
                 },
-                timeout=600
             )
-            send_mail(
+            queue_email(
+                user.email,
                 'Verify Your Email Address',
                 f'Your OTP for email verification is {otp_code}. It is valid for 10 minutes.',
                 settings.EMAIL_HOST_USER,
-                [user.email],
-                fail_silently=False
             )
         return user
 
@@ -331,19 +335,18 @@ class ForgotPasswordSerializer(serializers.Serializer):
         except User.DoesNotExist:
             raise serializers.ValidationError("User with this email does not exist.")
         otp_code = str(random.randint(1000, 9999))
-        cache.set(
-            f"otp_{user.id}",
+        otp_codes.set(
+            f"reset:{user.id}",
             {
                 'code': otp_code,
                 'expires_at': timezone.now() + timedelta(minutes=10)
             },
-            timeout=600
         )
-        send_mail(
+        queue_email(
+            user.email,
             'Your OTP for Password Reset',
             f'Your OTP is {otp_code}. It is valid for 10 minutes.',
             settings.EMAIL_HOST_USER,
-            [user.email]
         )
         return value
 
@@ -362,7 +365,7 @@ class ResetPasswordSerializer(serializers.Serializer):
         user = User.objects.get(email=self.validated_data['email'])
         user.set_password(self.validated_data['new_password'])
         user.save()
-        cache.delete(f'otp_{user.id}')
+        otp_codes.delete(f'reset:{user.id}')
         return user
 
 
@@ -375,7 +378,7 @@ class VerifyOTPSerializer(serializers.Serializer):
         otp_code = data.get('otp_code')
         try:
             user = User.objects.get(email=email)
-            cached_otp = cache.get(f"otp_{user.id}")
+            cached_otp = otp_codes.get(f"reset:{user.id}")
             if not cached_otp or cached_otp['code'] != otp_code:
                 raise serializers.ValidationError("Invalid OTP.")
             if timezone.now() > cached_otp['expires_at']:
@@ -426,25 +429,22 @@ class SavingsAccountSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = fields
 
-    def get_progress_percentage(self, obj):
-       monthly_target = Decimal('1000.0')
-       current_date = now()
-       start_of_month = current_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-
-       monthly_savings = SavingsContribution.objects.filter(
-           member=obj.member,
-           created_at__gte=start_of_month
-       ).aggregate(total=Sum('contributed_amount'))['total'] or Decimal('0.0')
-
-
-       if monthly_target == 0:
-           return 0.0
-
-
-       percentage = (monthly_savings / monthly_target) * Decimal('100')
-       return round(float(percentage), 2)
+    def _monthly_savings(self, obj):
+        # SavingsAccountViewSet annotates monthly_savings from the rollup;
+        # fall back to reading the row for querysets that were not annotated.
+        if getattr(obj, 'monthly_savings', None) is None:
+            rollup = MonthlySavingsRollup.objects.filter(
+                member=obj.member_id, year_month=rollups.year_month()
+            ).values_list('total', flat=True).first()
+            obj.monthly_savings = rollup or Decimal('0.0')
+        return obj.monthly_savings
 
+    def get_progress_percentage(self, obj):
+        monthly_target = Decimal('1000.0')
+        if monthly_target == 0:
+            return 0.0
+        percentage = (Decimal(self._monthly_savings(obj)) / monthly_target) * Decimal('100')
+        return round(float(percentage), 2)
 
     def get_savings_target(self, obj):
         return 1000.00 
@@ -476,26 +476,27 @@ class SavingsAccountSerializer(serializers.ModelSerializer):
     def get_member_national_id(self, obj):
         return obj.member.national_id
 
+    def _pension_account(self, obj):
+        # Prefetched as member.pension_accounts by SavingsAccountViewSet.
+        if not hasattr(obj.member, 'pension_accounts'):
+            obj.member.pension_accounts = list(
+                PensionAccount.objects.filter(member=obj.member_id).select_related('provider')[:1]
+            )
+        return obj.member.pension_accounts[0] if obj.member.pension_accounts else None
+
     def get_pension_percentage(self, obj):
-        try:
-            pension_account = PensionAccount.objects.get(member=obj.member)
-            return pension_account.contribution_percentage
-        except PensionAccount.DoesNotExist:
-            return None
+        pension_account = self._pension_account(obj)
+        return pension_account.contribution_percentage if pension_account else None
 
     def get_pension_provider_name(self, obj):
-        try:
-            pension_account = PensionAccount.objects.get(member=obj.member)
-            return pension_account.provider.name if pension_account.provider else None
-        except PensionAccount.DoesNotExist:
-            return None
+        pension_account = self._pension_account(obj)
+        if pension_account and pension_account.provider:
+            return pension_account.provider.name
+        return None
 
     def get_pension_account_balance(self, obj):
-        try:
-            pension_account = PensionAccount.objects.get(member=obj.member)
-            return pension_account.total_pension_amount
-        except PensionAccount.DoesNotExist:
-            return None
+        pension_account = self._pension_account(obj)
+        return pension_account.total_pension_amount if pension_account else None
 
 
 
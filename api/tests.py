@@ -1,3 +1,226 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import re
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.serializers import otp_codes
+from loans.models import Guarantor, LoanAccount
+from malipoflex.cache import Namespace
+from malipoflex.settings import cache_config
+from notifications.models import OutboundEmail
+from savings.models import SavingsContribution
+from transaction.models import CallbackInbox, Transaction
+
+User = get_user_model()
+
+
+class CursorPaginationTests(TestCase):
+
+    def setUp(self):
+        Transaction.objects.bulk_create([
+            Transaction(transaction_type='C2B', account_type='savings', amount_transacted=Decimal(i + 1))
+            for i in range(7)
+        ])
+        # Several rows in the same instant exercise the pk tie-break.
+        Transaction.objects.filter(amount_transacted__lte=4).update(created_at=timezone.now())
+        self.client = APIClient()
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_pages_cover_every_row_once_newest_first(self):
+        ids = self.walk('/api/transactions/?page_size=3')
+        expected = list(Transaction.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+        self.assertEqual(ids, expected)
+
+    @override_settings(API_MAX_PAGE_SIZE=2)
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/transactions/?page_size=100')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        Transaction.objects.bulk_create([
+            Transaction(transaction_type='C2B', account_type='savings', amount_transacted=Decimal('10.00')),
+            Transaction(transaction_type='B2C', account_type='loan_disbursement', amount_transacted=Decimal('20.00')),
+            Transaction(transaction_type='C2B', account_type='savings', amount_transacted=Decimal('30.00')),
+        ])
+        Transaction.objects.filter(amount_transacted=30).update(created_at=timezone.now() - timedelta(days=10))
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(
+            email='finance@example.com', password='pw', phone_number='+254711000000', is_staff=True,
+        ))
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_filters_by_account_type_and_date(self):
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        response = self.client.get(f'/api/exports/transactions.csv?account_type=savings&from={since}')
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(self.content(response))))
+        self.assertEqual(rows[0][:2], ['id', 'created_at'])
+        self.assertEqual([row[6] for row in rows[1:]], ['10.00'])
+
+    def test_ndjson_export_streams_one_object_per_line(self):
+        response = self.client.get('/api/exports/transactions.ndjson')
+        lines = self.content(response).splitlines()
+        self.assertEqual([json.loads(line)['amount_transacted'] for line in lines], ['10.00', '20.00', '30.00'])
+
+    def test_export_rejects_unknown_filters_and_requires_staff(self):
+        self.assertEqual(self.client.get('/api/exports/transactions.csv?member=1').status_code, 400)
+        self.assertEqual(self.client.get('/api/exports/transactions.csv?from=yesterday').status_code, 400)
+        self.assertEqual(self.client.get('/api/exports/unknown.csv').status_code, 404)
+        self.assertEqual(APIClient().get('/api/exports/transactions.csv').status_code, 401)
+
+    def test_command_writes_export(self):
+        out = io.StringIO()
+        call_command('export_records', 'transactions', '--format', 'ndjson', '--account-type', 'loan_disbursement', stdout=out)
+        self.assertEqual([json.loads(line)['amount_transacted'] for line in out.getvalue().splitlines()], ['20.00'])
+
+
+class QueryPlanTests(TestCase):
+    """
+    The hot filter paths must be served by an index lookup. Walking a whole
+    table, or a whole non-partial index (which the Meta ordering can make
+    the planner prefer), fails the check. Postgres runs with sequential scans
+    disabled so that a plan without a usable index shows up on empty tables.
+    """
+
+    def setUp(self):
+        self.partial_indexes = {
+            index.name for model in apps.get_models() for index in model._meta.indexes if index.condition is not None
+        }
+
+    def full_scans(self, plan):
+        lines = plan.splitlines()
+        if connection.vendor == 'sqlite':
+            for line in lines:
+                match = re.search(r'\bSCAN \w+(?: USING (?:COVERING )?INDEX (\w+))?$', line.strip())
+                if match and match.group(1) not in self.partial_indexes:
+                    yield line
+            return
+        for i, line in enumerate(lines):
+            if 'Seq Scan' in line:
+                yield line
+            match = re.search(r'Index (?:Only )?Scan (?:Backward )?using (\w+)', line)
+            if match and match.group(1) not in self.partial_indexes:
+                node = []
+                for detail in lines[i + 1:]:
+                    if '->' in detail:
+                        break
+                    node.append(detail)
+                if not any('Index Cond' in detail for detail in node):
+                    yield line
+
+    def assert_indexed(self, queryset):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest(f"No plan check for {connection.vendor}")
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertFalse(list(self.full_scans(plan)), plan)
+
+    def test_hot_queries_use_indexes(self):
+        now = timezone.now()
+        hot_queries = {
+            'callback lookup': Transaction.objects.filter(checkout_request_id='ws_CO_1', transaction_type='C2B'),
+            'outbox claim': Transaction.objects.filter(payment_transaction_status='queued').order_by('id')[:50],
+            # expire_stale_dispatches() updates these, so no Meta ordering applies.
+            'stale dispatches': Transaction.objects.filter(
+                payment_transaction_status='dispatching', updated_at__lt=now,
+            ).order_by(),
+            'monthly savings': SavingsContribution.objects.filter(member_id=1, created_at__gte=now)
+                .values('member').annotate(total=Sum('contributed_amount')),
+            'guarantor expiry': Guarantor.objects.filter(status='Pending', created_at__lt=now),
+            'loans by status': LoanAccount.objects.filter(loan_status='PENDING_MANAGER'),
+            'missed installments': LoanAccount.objects.filter(loan_status='DISBURSED', next_due_date__lt=now.date()),
+            'export by date': Transaction.objects.filter(created_at__gte=now),
+            'callback inbox': CallbackInbox.objects.filter(
+                processed_at__isnull=True, next_attempt_at__lte=now, id__gt=0,
+            ).order_by('id')[:100],
+        }
+        for name, queryset in hot_queries.items():
+            with self.subTest(name):
+                self.assert_indexed(queryset)
+
+
+class CacheNamespaceTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_keys_are_namespaced_and_versioned(self):
+        otp, other, next_version = Namespace('otp'), Namespace('other'), Namespace('otp', version=2)
+        otp.set('1', 'a')
+        other.set('1', 'b')
+        self.assertEqual((otp.get('1'), other.get('1'), next_version.get('1')), ('a', 'b', None))
+        otp.clear()
+        self.assertEqual((otp.get('1'), other.get('1')), (None, 'b'))
+
+    def test_get_or_set_computes_once_and_serves_stale_while_refreshing(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        rates = Namespace('rates', timeout=60)
+        self.assertEqual(rates.get_or_set('kes', compute), 1)
+        self.assertEqual(rates.get_or_set('kes', compute), 1)
+        cache.set(rates.key('kes'), (1, 0), 60)
+        rates.add('kes:lock', 1)
+        self.assertEqual(rates.get_or_set('kes', compute), 1)
+        rates.delete('kes:lock')
+        self.assertEqual(rates.get_or_set('kes', compute), 2)
+        self.assertEqual(len(calls), 2)
+
+    def test_cache_url_selects_the_backend(self):
+        self.assertEqual(cache_config('redis://cache:6379/1?timeout=60')['TIMEOUT'], 60)
+        self.assertTrue(cache_config('redis://cache:6379/1')['BACKEND'].endswith('RedisCache'))
+        self.assertEqual(cache_config('file:///var/cache/app')['LOCATION'], '/var/cache/app')
+        self.assertEqual(cache_config('db://')['LOCATION'], 'cache_table')
+        with self.assertRaises(ValueError):
+            cache_config('memcached://cache')
+
+
+class SharedOTPTests(TestCase):
+
+    def test_otp_from_one_worker_verifies_on_another(self):
+        user = User.objects.create_user(email='forgot@example.com', password='pw', phone_number='+254712000000')
+        with tempfile.TemporaryDirectory() as location, override_settings(
+            CACHES={'default': cache_config(f'file://{location}')},
+        ):
+            response = APIClient().post('/api/api/forgotPassword/', {'email': user.email})
+            self.assertEqual(response.status_code, 200)
+            code = re.search(r'\d{4}', OutboundEmail.objects.get().body).group()
+
+            # A fresh backend instance stands in for another worker's cache client.
+            other_worker = caches.create_connection('default')
+            self.assertEqual(other_worker.get(otp_codes.key(f'reset:{user.pk}'))['code'], code)
+            response = APIClient().post('/api/api/verifyCode/', {'email': user.email, 'otp_code': code})
+            self.assertEqual(response.status_code, 200)
@@ -4,7 +4,7 @@ from .views import LoanAccountViewSet, GuarantorViewSet, LoanRepaymentViewSet, L
 from .views import TransactionViewSet 
 from . import views
 from .views import PensionViewSet, PolicyViewSet,PensionAccountViewSet,  GuarantorHistoryViewSet 
-from .views import RegisterView, LoginView, ProfileView, UserViewSet, ForgotPasswordView, VerifyOTPView, ResetPasswordView
+from .views import RegisterView, LoginView, LogoutView, ProfileView, UserViewSet, ForgotPasswordView, VerifyOTPView, ResetPasswordView
 from rest_framework.authtoken.views import obtain_auth_token
 
 
@@ -35,12 +35,14 @@ urlpatterns = [
     path('', include(router.urls)),  
     path('api/register/', RegisterView.as_view(), name='register'),
     path('api/login/', LoginView.as_view(), name='login'),
+    path('api/logout/', LogoutView.as_view(), name='logout'),
     path('api/profile/', ProfileView.as_view(), name='profile'),
     path('api/forgotPassword/', ForgotPasswordView.as_view(), name='forgot-password'),
     path('api/verifyCode/', VerifyOTPView.as_view(), name='verify-code'),
     path('api/resetPassword/', ResetPasswordView.as_view(), name='reset-password'),    
     path('api/resetPassword/', ResetPasswordView.as_view(), name='reset-password'),
     path('api/expireGuarantors/', views.expire_guarantors_manual, name='expire_guarantors'), 
+    path('exports/<str:name>.<str:fmt>', views.ExportView.as_view(), name='export'),
 ]
 
 
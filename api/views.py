@@ -1,13 +1,23 @@
+import logging
+import time
 from django.shortcuts import render
 from rest_framework import viewsets
-from loans.models import LoanAccount, Guarantor, LoanRepayment
-from .serializers import LoanAccountSerializer, GuarantorSerializer, LoanRepaymentSerializer
+from loans.models import LoanAccount, Guarantor, GuarantorExposure, LoanRepayment
+from .serializers import LoanAccountSerializer, GuarantorSerializer, LoanRepaymentSerializer, LoanInstallmentSerializer
+from loans.amortization import generate_schedule
+from loans import eligibility, exposure
+from loans.expiry import expire_guarantors
+from notifications.outbox import enqueue
+from django.db import transaction as db_transaction
 from rest_framework.permissions import IsAuthenticated
 from transaction.models import Transaction 
 from .serializers import TransactionSerializer 
 from users.models import Member
 from savings.models import SavingsAccount
 from savings.models import SavingsContribution
+from savings.interest import queue_accrual
+from savings import rollups
+from savings.models import MonthlySavingsRollup
 from vsla.models import VSLA_Account
 from .serializers import (
     SavingsAccountSerializer,
@@ -15,6 +25,7 @@ from .serializers import (
     VSLAAccountSerializer,
     PensionAccountSerializer,
     GuarantorHistorySerializer,
+    GuarantorExposureSerializer,
 )
 
 from rest_framework.views import APIView
@@ -26,26 +37,52 @@ from rest_framework.response import Response
 from .serializers import PensionSerializer, PolicySerializer
 from pension.models import PensionProvider, PensionAccount
 from policy.models import Policy
-from rest_framework.authtoken.models import Token
+from users.authentication import expires_at, issue_token, revoke_token
+from users.throttling import LoginIPThrottle, LoginPhoneThrottle
 from django_filters.rest_framework import DjangoFilterBackend
 from users.models import User
 from .serializers import UserRegisterSerializer, UserLoginSerializer, UserProfileSerializer,ForgotPasswordSerializer,ResetPasswordSerializer,VerifyOTPSerializer
 from .serializers import UserSerializer
 from rest_framework.decorators import action, api_view
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, timedelta
 from rest_framework.decorators import action
 from .serializers import GuarantorSerializer
+from decimal import Decimal, InvalidOperation
+from django.db.models import DecimalField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.http import Http404, StreamingHttpResponse
+from . import exports
 
+login_logger = logging.getLogger('users.login')
 
 
-
+def loan_account_queryset():
+    # Everything LoanAccountSerializer reads, including the nested
+    # guarantors and repayments, in a fixed number of queries.
+    return LoanAccount.objects.select_related('member').prefetch_related(
+        Prefetch('guarantors', queryset=Guarantor.objects.select_related('member').order_by('pk')),
+        Prefetch('repayments', queryset=LoanRepayment.objects.order_by('pk')),
+    )
 
 
 class LoanAccountViewSet(viewsets.ModelViewSet):
-    queryset = LoanAccount.objects.all()
+    queryset = loan_account_queryset()
     serializer_class = LoanAccountSerializer
 
+    def perform_update(self, serializer):
+        # The status or amount may change what the loan's guarantors owe.
+        with db_transaction.atomic():
+            loan = serializer.save()
+            exposure.refresh_loan(loan.pk)
+
+    def perform_destroy(self, instance):
+        # Deleting the loan deletes its guarantors, so collect them first.
+        with db_transaction.atomic():
+            member_ids = list(instance.guarantors.values_list('member_id', flat=True))
+            instance.delete()
+            exposure.refresh(member_ids)
+
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         loan = self.get_object()
@@ -67,7 +104,15 @@ class LoanAccountViewSet(viewsets.ModelViewSet):
             return Response({"error": "Action must be 'approve' or 'reject'"}, status=400)
 
         loan.approved_at = timezone.now()
-        loan.save()
+        kind = f"loan_{loan.loan_status.lower()}"
+        with db_transaction.atomic():
+            loan.save()
+            if loan.loan_status == 'APPROVED':
+                generate_schedule(loan)
+            else:
+                exposure.refresh_loan(loan.pk)
+            # Pushed by the send_push worker, so the response never waits on FCM.
+            enqueue(loan.member_id, kind, notification, dedupe_key=f"{kind}:{loan.pk}")
 
         return Response({
             "message": f"Loan {action}ed successfully.",
@@ -75,6 +120,23 @@ class LoanAccountViewSet(viewsets.ModelViewSet):
             "status": loan.loan_status
         })
 
+    @action(detail=True, methods=['get'])
+    def schedule(self, request, pk=None):
+        loan = self.get_object()
+        return Response(LoanInstallmentSerializer(loan.installments.all(), many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def eligibility(self, request):
+        member_id = request.query_params.get('member_id')
+        amount = request.query_params.get('amount')
+        try:
+            decision = eligibility.assess(int(member_id), Decimal(amount))
+        except (TypeError, ValueError, InvalidOperation):
+            return Response({"error": "member_id and a numeric amount are required."}, status=400)
+        except User.DoesNotExist:
+            return Response({"error": "Member not found."}, status=404)
+        return Response(decision.as_dict())
+
 
 class GuarantorViewSet(viewsets.ModelViewSet):
     queryset = Guarantor.objects.all()
@@ -82,20 +144,32 @@ class GuarantorViewSet(viewsets.ModelViewSet):
 
     def create(self, request, *args, **kwargs):
         response = super().create(request, *args, **kwargs)
-        
-        guarantor_id = response.data.get('guarantor_id')
-        if not guarantor_id:
-            return response  
+        response.data['notification'] = self.notification
+        return response
 
-        guarantor = self.get_queryset().get(pk=guarantor_id)
+    def perform_create(self, serializer):
+        with db_transaction.atomic():
+            guarantor = serializer.save()
+            loan = guarantor.loan
+            self.notification = (
+                f"You’ve been requested to guarantee a loan of KES {loan.requested_amount:,.2f} "
+                f"for {loan.member.first_name}. Please respond in the app."
+            )
+            enqueue(
+                guarantor.member_id, 'guarantor_request', self.notification,
+                dedupe_key=f"guarantor_request:{guarantor.pk}",
+            )
 
-        notification_msg = (
-            f"You’ve been requested to guarantee a loan of KES {guarantor.loan.requested_amount:,.2f} "
-            f"for {guarantor.loan.member.first_name}. Please respond in the app."
-        )
-        
-        response.data['notification'] = notification_msg
-        return response
+    def perform_update(self, serializer):
+        previous_member_id = serializer.instance.member_id
+        with db_transaction.atomic():
+            guarantor = serializer.save()
+            exposure.refresh([previous_member_id, guarantor.member_id])
+
+    def perform_destroy(self, instance):
+        with db_transaction.atomic():
+            instance.delete()
+            exposure.refresh([instance.member_id])
 
     @action(detail=True, methods=['post'])
     def respond(self, request, pk=None):
@@ -113,18 +187,23 @@ class GuarantorViewSet(viewsets.ModelViewSet):
         else:
             guarantor.status = 'Rejected'
         guarantor.responded_at = timezone.now()
-        guarantor.save()
-
-        if action == 'approve':
-            loan = guarantor.loan
-            loan.loan_status = 'PENDING_MANAGER'
-            loan.save()
 
         if action == 'reject':
             msg = f"Your guarantor {guarantor.guarantor_name} rejected your loan. Add a new one."
         else:
             msg = f"{guarantor.guarantor_name} approved your loan. Waiting for manager."
 
+        kind = f"guarantor_{guarantor.status.lower()}"
+        with db_transaction.atomic():
+            guarantor.save()
+
+            loan = guarantor.loan
+            if action == 'approve':
+                loan.loan_status = 'PENDING_MANAGER'
+                loan.save()
+            exposure.refresh([guarantor.member_id])
+            enqueue(loan.member_id, kind, msg, dedupe_key=f"{kind}:{guarantor.pk}")
+
         return Response({
             "message": f"Guarantor request {action}ed.",
             "notification": msg,
@@ -154,19 +233,17 @@ class GuarantorViewSet(viewsets.ModelViewSet):
 
 
 @api_view(['POST'])
-def expire_guarantors_manual(GenericAPIView):
-    
-    expired_count = Guarantor.objects.filter(
-        status='Pending',
-        created_at__lt=timezone.now() - timedelta(hours=24)
-    ).update(
-        status='Expired',
-        updated_at=timezone.now()
-    )
+def expire_guarantors_manual(request):
+    # The expire_guarantors command does this on a schedule; this endpoint
+    # runs one sweep on demand.
+    counts = expire_guarantors()
+    if counts is None:
+        return Response({"error": "Guarantor expiry is already running."}, status=status.HTTP_409_CONFLICT)
 
     return Response({
-        "message": f"Successfully expired {expired_count} guarantor request(s).",
-        "status": "success"
+        "message": f"Successfully expired {counts['expired']} guarantor request(s).",
+        "status": "success",
+        "loans_affected": counts['loans'],
     })
 
 
@@ -182,11 +259,19 @@ class GuarantorHistoryViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.filter(member__id=member_id)
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def exposure(self, request):
+        member_id = request.query_params.get('member_id')
+        if not member_id:
+            return Response({"error": "member_id is required."}, status=400)
+        row = GuarantorExposure.objects.filter(member_id=member_id).first() or GuarantorExposure(member_id=member_id)
+        return Response(GuarantorExposureSerializer(row).data)
+
 
 
 class LoanApplicationViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
-    queryset = LoanAccount.objects.all()
+    queryset = loan_account_queryset()
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -222,14 +307,24 @@ class RegisterView(generics.CreateAPIView):
 
 class LoginView(generics.GenericAPIView):
     serializer_class = UserLoginSerializer
+    # A client holding an expired token must still be able to log in.
+    authentication_classes = []
+    throttle_classes = [LoginIPThrottle, LoginPhoneThrottle]
+
     def post(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        started, outcome = time.perf_counter(), "failed"
+        try:
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            outcome = "succeeded"
+        finally:
+            login_logger.info("Login %s in %.1fms", outcome, (time.perf_counter() - started) * 1000)
         user = serializer.validated_data["user"]
 
-        token, _ = Token.objects.get_or_create(user=user)
+        token = issue_token(user)
         return Response({
             "token": str(token.key),
+            "expires_at": expires_at(token),
             "user": {
                 "user_id": str(user.id),  
                 "first_name": user.first_name,
@@ -239,6 +334,13 @@ class LoginView(generics.GenericAPIView):
             }
         })
 
+class LogoutView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        revoke_token(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class ProfileView(generics.RetrieveAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
@@ -273,7 +375,8 @@ class VerifyOTPView(generics.GenericAPIView):
         return Response({"message": "OTP verified successfully"}, status=status.HTTP_200_OK)
         # return Response({"message": "OTP verified successfully"}, status=status.HTTP_200_OK)
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
+    # Payments are created by the views that queue them for dispatch only.
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
    
@@ -282,28 +385,45 @@ class SavingsAccountViewSet(viewsets.ModelViewSet):
     serializer_class = SavingsAccountSerializer
     lookup_field = "id"
 
+    def get_queryset(self):
+        monthly_savings = MonthlySavingsRollup.objects.filter(
+            member=OuterRef('member'),
+            year_month=rollups.year_month(),
+        ).values('total')[:1]
+        return super().get_queryset().annotate(
+            monthly_savings=Coalesce(Subquery(monthly_savings), Value(Decimal('0.00')), output_field=DecimalField()),
+        ).prefetch_related(
+            Prefetch(
+                'member__pensionaccount_set',
+                queryset=PensionAccount.objects.select_related('provider').order_by('pk'),
+                to_attr='pension_accounts',
+            )
+        )
+
 
     @action(detail=False, methods=['post'])
     def apply_interest(self, request):
-        
-        accounts = self.get_queryset()
-        results = []
-
-        for account in accounts:
-            interest = (account.member_account_balance * 2.50) / 100  
-            account.member_account_balance += interest
-            account.interest_incurred += interest
-            account.save()
-
-            results.append({
-                "member": account.member.first_name,
-                "interest_applied": float(interest),
-                "new_balance": float(account.member_account_balance)
-            })
+        accrual_date = request.data.get('accrual_date')
+        try:
+            accrual_date = date.fromisoformat(accrual_date) if accrual_date else timezone.localdate()
+        except (TypeError, ValueError):
+            return Response({"error": "accrual_date must be YYYY-MM-DD"}, status=400)
+
+        # Capitalising touches every account, so the request only queues the
+        # run; `accrue_interest --pending` applies it.
+        run, queued = queue_accrual(accrual_date, period='annual')
+        if run.completed_at is None:
+            return Response({
+                "message": "Annual interest has been queued." if queued else "Annual interest is already queued.",
+                "accrual_date": run.accrual_date,
+                "accounts_processed": run.accounts_processed,
+            }, status=status.HTTP_202_ACCEPTED)
 
         return Response({
-            "message": "Annual interest applied successfully.",
-            "results": results
+            "message": "Annual interest was already applied for this year.",
+            "accrual_date": run.accrual_date,
+            "accounts_processed": run.accounts_processed,
+            "total_interest": run.total_interest,
         })
 
 
@@ -343,3 +463,20 @@ class PensionAccountViewSet(viewsets.ModelViewSet):
             return PensionAccount.objects.none() 
 
    
+
+
+class ExportView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, name, fmt):
+        if name not in exports.EXPORTS or fmt not in exports.RENDERERS:
+            raise Http404
+        params = request.query_params
+        filters = {key: params[key] for key in params if key not in ('from', 'to')}
+        try:
+            rows = exports.export_queryset(name, params.get('from'), params.get('to'), **filters)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(exports.render(name, fmt, rows), content_type=exports.CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+        return response
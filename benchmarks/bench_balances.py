@@ -0,0 +1,84 @@
+"""
+Concurrency stress test for balance updates. Several threads credit the
+same savings account at once, first with the old read-modify-write
+pattern and then through transaction.balances. Reports lost updates and
+throughput for each; exits non-zero if the service loses an update.
+
+    python -m benchmarks.bench_balances [threads] [credits_per_thread]
+"""
+import sys
+import threading
+import time
+from decimal import Decimal
+
+from benchmarks.support import setup_django
+
+
+def run(threads, per_thread, credit):
+    from django.db import OperationalError, connection
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(per_thread):
+                for attempt in range(50):
+                    try:
+                        credit()
+                        break
+                    except OperationalError:
+                        # SQLite reports write contention as "database is locked".
+                        time.sleep(0.001 * (attempt + 1))
+                else:
+                    errors.append('gave up')
+        finally:
+            connection.close()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return time.perf_counter() - start, errors
+
+
+def main(threads=8, per_thread=200):
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from savings.models import SavingsAccount
+    from transaction import balances
+
+    amount = Decimal('1.00')
+    expected = amount * threads * per_thread
+    ok = True
+
+    def legacy(saving_id):
+        def credit():
+            saving = SavingsAccount.objects.get(pk=saving_id)
+            saving.member_account_balance += amount
+            saving.save()
+        return credit
+
+    def service(saving_id):
+        return lambda: balances.credit_savings(saving_id, amount)
+
+    for index, (name, make_credit) in enumerate((('read-modify-write', legacy), ('balances.credit_savings', service))):
+        member = get_user_model().objects.create_user(
+            email=f'bench{index}@example.com', password='bench', phone_number=f'+2547999000{index}'
+        )
+        saving = SavingsAccount.objects.create(member=member, member_account_balance=Decimal('0.00'))
+        elapsed, errors = run(threads, per_thread, make_credit(saving.pk))
+        saving.refresh_from_db()
+        lost = (expected - saving.member_account_balance) / amount
+        print(
+            f"{name:<26} threads={threads} credits={threads * per_thread} "
+            f"lost={int(lost):<5} {threads * per_thread / elapsed:8.0f} credits/s"
+            + (f" gave_up={len(errors)}" if errors else "")
+        )
+        if name != 'read-modify-write':
+            ok = ok and lost == 0 and not errors
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:])))
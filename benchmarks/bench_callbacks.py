@@ -0,0 +1,61 @@
+"""
+Latency of the Daraja callback endpoints in deferred (fast-ack) mode,
+checked against DARAJA_CALLBACK_P99_BUDGET_MS, with the inline mode for
+comparison. Exits non-zero when a deferred endpoint misses its budget.
+
+    python -m benchmarks.bench_callbacks [iterations]
+"""
+import json
+import sys
+from decimal import Decimal
+
+from benchmarks.support import report, setup_django, time_calls
+
+
+def main(iterations=500):
+    setup_django()
+    from django.conf import settings
+    from django.test import Client, override_settings
+    from transaction.inbox import drain
+    from transaction.models import Transaction
+
+    client = Client()
+    endpoints = {
+        'stk': ('/daraja/callback/', 'C2B', 'savings',
+                lambda ref: {'Body': {'stkCallback': {'CheckoutRequestID': ref, 'ResultCode': 0}}}),
+        'b2c': ('/daraja/b2c-callback/', 'B2C', 'loan_disbursement',
+                lambda ref: {'Result': {'ConversationID': ref, 'ResultCode': 0}}),
+        'b2b': ('/daraja/b2b-callback/', 'B2B', 'pension_contribution',
+                lambda ref: {'Result': {'ConversationID': ref, 'ResultCode': 0}}),
+    }
+    budget = settings.DARAJA_CALLBACK_P99_BUDGET_MS
+    ok = True
+
+    for mode in ('inline', 'deferred'):
+        with override_settings(DARAJA_CALLBACK_MODE=mode):
+            for name, (url, transaction_type, account_type, payload) in endpoints.items():
+                Transaction.objects.bulk_create([
+                    Transaction(
+                        transaction_type=transaction_type, account_type=account_type,
+                        amount_transacted=Decimal('100.00'), payment_transaction_status='processing',
+                        checkout_request_id=f'{mode}-{name}-{i}',
+                    )
+                    for i in range(iterations)
+                ])
+
+                def post(i):
+                    body = json.dumps(payload(f'{mode}-{name}-{i}'))
+                    client.post(url, body, content_type='application/json')
+
+                samples = time_calls(post, iterations)
+                within = report(f'{mode} {name} callback', samples, budget if mode == 'deferred' else None)
+                if mode == 'deferred':
+                    ok = ok and within
+
+    processed, totals = drain()
+    print(f"process_callbacks applied {processed} queued callbacks: {totals}")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:])))
@@ -0,0 +1,41 @@
+"""
+Peak Python memory of a streamed transaction export as the table grows.
+The peak should stay flat: rows are fetched in EXPORT_CHUNK_SIZE chunks and
+written out as they arrive.
+
+    python -m benchmarks.bench_exports [largest]
+"""
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+from benchmarks.support import setup_django
+
+
+def main(largest=100000):
+    setup_django()
+    from api import exports
+    from transaction.models import Transaction
+
+    total = 0
+    # Each size adds rows on top of the last, so they must be distinct and rising.
+    for size in sorted({min(1000, largest), largest // 10, largest} - {0}):
+        Transaction.objects.bulk_create([
+            Transaction(transaction_type='C2B', account_type='savings', amount_transacted=Decimal('100.00'))
+            for _ in range(size - total)
+        ], batch_size=5000)
+        total = size
+        for fmt in sorted(exports.RENDERERS):
+            tracemalloc.start()
+            start = time.perf_counter()
+            written = sum(len(chunk) for chunk in exports.render('transactions', fmt, exports.export_queryset('transactions')))
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{fmt:<7} rows={size:<8} bytes={written:<11} peak={peak / 1024:8.0f}KiB time={elapsed:6.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:])))
@@ -0,0 +1,60 @@
+"""
+Throughput and query count of loan applications through
+LoanAccountSerializer, which checks eligibility against one savings
+snapshot per request, as members' open loans grow.
+
+    python -m benchmarks.bench_loan_application [members] [iterations]
+"""
+import sys
+from decimal import Decimal
+
+from benchmarks.support import report, setup_django, time_calls
+
+
+def seed(members, open_loans):
+    from django.contrib.auth.hashers import make_password
+    from loans.models import LoanAccount
+    from savings.models import SavingsAccount
+    from users.models import User
+
+    LoanAccount.objects.all().delete()
+    User.objects.all().delete()
+    password = make_password(None)
+    users = User.objects.bulk_create([
+        User(email=f'bench{i}@example.com', phone_number=f'+2547{i:08d}', password=password)
+        for i in range(members)
+    ])
+    SavingsAccount.objects.bulk_create([
+        SavingsAccount(member=member, member_account_balance=Decimal('100000.00')) for member in users
+    ])
+    LoanAccount.objects.bulk_create([
+        LoanAccount(member=member, requested_amount=Decimal('500.00'), timeline_months=6, loan_status='DISBURSED')
+        for member in users for _ in range(open_loans)
+    ])
+    return [member.pk for member in users]
+
+
+def main(members=50, iterations=200):
+    setup_django()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from api.serializers import LoanAccountSerializer
+
+    def apply(member_id):
+        serializer = LoanAccountSerializer(data={
+            'member': member_id, 'requested_amount': '1000.00', 'timeline_months': 6,
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    for open_loans in (0, 5, 50):
+        member_ids = seed(members, open_loans)
+        with CaptureQueriesContext(connection) as queries:
+            apply(member_ids[0])
+        samples = time_calls(lambda i: apply(member_ids[i % members]), iterations)
+        report(f'apply open_loans={open_loans} queries={len(queries)}', samples)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:])))
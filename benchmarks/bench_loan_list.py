@@ -0,0 +1,60 @@
+"""
+Latency and query count of the loan list, serialized from the bare
+LoanAccount queryset and from the joined and prefetched one the viewsets
+use, as guarantors and repayments per loan grow.
+
+    python -m benchmarks.bench_loan_list [loans] [iterations]
+"""
+import sys
+from decimal import Decimal
+
+from benchmarks.support import report, setup_django, time_calls
+
+
+def seed(loans, guarantors, repayments):
+    from django.contrib.auth.hashers import make_password
+    from loans.models import Guarantor, LoanAccount, LoanRepayment
+    from users.models import User
+
+    LoanAccount.objects.all().delete()
+    User.objects.all().delete()
+    password = make_password(None)
+    users = User.objects.bulk_create([
+        User(email=f'bench{i}@example.com', phone_number=f'+2547{i:08d}', password=password)
+        for i in range(loans * (1 + guarantors))
+    ])
+    borrowers, others = users[:loans], users[loans:]
+    accounts = LoanAccount.objects.bulk_create([
+        LoanAccount(member=member, requested_amount=Decimal('3000.00'), timeline_months=6) for member in borrowers
+    ])
+    Guarantor.objects.bulk_create([
+        Guarantor(loan=loan, member=others[i * guarantors + j], guarantor_name='bench', guarantor_phone_number='0')
+        for i, loan in enumerate(accounts) for j in range(guarantors)
+    ])
+    LoanRepayment.objects.bulk_create([
+        LoanRepayment(loan=loan, loan_amount_repaid=Decimal('100.00'))
+        for loan in accounts for _ in range(repayments)
+    ])
+
+
+def main(loans=100, iterations=20):
+    setup_django()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from api.serializers import LoanAccountSerializer
+    from api.views import loan_account_queryset
+    from loans.models import LoanAccount
+
+    querysets = {'bare': LoanAccount.objects.all, 'prefetched': loan_account_queryset}
+    for guarantors, repayments in ((1, 0), (2, 5), (2, 20)):
+        seed(loans, guarantors, repayments)
+        for name, queryset in querysets.items():
+            with CaptureQueriesContext(connection) as queries:
+                LoanAccountSerializer(queryset(), many=True).data
+            samples = time_calls(lambda i: LoanAccountSerializer(queryset(), many=True).data, iterations)
+            report(f'{name} g={guarantors} r={repayments} queries={len(queries)}', samples)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:])))
@@ -0,0 +1,58 @@
+"""
+Login latency under a burst: ``workers`` threads log distinct members in at
+once through the login endpoint, for each PBKDF2 iteration count given.
+Each login comes from its own address so the rate limits do not interfere.
+
+    python -m benchmarks.bench_login [logins] [workers] [iterations ...]
+"""
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.support import report, setup_django
+
+
+def seed(logins):
+    from django.contrib.auth.hashers import make_password
+    from users.models import User
+
+    User.objects.all().delete()
+    password = make_password('bench-pass')
+    User.objects.bulk_create([
+        User(email=f'bench{i}@example.com', phone_number=f'+2547{i:08d}', password=password, user_type='member')
+        for i in range(logins)
+    ])
+
+
+def main(logins=200, workers=8, *iteration_counts):
+    setup_django()
+    import time
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+
+    if connection.vendor == 'sqlite':
+        # Let concurrent token writes wait for the file lock instead of failing.
+        connection.settings_dict.setdefault('OPTIONS', {}).update(timeout=30, transaction_mode='IMMEDIATE')
+
+    def login(i):
+        started = time.perf_counter()
+        response = APIClient().post('/api/api/login/', {
+            'phone_number': f'+2547{i:08d}', 'password': 'bench-pass',
+        }, REMOTE_ADDR=f'10.0.{i // 250}.{i % 250}')
+        assert response.status_code == 200, response.status_code
+        connection.close()
+        return (time.perf_counter() - started) * 1000
+
+    for iterations in iteration_counts or (1_000_000, 260_000, 100_000):
+        with override_settings(PASSWORD_HASH_ITERATIONS=iterations):
+            seed(logins)
+            cache.clear()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                samples = list(pool.map(login, range(logins)))
+            report(f'login iterations={iterations} workers={workers}', samples)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:])))
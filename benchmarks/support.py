@@ -0,0 +1,63 @@
+"""
+Helpers shared by the benchmark scripts. Run a benchmark from the project
+root with ``python -m benchmarks.<name>``. Each run migrates a throwaway
+SQLite file unless BENCH_DATABASE_URL points somewhere else; the
+DATABASE_URL of the environment is never used.
+"""
+import atexit
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    database_url = os.environ.get('BENCH_DATABASE_URL')
+    if not database_url:
+        fd, path = tempfile.mkstemp(prefix='malipoflex-bench-', suffix='.sqlite3')
+        os.close(fd)
+        atexit.register(os.remove, path)
+        database_url = f'sqlite:///{path}'
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'malipoflex.settings')
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def time_calls(fn, iterations):
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name, samples, budget_ms=None):
+    p50, p95, p99 = (percentile(samples, p) for p in (50, 95, 99))
+    line = f"{name:<40} n={len(samples):<6} p50={p50:7.2f}ms p95={p95:7.2f}ms p99={p99:7.2f}ms"
+    within = True
+    if budget_ms is not None:
+        within = p99 <= budget_ms
+        line += f"  budget={budget_ms:.0f}ms {'OK' if within else 'OVER'}"
+    print(line)
+    return within
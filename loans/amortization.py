@@ -0,0 +1,113 @@
+"""
+Installment schedules for approved loans. Interest is the flat rate used by
+LoanAccount.calculate_total_interest(), spread evenly with the principal
+over daily, weekly or monthly installments that end timeline_months after
+approval; the last installment absorbs rounding.
+"""
+import math
+from datetime import timedelta
+from decimal import ROUND_DOWN, Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import LoanAccount, LoanInstallment
+
+CENT = Decimal('0.01')
+# Loans in these states are repaying and always carry a schedule.
+SCHEDULED_STATUSES = ('APPROVED', 'DISBURSED', 'OVERDUE')
+
+
+def due_dates(start, timeline_months, frequency):
+    end = start + relativedelta(months=timeline_months)
+    if frequency == 'monthly':
+        return [start + relativedelta(months=i) for i in range(1, timeline_months + 1)]
+    step = timedelta(weeks=1) if frequency == 'weekly' else timedelta(days=1)
+    count = max(1, math.ceil((end - start) / step))
+    return [min(start + step * i, end) for i in range(1, count + 1)]
+
+
+def build_schedule(loan):
+    """Unsaved LoanInstallment rows for ``loan``, without touching the database."""
+    approved = timezone.localtime(loan.approved_at).date() if loan.approved_at else timezone.localdate()
+    dates = due_dates(approved, loan.timeline_months, loan.frequency_of_payment)
+    principal, interest = Decimal(loan.requested_amount), loan.calculate_total_interest()
+    count = len(dates)
+    principal_each = (principal / count).quantize(CENT, rounding=ROUND_DOWN)
+    interest_each = (interest / count).quantize(CENT, rounding=ROUND_DOWN)
+
+    installments = [
+        LoanInstallment(loan=loan, number=number, due_date=due, principal=principal_each, interest=interest_each)
+        for number, due in enumerate(dates, start=1)
+    ]
+    last = installments[-1]
+    last.principal = principal - principal_each * (count - 1)
+    last.interest = interest - interest_each * (count - 1)
+    return installments
+
+
+def next_due_date(loan, installments=None):
+    """Due date of the first installment that total_loan_repaid does not cover, or None."""
+    if installments is None:
+        installments = loan.installments.order_by('number')
+    paid, covered = Decimal(loan.total_loan_repaid), Decimal('0.00')
+    for installment in installments:
+        covered += installment.amount
+        if covered > paid:
+            return installment.due_date
+    return None
+
+
+def generate_schedule(loan):
+    """Replace the loan's schedule and store its totals and regular installment amount."""
+    installments = build_schedule(loan)
+    with transaction.atomic():
+        LoanInstallment.objects.filter(loan=loan).delete()
+        LoanInstallment.objects.bulk_create(installments)
+        loan.payment_amount = installments[0].amount
+        loan.total_interest = loan.calculate_total_interest()
+        loan.total_repayment = loan.calculate_total_repayment()
+        loan.next_due_date = next_due_date(loan, installments)
+        LoanAccount.objects.filter(pk=loan.pk).update(
+            payment_amount=loan.payment_amount,
+            total_interest=loan.total_interest,
+            total_repayment=loan.total_repayment,
+            next_due_date=loan.next_due_date,
+        )
+    return installments
+
+
+def recompute(queryset=None, chunk_size=None):
+    """
+    Recompute stored totals, and schedules for loans that have one or are
+    being repaid, for every loan in ``queryset`` after a rate change. Loans are handled in chunks: one
+    bulk update of the totals and one delete and bulk insert of installments
+    per chunk. Returns the number of loans recomputed.
+    """
+    queryset = LoanAccount.objects.all() if queryset is None else queryset
+    chunk_size = chunk_size or settings.LOAN_RECOMPUTE_CHUNK_SIZE
+    recomputed, last_pk = 0, 0
+    while True:
+        loans = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:chunk_size])
+        if not loans:
+            return recomputed
+        scheduled = set(LoanInstallment.objects.filter(loan__in=loans).values_list('loan_id', flat=True))
+        installments = []
+        for loan in loans:
+            loan.total_interest = loan.calculate_total_interest()
+            loan.total_repayment = loan.calculate_total_repayment()
+            if loan.pk in scheduled or loan.loan_status in SCHEDULED_STATUSES:
+                schedule = build_schedule(loan)
+                loan.payment_amount = schedule[0].amount
+                loan.next_due_date = next_due_date(loan, schedule)
+                installments.extend(schedule)
+        with transaction.atomic():
+            LoanAccount.objects.bulk_update(
+                loans, ['total_interest', 'total_repayment', 'payment_amount', 'next_due_date']
+            )
+            LoanInstallment.objects.filter(loan__in=scheduled).delete()
+            LoanInstallment.objects.bulk_create(installments)
+        recomputed += len(loans)
+        last_pk = loans[-1].pk
@@ -0,0 +1,60 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import DelinquencyScan, LoanAccount
+
+logger = logging.getLogger(__name__)
+
+
+def scan(as_of=None, grace_days=None, chunk_size=None):
+    """
+    Mark disbursed loans whose next installment is more than ``grace_days``
+    past due as OVERDUE, and return OVERDUE loans that have caught up to
+    DISBURSED. Both are range scans over (loan_status, next_due_date): loans
+    already marked OVERDUE are not read again, so a run only touches loans
+    whose next due date passed since the previous cutoff, plus any that
+    were disbursed after their first due date.
+    """
+    as_of = as_of or timezone.localdate()
+    grace_days = settings.LOAN_OVERDUE_GRACE_DAYS if grace_days is None else grace_days
+    chunk_size = chunk_size or settings.LOAN_DELINQUENCY_CHUNK_SIZE
+    cutoff = as_of - timedelta(days=grace_days)
+    previous = DelinquencyScan.objects.filter(completed_at__isnull=False).order_by('-pk').first()
+    run = DelinquencyScan.objects.create(window_start=previous.window_end if previous else None, window_end=cutoff)
+
+    missed = LoanAccount.objects.filter(loan_status='DISBURSED', next_due_date__lt=cutoff)
+    caught_up = LoanAccount.objects.filter(
+        Q(next_due_date__gte=cutoff) | Q(next_due_date__isnull=True), loan_status='OVERDUE',
+    )
+    overdue_ids = list(missed.values_list('pk', flat=True))
+    cured_ids = list(caught_up.values_list('pk', flat=True))
+
+    now = timezone.now()
+    for start in range(0, max(len(overdue_ids), len(cured_ids)), chunk_size):
+        with transaction.atomic():
+            # The filters are repeated so a repayment that moved a loan's
+            # due date since it was read is not overwritten.
+            run.loans_marked_overdue += missed.filter(pk__in=overdue_ids[start:start + chunk_size]).update(
+                loan_status='OVERDUE', updated_at=now,
+            )
+            run.loans_cured += caught_up.filter(pk__in=cured_ids[start:start + chunk_size]).update(
+                loan_status='DISBURSED', updated_at=now,
+            )
+
+    run.loans_checked = len(overdue_ids) + len(cured_ids)
+    run.overdue_balance = LoanAccount.objects.filter(pk__in=overdue_ids, loan_status='OVERDUE').aggregate(
+        total=Sum(F('total_repayment') - F('total_loan_repaid'))
+    )['total'] or 0
+    run.completed_at = timezone.now()
+    run.save()
+    logger.info(
+        "Delinquency scan to %s: %s overdue (KES %s outstanding), %s cured, %.0fms",
+        cutoff, run.loans_marked_overdue, run.overdue_balance, run.loans_cured,
+        (run.completed_at - run.started_at).total_seconds() * 1000,
+    )
+    return run
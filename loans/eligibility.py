@@ -0,0 +1,114 @@
+"""
+Loan eligibility. A member may borrow up to LIMIT_MULTIPLIER times their
+savings balance. snapshot() reads everything a decision is based on in one
+query: the savings balance, pension balance, the outstanding balance of the
+member's own open loans and what they currently guarantee. Pass the same
+``memo`` dict to every call made while handling a request (the serializers
+use their context) so the member is read once however many times the rule
+is checked.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db.models import DecimalField, Exists, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from pension.models import PensionAccount
+from savings.models import SavingsAccount
+from users.models import User
+from .exposure import CLOSED_LOAN_STATUSES
+from .models import GuarantorExposure, LoanAccount
+
+LIMIT_MULTIPLIER = Decimal('3')
+ZERO = Decimal('0.00')
+
+NO_SAVINGS_ACCOUNT = 'no_savings_account'
+EXCEEDS_LIMIT = 'exceeds_limit'
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    member_id: int
+    has_savings_account: bool
+    savings_balance: Decimal
+    pension_balance: Decimal
+    open_loan_balance: Decimal
+    guaranteed_amount: Decimal
+
+    @property
+    def limit(self):
+        return self.savings_balance * LIMIT_MULTIPLIER
+
+
+@dataclass(frozen=True)
+class Decision:
+    eligible: bool
+    reason: str
+    message: str
+    requested_amount: Decimal
+    limit: Decimal
+    snapshot: Snapshot
+
+    def as_dict(self):
+        return {
+            'eligible': self.eligible,
+            'reason': self.reason,
+            'message': self.message,
+            'requested_amount': self.requested_amount,
+            'limit': self.limit,
+            'savings_balance': self.snapshot.savings_balance,
+            'pension_balance': self.snapshot.pension_balance,
+            'open_loan_balance': self.snapshot.open_loan_balance,
+            'guaranteed_amount': self.snapshot.guaranteed_amount,
+        }
+
+
+def _sum(queryset, expression):
+    total = queryset.order_by().values('member').annotate(total=Sum(expression)).values('total')
+    return Coalesce(Subquery(total), Value(ZERO), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def snapshot(member_id, memo=None):
+    """The member's balances as a Snapshot, or None if there is no such member."""
+    if memo is not None and member_id in memo:
+        return memo[member_id]
+    member = OuterRef('pk')
+    savings = SavingsAccount.objects.filter(member=member)
+    open_loans = LoanAccount.objects.filter(member=member).exclude(loan_status__in=CLOSED_LOAN_STATUSES)
+    row = User.objects.filter(pk=member_id).annotate(
+        has_savings_account=Exists(savings),
+        savings_balance=_sum(savings, 'member_account_balance'),
+        pension_balance=_sum(PensionAccount.objects.filter(member=member), 'total_pension_amount'),
+        open_loan_balance=_sum(
+            open_loans, Coalesce('total_repayment', 'requested_amount') - F('total_loan_repaid')
+        ),
+        guaranteed_amount=_sum(GuarantorExposure.objects.filter(member=member), 'open_amount'),
+    ).values(
+        'has_savings_account', 'savings_balance', 'pension_balance', 'open_loan_balance', 'guaranteed_amount'
+    ).first()
+    result = Snapshot(member_id=member_id, **row) if row else None
+    if memo is not None:
+        memo[member_id] = result
+    return result
+
+
+def assess(member_id, requested_amount, memo=None):
+    """
+    Decision for ``member_id`` borrowing ``requested_amount``. Raises
+    User.DoesNotExist for an unknown member.
+    """
+    member = snapshot(member_id, memo)
+    if member is None:
+        raise User.DoesNotExist(f"No member with id {member_id}.")
+    requested_amount = Decimal(requested_amount)
+    if not member.has_savings_account:
+        return Decision(False, NO_SAVINGS_ACCOUNT, "You must have a savings account to apply for a loan.",
+                        requested_amount, ZERO, member)
+    if requested_amount > member.limit:
+        return Decision(
+            False, EXCEEDS_LIMIT,
+            f"You can only borrow up to 3x your savings (KES {member.limit:.2f}). "
+            f"Your current savings: KES {member.savings_balance:.2f}",
+            requested_amount, member.limit, member,
+        )
+    return Decision(True, '', '', requested_amount, member.limit, member)
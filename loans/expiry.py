@@ -0,0 +1,66 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from malipoflex.locks import advisory_lock
+from notifications.outbox import enqueue_many
+from . import exposure
+from .models import Guarantor
+
+logger = logging.getLogger(__name__)
+
+
+def expire_guarantors(max_age=None, batch_size=None):
+    """
+    Expire guarantor requests left Pending longer than ``max_age`` and queue
+    a notification for each affected borrower. Each batch claims up to
+    ``batch_size`` rows and commits on its own, so the table is never locked
+    for a whole sweep. Returns the counts, or None if another node holds the
+    job lock.
+    """
+    if max_age is None:
+        max_age = timedelta(hours=settings.GUARANTOR_EXPIRY_HOURS)
+    batch_size = batch_size or settings.GUARANTOR_EXPIRY_BATCH_SIZE
+    counts = {'expired': 0, 'loans': 0, 'notified': 0}
+
+    with advisory_lock('expire_guarantors') as acquired:
+        if not acquired:
+            return None
+        cutoff = timezone.now() - max_age
+        loans = set()
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    Guarantor.objects.select_for_update(skip_locked=True, of=('self',))
+                    .filter(status='Pending', created_at__lt=cutoff)
+                    .order_by('created_at')
+                    .values_list('id', 'loan_id', 'loan__member_id', 'guarantor_name', 'member_id')[:batch_size]
+                )
+                if not rows:
+                    break
+                Guarantor.objects.filter(pk__in=[row[0] for row in rows], status='Pending').update(
+                    status='Expired', updated_at=timezone.now(),
+                )
+                notified = enqueue_many([
+                    (
+                        member_id, 'guarantor_expired',
+                        f"Your guarantor request for '{name}' has expired. "
+                        f"Please add a new guarantor for your loan (ID: {loan_id}).",
+                        f'guarantor_expired:{guarantor_id}',
+                    )
+                    for guarantor_id, loan_id, member_id, name, _ in rows
+                ])
+                exposure.refresh(row[4] for row in rows)
+            counts['expired'] += len(rows)
+            counts['notified'] += len(notified)
+            loans.update(row[1] for row in rows)
+            if len(rows) < batch_size:
+                break
+        counts['loans'] = len(loans)
+
+    if counts['expired']:
+        logger.info("Expired %(expired)s guarantor request(s) on %(loans)s loan(s)", counts)
+    return counts
@@ -0,0 +1,63 @@
+"""
+GuarantorExposure holds, per member, the amount and number of loans they
+currently guarantee, so eligibility checks and the guarantor history read
+one row. A guarantee is open while the guarantor is Pending or Approved and
+the loan is not closed.
+
+Call refresh() with the guarantor member ids in the same transaction as any
+change to a Guarantor's status or a loan closing. It locks the members'
+exposure rows before recounting, so concurrent changes for one member apply
+one after the other; exposure rows are locked after LoanAccount rows.
+"""
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import Guarantor, GuarantorExposure
+
+OPEN_GUARANTOR_STATUSES = ('Pending', 'Approved')
+CLOSED_LOAN_STATUSES = ('REJECTED', 'COMPLETED', 'PAID')
+
+
+def open_guarantees():
+    return Guarantor.objects.filter(status__in=OPEN_GUARANTOR_STATUSES).exclude(
+        loan__loan_status__in=CLOSED_LOAN_STATUSES
+    )
+
+
+def refresh(member_ids):
+    member_ids = sorted(set(member_ids))
+    if not member_ids:
+        return
+    with transaction.atomic():
+        GuarantorExposure.objects.bulk_create(
+            [GuarantorExposure(member_id=member_id) for member_id in member_ids], ignore_conflicts=True,
+        )
+        exposures = list(GuarantorExposure.objects.select_for_update().filter(member_id__in=member_ids).order_by('pk'))
+        totals = {
+            row['member_id']: row
+            for row in open_guarantees().filter(member_id__in=member_ids)
+            .values('member_id').annotate(amount=Sum('loan__requested_amount'), count=Count('id')).order_by()
+        }
+        now = timezone.now()
+        for exposure in exposures:
+            row = totals.get(exposure.member_id, {})
+            exposure.open_amount = row.get('amount') or 0
+            exposure.active_guarantees = row.get('count', 0)
+            exposure.updated_at = now
+        GuarantorExposure.objects.bulk_update(exposures, ['open_amount', 'active_guarantees', 'updated_at'])
+
+
+def refresh_loan(loan_id):
+    refresh(Guarantor.objects.filter(loan_id=loan_id).values_list('member_id', flat=True))
+
+
+def rebuild(chunk_size=1000):
+    """Recount every member who guarantees or has guaranteed a loan."""
+    member_ids = sorted(set(Guarantor.objects.values_list('member_id', flat=True)))
+    for start in range(0, len(member_ids), chunk_size):
+        refresh(member_ids[start:start + chunk_size])
+    GuarantorExposure.objects.exclude(member_id__in=Guarantor.objects.values('member_id')).update(
+        open_amount=0, active_guarantees=0,
+    )
+    return len(member_ids)
@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from loans.expiry import expire_guarantors
+
+
+class Command(BaseCommand):
+    help = "Expire guarantor requests left pending too long and notify the borrowers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.GUARANTOR_EXPIRY_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Keep sweeping instead of exiting after one pass.")
+        parser.add_argument('--interval', type=float, default=settings.GUARANTOR_EXPIRY_INTERVAL,
+                            help="Seconds to sleep between sweeps with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            counts = expire_guarantors(batch_size=options['batch_size'])
+            if counts is None:
+                self.stdout.write("Another node is expiring guarantors; skipped.")
+            elif counts['expired']:
+                self.stdout.write(
+                    f"Expired {counts['expired']} guarantor request(s) on {counts['loans']} loan(s), "
+                    f"queued {counts['notified']} notification(s)"
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from loans.exposure import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recount every member's open guarantees into the guarantor exposure index."
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(f"Rebuilt guarantor exposure for {count} member(s)")
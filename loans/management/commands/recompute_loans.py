@@ -0,0 +1,37 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loans.amortization import recompute
+from loans.exposure import CLOSED_LOAN_STATUSES
+from loans.models import LoanAccount
+
+
+class Command(BaseCommand):
+    help = "Recompute stored loan totals and installment schedules, optionally after changing the interest rate."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', action='append', dest='statuses',
+                            help="Only loans in this status; repeat for several. Defaults to all loans, "
+                                 "or to open loans with --interest-rate.")
+        parser.add_argument('--interest-rate', help="Set this annual rate (percent) on the selected loans first.")
+        parser.add_argument('--chunk-size', type=int)
+
+    def handle(self, *args, **options):
+        loans = LoanAccount.objects.all()
+        if options['statuses']:
+            loans = loans.filter(loan_status__in=options['statuses'])
+        elif options['interest_rate']:
+            # A new rate is for loans still running; closed loans keep the
+            # rate they were settled on.
+            loans = loans.exclude(loan_status__in=CLOSED_LOAN_STATUSES)
+
+        if options['interest_rate']:
+            try:
+                rate = Decimal(options['interest_rate'])
+            except InvalidOperation:
+                raise CommandError("--interest-rate must be a number")
+            loans.update(interest_rate=rate)
+        # Safe to rerun if interrupted: every chunk is recomputed from the rate.
+        count = recompute(loans, options['chunk_size'])
+        self.stdout.write(f"Recomputed {count} loan(s)")
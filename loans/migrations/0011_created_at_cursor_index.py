@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loans", "0010_alter_loanaccount_loan_reason"),
+        ("transaction", "0007_callback_inbox"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="guarantor",
+            index=models.Index(
+                fields=["created_at", "id"], name="guarantor_created_at_id"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loanaccount",
+            index=models.Index(
+                fields=["created_at", "loan_id"], name="loan_created_at_id"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loanrepayment",
+            index=models.Index(
+                fields=["created_at", "id"], name="repayment_created_at_id"
+            ),
+        ),
+    ]
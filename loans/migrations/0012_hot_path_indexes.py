@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loans", "0011_created_at_cursor_index"),
+        ("transaction", "0009_hot_path_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="guarantor",
+            index=models.Index(
+                condition=models.Q(("status", "Pending")),
+                fields=["created_at"],
+                name="guarantor_pending_created",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loanaccount",
+            index=models.Index(fields=["loan_status"], name="loan_account_status"),
+        ),
+    ]
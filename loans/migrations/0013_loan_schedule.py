@@ -0,0 +1,76 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:08
+
+import django.db.models.deletion
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+
+def backfill_totals(apps, schema_editor):
+    LoanAccount = apps.get_model("loans", "LoanAccount")
+    loans = list(LoanAccount.objects.only("requested_amount", "interest_rate", "timeline_months"))
+    for loan in loans:
+        years = Decimal(loan.timeline_months) / Decimal("12")
+        interest = loan.requested_amount * loan.interest_rate * years / Decimal("100")
+        loan.total_interest = interest.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        loan.total_repayment = loan.requested_amount + loan.total_interest
+    LoanAccount.objects.bulk_update(loans, ["total_interest", "total_repayment"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loans", "0012_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="loanaccount",
+            name="total_interest",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=12, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="loanaccount",
+            name="total_repayment",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=12, null=True
+            ),
+        ),
+        migrations.CreateModel(
+            name="LoanInstallment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("number", models.PositiveSmallIntegerField()),
+                ("due_date", models.DateField()),
+                ("principal", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("interest", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "loan",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="installments",
+                        to="loans.loanaccount",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["loan", "number"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("loan", "number"), name="unique_loan_installment"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
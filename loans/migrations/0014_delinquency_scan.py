@@ -0,0 +1,78 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:11
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loans", "0013_loan_schedule"),
+        ("transaction", "0009_hot_path_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DelinquencyScan",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("window_start", models.DateField(blank=True, null=True)),
+                ("window_end", models.DateField()),
+                ("loans_checked", models.PositiveIntegerField(default=0)),
+                ("loans_marked_overdue", models.PositiveIntegerField(default=0)),
+                ("loans_cured", models.PositiveIntegerField(default=0)),
+                (
+                    "overdue_balance",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14
+                    ),
+                ),
+                ("started_at", models.DateTimeField(auto_now_add=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name="loanaccount",
+            name="loan_account_status",
+        ),
+        migrations.AddField(
+            model_name="loanaccount",
+            name="next_due_date",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="loanaccount",
+            name="loan_status",
+            field=models.CharField(
+                choices=[
+                    ("DRAFT", "Draft"),
+                    ("PENDING_GUARANTOR", "Pending Guarantor Approval"),
+                    ("PENDING_MANAGER", "Pending Manager Approval"),
+                    ("APPROVED", "Approved"),
+                    ("REJECTED", "Rejected"),
+                    ("DISBURSED", "Disbursed"),
+                    ("OVERDUE", "Overdue"),
+                    ("COMPLETED", "Completed"),
+                    ("PAID", "Paid"),
+                ],
+                default="DRAFT",
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loanaccount",
+            index=models.Index(
+                fields=["loan_status", "next_due_date"], name="loan_status_next_due"
+            ),
+        ),
+    ]
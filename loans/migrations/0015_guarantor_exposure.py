@@ -0,0 +1,65 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:16
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_exposure(apps, schema_editor):
+    Guarantor = apps.get_model("loans", "Guarantor")
+    GuarantorExposure = apps.get_model("loans", "GuarantorExposure")
+    totals = (
+        Guarantor.objects.filter(status__in=("Pending", "Approved"))
+        .exclude(loan__loan_status__in=("REJECTED", "COMPLETED", "PAID"))
+        .values("member_id")
+        .annotate(amount=Sum("loan__requested_amount"), count=Count("id"))
+        .order_by()
+    )
+    GuarantorExposure.objects.bulk_create(
+        [
+            GuarantorExposure(
+                member_id=row["member_id"],
+                open_amount=row["amount"],
+                active_guarantees=row["count"],
+            )
+            for row in totals.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loans", "0014_delinquency_scan"),
+        ("users", "0005_created_at_cursor_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GuarantorExposure",
+            fields=[
+                (
+                    "member",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="guarantor_exposure",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "open_amount",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14
+                    ),
+                ),
+                ("active_guarantees", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_exposure, migrations.RunPython.noop),
+    ]
@@ -4,7 +4,7 @@ from datetime import timedelta
 from dateutil.relativedelta import relativedelta
 from users.models import User
 from transaction.models import Transaction
-from decimal import Decimal, InvalidOperation
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
 
 
 class LoanAccount(models.Model):
@@ -23,6 +23,7 @@ class LoanAccount(models.Model):
         ('APPROVED', 'Approved'),
         ('REJECTED', 'Rejected'),
         ('DISBURSED', 'Disbursed'),
+        ('OVERDUE', 'Overdue'),
         ('COMPLETED', 'Completed'),
         ('PAID', 'Paid'),  
     ]
@@ -47,6 +48,9 @@ class LoanAccount(models.Model):
         default='monthly'
     )
     payment_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Stored by save() and loans.amortization so reads do not recompute them.
+    total_interest = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    total_repayment = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     
     transaction_id_b2c = models.ForeignKey(
         Transaction,
@@ -62,36 +66,42 @@ class LoanAccount(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     rejection_reason = models.TextField(null=True, blank=True)
     repayment_due_date = models.DateTimeField(null=True, blank=True)
+    # Due date of the first installment not yet covered by repayments.
+    next_due_date = models.DateField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'loan_id'], name='loan_created_at_id'),
+            models.Index(fields=['loan_status', 'next_due_date'], name='loan_status_next_due'),
+        ]
 
     def clean(self):
-        if self.pk:  
+        # Only new loans are checked. A serializer that has already assessed
+        # the loan sets ``eligibility`` so the member is not read again.
+        if not self._state.adding:
             return
-        
-        try:
-            savings = self.member.savings_account
-            max_allowed = savings.member_account_balance * Decimal('3')
-            if self.requested_amount > max_allowed:
-                from django.core.exceptions import ValidationError
-                raise ValidationError(
-                    f"You can only borrow up to 3x your savings (KES {max_allowed:.2f}). "
-                    f"Your current savings: KES {savings.member_account_balance:.2f}"
-                )
-        except SavingsAccount.DoesNotExist:
-            from django.core.exceptions import ValidationError
-            raise ValidationError("You must have a savings account to apply for a loan.")
+        from django.core.exceptions import ValidationError
+        from .eligibility import assess
+
+        decision = getattr(self, 'eligibility', None) or assess(self.member_id, self.requested_amount)
+        if not decision.eligible:
+            raise ValidationError(decision.message)
 
 
     def save(self, *args, **kwargs):
-        self.clean()  
+        if self._state.adding:
+            self.clean()
         if self.loan_status == 'APPROVED' and not self.repayment_due_date and self.approved_at:
             self.repayment_due_date = self.approved_at + relativedelta(months=self.timeline_months)
+        self.total_interest = self.calculate_total_interest()
+        self.total_repayment = self.calculate_total_repayment()
         super().save(*args, **kwargs)
 
 
     def calculate_total_interest(self):
         years = Decimal(self.timeline_months) / Decimal('12')
-        return (self.requested_amount * self.interest_rate * years) / Decimal('100')
+        interest = (Decimal(self.requested_amount) * Decimal(self.interest_rate) * years) / Decimal('100')
+        return interest.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
 
     def calculate_total_repayment(self):
@@ -103,7 +113,7 @@ class LoanAccount(models.Model):
 
     @property
     def outstanding_balance(self):
-        total_repayment = self.calculate_total_repayment()
+        total_repayment = self.total_repayment if self.total_repayment is not None else self.calculate_total_repayment()
         return max(total_repayment - self.total_loan_repaid, Decimal('0.00'))
 
 
@@ -122,10 +132,28 @@ class Guarantor(models.Model):
     responded_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='guarantor_created_at_id'),
+            models.Index(fields=['created_at'], condition=models.Q(status='Pending'), name='guarantor_pending_created'),
+        ]
+
     def __str__(self):
         return f"{self.guarantor_name} for Loan {self.loan.loan_id}"
 
 
+class GuarantorExposure(models.Model):
+    """What one member currently guarantees, kept in step with Guarantor and LoanAccount by loans.exposure."""
+
+    member = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='guarantor_exposure')
+    open_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    active_guarantees = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Member {self.member_id} guarantees KES {self.open_amount} on {self.active_guarantees} loan(s)"
+
+
 class LoanRepayment(models.Model):
     loan = models.ForeignKey(LoanAccount, on_delete=models.CASCADE, related_name='repayments')
     loan_amount_repaid = models.DecimalField(max_digits=10, decimal_places=2)
@@ -144,5 +172,49 @@ class LoanRepayment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='repayment_created_at_id'),
+        ]
+
     def __str__(self):
         return f"Repayment for Loan {self.loan.loan_id}"
+
+
+class LoanInstallment(models.Model):
+    """One scheduled payment of an approved loan, generated by loans.amortization."""
+
+    loan = models.ForeignKey(LoanAccount, on_delete=models.CASCADE, related_name='installments')
+    number = models.PositiveSmallIntegerField()
+    due_date = models.DateField()
+    principal = models.DecimalField(max_digits=10, decimal_places=2)
+    interest = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        ordering = ['loan', 'number']
+        constraints = [
+            models.UniqueConstraint(fields=['loan', 'number'], name='unique_loan_installment'),
+        ]
+
+    def __str__(self):
+        return f"Installment {self.number} of Loan {self.loan_id} due {self.due_date}"
+
+    @property
+    def amount(self):
+        return self.principal + self.interest
+
+
+class DelinquencyScan(models.Model):
+    """One run of loans.delinquency.scan() and what it changed."""
+
+    window_start = models.DateField(null=True, blank=True)
+    window_end = models.DateField()
+    loans_checked = models.PositiveIntegerField(default=0)
+    loans_marked_overdue = models.PositiveIntegerField(default=0)
+    loans_cured = models.PositiveIntegerField(default=0)
+    overdue_balance = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Delinquency scan up to {self.window_end}"
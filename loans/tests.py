@@ -1,3 +1,331 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from malipoflex.locks import advisory_lock
+from notifications.models import Notification
+from savings.models import SavingsAccount
+from transaction import balances
+from .amortization import generate_schedule
+from .delinquency import scan
+from .expiry import expire_guarantors
+from .models import DelinquencyScan, Guarantor, GuarantorExposure, LoanAccount, LoanInstallment, LoanRepayment
+
+User = get_user_model()
+
+
+class LoanListQueryTests(TestCase):
+
+    def setUp(self):
+        self.users = 0
+
+    def user(self):
+        self.users += 1
+        return User.objects.create_user(
+            email=f'borrower{self.users}@example.com', password='pw', phone_number=f'+25474000{self.users:04d}'
+        )
+
+    def add_loans(self, count, guarantors=2, repayments=3):
+        for _ in range(count):
+            member = self.user()
+            loan = LoanAccount.objects.bulk_create([
+                LoanAccount(member=member, requested_amount=Decimal('3000.00'), timeline_months=6),
+            ])[0]
+            Guarantor.objects.bulk_create([
+                Guarantor(loan=loan, member=self.user(), guarantor_name='g', guarantor_phone_number='0')
+                for _ in range(guarantors)
+            ])
+            LoanRepayment.objects.bulk_create([
+                LoanRepayment(loan=loan, loan_amount_repaid=Decimal('100.00')) for _ in range(repayments)
+            ])
+
+    def list_query_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_list_endpoints_run_a_constant_number_of_queries(self):
+        for url in ('/api/loanAccounts/', '/api/loanApplication/'):
+            with self.subTest(url=url):
+                LoanAccount.objects.all().delete()
+                self.add_loans(1, guarantors=1, repayments=1)
+                few, _ = self.list_query_count(url)
+                self.add_loans(5, guarantors=2, repayments=6)
+                many, response = self.list_query_count(url)
+                self.assertEqual(few, many)
+                self.assertLessEqual(many, 4)
+
+                rows = response.data['results'] if isinstance(response.data, dict) else response.data
+                self.assertEqual(len(rows), 6)
+                self.assertTrue(all(row['member_first_name'] is not None for row in rows))
+                self.assertEqual(sum(len(row['guarantors']) for row in rows), 11)
+                self.assertEqual(sum(len(row['repayments']) for row in rows), 31)
+
+
+class AmortizationTests(TestCase):
+
+    def setUp(self):
+        self.member = User.objects.create_user(email='sched@example.com', password='pw', phone_number='+254760000000')
+        SavingsAccount.objects.create(member=self.member, member_account_balance=Decimal('10000.00'))
+
+    def loan(self, **kwargs):
+        fields = {'member': self.member, 'requested_amount': Decimal('1000.00'), 'timeline_months': 7,
+                  'loan_status': 'PENDING_MANAGER'}
+        fields.update(kwargs)
+        return LoanAccount.objects.create(**fields)
+
+    def test_totals_are_stored_on_save(self):
+        loan = self.loan()
+        loan.refresh_from_db()
+        self.assertEqual(loan.total_interest, Decimal('29.17'))
+        self.assertEqual(loan.total_repayment, Decimal('1029.17'))
+        self.assertEqual(loan.outstanding_balance, Decimal('1029.17'))
+
+    def test_schedule_sums_to_the_totals(self):
+        for frequency, count in (('monthly', 7), ('weekly', 31), ('daily', 212)):
+            with self.subTest(frequency):
+                loan = self.loan(frequency_of_payment=frequency, approved_at=timezone.make_aware(datetime(2026, 1, 1)))
+                installments = generate_schedule(loan)
+                self.assertEqual(len(installments), count)
+                self.assertEqual(sum(i.principal for i in installments), Decimal('1000.00'))
+                self.assertEqual(sum(i.interest for i in installments), Decimal('29.17'))
+                self.assertEqual(installments[-1].due_date, date(2026, 8, 1))
+
+    def test_approval_generates_the_schedule(self):
+        loan = self.loan()
+        client = APIClient()
+        response = client.post(f'/api/loanAccounts/{loan.pk}/approve/', {'action': 'approve'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        schedule = client.get(f'/api/loanAccounts/{loan.pk}/schedule/').data
+        self.assertEqual(len(schedule), 7)
+        loan.refresh_from_db()
+        self.assertEqual(loan.payment_amount, Decimal(schedule[0]['amount']))
+
+    def test_rate_change_recomputes_totals_and_schedules(self):
+        scheduled = self.loan(approved_at=timezone.now())
+        generate_schedule(scheduled)
+        self.loan()
+        call_command('recompute_loans', '--interest-rate', '12', '--chunk-size', '1', stdout=StringIO())
+
+        self.assertEqual(
+            list(LoanAccount.objects.order_by('pk').values_list('total_interest', flat=True)),
+            [Decimal('70.00'), Decimal('70.00')],
+        )
+        self.assertEqual(sum(i.interest for i in LoanInstallment.objects.filter(loan=scheduled)), Decimal('70.00'))
+
+    def test_rate_change_without_status_leaves_closed_loans(self):
+        open_loan = self.loan()
+        closed = [self.loan(loan_status=status) for status in ('COMPLETED', 'REJECTED', 'PAID')]
+        call_command('recompute_loans', '--interest-rate', '12', stdout=StringIO())
+
+        open_loan.refresh_from_db()
+        self.assertEqual(open_loan.interest_rate, Decimal('12.00'))
+        for loan in closed:
+            loan.refresh_from_db()
+            self.assertNotEqual(loan.interest_rate, Decimal('12.00'))
+
+
+class DelinquencyScanTests(TestCase):
+
+    def setUp(self):
+        member = User.objects.create_user(email='late@example.com', password='pw', phone_number='+254770000000')
+        SavingsAccount.objects.create(member=member, member_account_balance=Decimal('10000.00'))
+        approved = timezone.make_aware(datetime(2026, 1, 1))
+        self.loans = []
+        for _ in range(2):
+            loan = LoanAccount.objects.create(
+                member=member, requested_amount=Decimal('1200.00'), timeline_months=12,
+                interest_rate=Decimal('0.00'), loan_status='DISBURSED', approved_at=approved,
+            )
+            generate_schedule(loan)
+            self.loans.append(loan)
+
+    def statuses(self):
+        return list(LoanAccount.objects.order_by('pk').values_list('loan_status', flat=True))
+
+    def test_missed_installment_marks_loan_overdue_and_repayment_cures_it(self):
+        balances.apply_loan_repayment(self.loans[0].pk, Decimal('200.00'))
+        run = scan(date(2026, 3, 5))
+        self.assertEqual(self.statuses(), ['DISBURSED', 'OVERDUE'])
+        self.assertEqual((run.loans_marked_overdue, run.overdue_balance), (1, Decimal('1200.00')))
+
+        loan = balances.apply_loan_repayment(self.loans[1].pk, Decimal('300.00'))
+        self.assertEqual(loan.next_due_date, date(2026, 5, 1))
+        run = scan(date(2026, 3, 6))
+        self.assertEqual(self.statuses(), ['DISBURSED', 'DISBURSED'])
+        self.assertEqual((run.window_start, run.loans_cured), (date(2026, 3, 5), 1))
+
+    def test_grace_days_and_repeat_runs(self):
+        self.assertEqual(scan(date(2026, 2, 3), grace_days=3).loans_marked_overdue, 0)
+        self.assertEqual(scan(date(2026, 2, 5), grace_days=3).loans_marked_overdue, 2)
+        run = scan(date(2026, 2, 6), grace_days=3)
+        self.assertEqual((run.loans_checked, run.loans_marked_overdue), (0, 0))
+        self.assertEqual(DelinquencyScan.objects.count(), 3)
+
+
+class GuarantorExpiryTests(TestCase):
+
+    def setUp(self):
+        self.borrower = User.objects.create_user(email='needy@example.com', password='pw', phone_number='+254780000000')
+        guarantor = User.objects.create_user(email='backer@example.com', password='pw', phone_number='+254780000001')
+        loans = LoanAccount.objects.bulk_create([
+            LoanAccount(member=self.borrower, requested_amount=Decimal('500.00'), timeline_months=3) for _ in range(2)
+        ])
+        old = timezone.now() - timedelta(hours=30)
+        rows = [(loans[0], 'Pending', old), (loans[0], 'Pending', old), (loans[1], 'Pending', old),
+                (loans[1], 'Pending', timezone.now()), (loans[1], 'Approved', old)]
+        Guarantor.objects.bulk_create([
+            Guarantor(loan=loan, member=guarantor, guarantor_name='Backer', guarantor_phone_number='0', status=status)
+            for loan, status, _ in rows
+        ])
+        for guarantor_row, (_, _, created_at) in zip(Guarantor.objects.order_by('pk'), rows):
+            Guarantor.objects.filter(pk=guarantor_row.pk).update(created_at=created_at)
+
+    def test_expires_in_batches_and_notifies_borrowers(self):
+        counts = expire_guarantors(batch_size=2)
+        self.assertEqual(counts, {'expired': 3, 'loans': 2, 'notified': 3})
+        self.assertEqual(
+            list(Guarantor.objects.order_by('pk').values_list('status', flat=True)),
+            ['Expired', 'Expired', 'Expired', 'Pending', 'Approved'],
+        )
+        self.assertEqual(Notification.objects.filter(user=self.borrower, kind='guarantor_expired').count(), 3)
+        self.assertEqual(GuarantorExposure.objects.get().active_guarantees, 2)
+        self.assertEqual(expire_guarantors()['expired'], 0)
+
+    def test_notified_counts_only_newly_queued_notifications(self):
+        first = Guarantor.objects.order_by('pk').first()
+        Notification.objects.create(
+            user=self.borrower, kind='guarantor_expired', message='Expired', dedupe_key=f'guarantor_expired:{first.pk}',
+        )
+        counts = expire_guarantors()
+        self.assertEqual(counts['expired'], 3)
+        self.assertEqual(counts['notified'], 2)
+
+    def test_skips_when_another_node_holds_the_lock(self):
+        with advisory_lock('expire_guarantors') as acquired:
+            self.assertTrue(acquired)
+            self.assertIsNone(expire_guarantors())
+        self.assertFalse(Guarantor.objects.filter(status='Expired').exists())
+
+    def test_endpoint_runs_one_sweep(self):
+        response = APIClient().post('/api/api/expireGuarantors/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['loans_affected'], 2)
+
+
+class GuarantorExposureTests(TestCase):
+
+    def setUp(self):
+        borrower = User.objects.create_user(email='asker@example.com', password='pw', phone_number='+254790000000')
+        SavingsAccount.objects.create(member=borrower, member_account_balance=Decimal('10000.00'))
+        self.backer = User.objects.create_user(email='surety@example.com', password='pw', phone_number='+254790000001')
+        self.loans = [
+            LoanAccount.objects.create(
+                member=borrower, requested_amount=Decimal(amount), timeline_months=1,
+                interest_rate=Decimal('0.00'), loan_status='PENDING_GUARANTOR',
+            )
+            for amount in ('1000.00', '400.00')
+        ]
+        self.client = APIClient()
+
+    def add(self, loan):
+        return self.client.post('/api/guarantors/', {'loan': loan.pk, 'user_identifier': self.backer.phone_number})
+
+    def exposure(self):
+        row = self.client.get(f'/api/guarantorHistory/exposure/?member_id={self.backer.pk}').data
+        return Decimal(row['open_amount']), row['active_guarantees']
+
+    def test_exposure_follows_guarantees_and_loans(self):
+        response = self.add(self.loans[0])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.data['notification'], Notification.objects.get(kind='guarantor_request').message,
+        )
+        self.add(self.loans[1])
+        self.assertEqual(self.exposure(), (Decimal('1400.00'), 2))
+        self.assertEqual(self.add(self.loans[1]).status_code, 400)
+
+        guarantor = Guarantor.objects.get(loan=self.loans[1])
+        self.client.post(f'/api/guarantors/{guarantor.pk}/respond/', {'action': 'reject'})
+        self.assertEqual(self.exposure(), (Decimal('1000.00'), 1))
+
+        guarantor = Guarantor.objects.get(loan=self.loans[0])
+        self.client.post(f'/api/guarantors/{guarantor.pk}/respond/', {'action': 'approve'})
+        LoanAccount.objects.filter(pk=self.loans[0].pk).update(loan_status='DISBURSED')
+        balances.apply_loan_repayment(self.loans[0].pk, Decimal('1000.00'))
+        self.assertEqual(self.exposure(), (Decimal('0.00'), 0))
+
+    def test_patching_a_guarantor_status_refreshes_exposure(self):
+        self.add(self.loans[0])
+        guarantor = Guarantor.objects.get(loan=self.loans[0])
+        response = self.client.patch(f'/api/guarantors/{guarantor.pk}/', {'status': 'Rejected'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.exposure(), (Decimal('0.00'), 0))
+
+    def test_patching_a_loan_refreshes_exposure(self):
+        self.add(self.loans[0])
+        response = self.client.patch(
+            f'/api/loanAccounts/{self.loans[0].pk}/', {'requested_amount': '1500.00'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.exposure(), (Decimal('1500.00'), 1))
+
+    def test_deleting_a_loan_refreshes_exposure(self):
+        self.add(self.loans[0])
+        self.add(self.loans[1])
+        response = self.client.delete(f'/api/loanAccounts/{self.loans[0].pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.exposure(), (Decimal('400.00'), 1))
+
+    def test_rebuild_recounts_from_guarantors(self):
+        self.add(self.loans[0])
+        GuarantorExposure.objects.update(open_amount=Decimal('5.00'), active_guarantees=7)
+        call_command('rebuild_guarantor_exposure', stdout=StringIO())
+        self.assertEqual(self.exposure(), (Decimal('1000.00'), 1))
+
+
+class LoanEligibilityTests(TestCase):
+
+    def setUp(self):
+        self.member = User.objects.create_user(email='saver@example.com', password='pw', phone_number='+254791000000')
+        SavingsAccount.objects.create(member=self.member, member_account_balance=Decimal('1000.00'))
+        self.client = APIClient()
+
+    def apply(self, amount, member=None):
+        return self.client.post('/api/loanAccounts/', {
+            'member': (member or self.member).pk, 'requested_amount': amount, 'timeline_months': 3,
+        })
+
+    def test_application_reads_savings_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.apply('3000.00')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sum('savings_savingsaccount' in query['sql'] for query in queries), 1)
+
+        loan = LoanAccount.objects.get()
+        with CaptureQueriesContext(connection) as queries:
+            loan.save()
+        self.assertFalse(any('savings_savingsaccount' in query['sql'] for query in queries))
+
+    def test_rejections_and_decision(self):
+        self.assertIn('up to 3x your savings', str(self.apply('3000.01').data))
+        other = User.objects.create_user(email='spender@example.com', password='pw', phone_number='+254791000001')
+        self.assertIn('savings account', str(self.apply('10.00', member=other).data))
+        self.assertFalse(LoanAccount.objects.exists())
 
-# Create your tests here.
+        self.apply('1000.00')
+        decision = self.client.get(f'/api/loanAccounts/eligibility/?member_id={self.member.pk}&amount=2500').data
+        self.assertEqual(
+            (decision['eligible'], decision['limit'], decision['open_loan_balance']),
+            (True, Decimal('3000.00'), Decimal('1012.50')),
+        )
+        self.assertEqual(self.client.get('/api/loanAccounts/eligibility/?member_id=x').status_code, 400)
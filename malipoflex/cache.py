@@ -0,0 +1,96 @@
+"""
+Namespaced access to the shared cache configured by CACHE_URL.
+
+A Namespace prefixes its keys with its name and a schema version, so two
+features cannot collide and a change to what a namespace stores only needs
+its version bumped. clear() drops every key in the namespace at once by
+moving it to a new generation, which the backends support without listing
+keys. get_or_set() protects against stampedes: one caller recomputes a
+missing or soon-to-expire value while the others wait briefly for it or
+keep serving the previous value.
+"""
+import random
+import time
+
+from django.core.cache import caches
+
+MISSING = object()
+
+
+class Namespace:
+
+    def __init__(self, name, version=1, timeout=300, alias='default'):
+        self.name = name
+        self.version = version
+        self.timeout = timeout
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _generation_key(self):
+        return f"{self.name}:generation"
+
+    def generation(self):
+        generation = self.cache.get(self._generation_key())
+        if generation is None:
+            self.cache.add(self._generation_key(), 1, timeout=None)
+            generation = self.cache.get(self._generation_key(), 1)
+        return generation
+
+    def key(self, key):
+        return f"{self.name}:v{self.version}:g{self.generation()}:{key}"
+
+    def get(self, key, default=None):
+        return self.cache.get(self.key(key), default)
+
+    def set(self, key, value, timeout=MISSING):
+        self.cache.set(self.key(key), value, self.timeout if timeout is MISSING else timeout)
+
+    def add(self, key, value, timeout=MISSING):
+        return self.cache.add(self.key(key), value, self.timeout if timeout is MISSING else timeout)
+
+    def delete(self, key):
+        self.cache.delete(self.key(key))
+
+    def clear(self):
+        """Orphan every key in the namespace; they expire on their own."""
+        try:
+            self.cache.incr(self._generation_key())
+        except ValueError:
+            self.cache.add(self._generation_key(), 2, timeout=None)
+
+    def get_or_set(self, key, compute, timeout=MISSING, lock_timeout=10, wait=2.0, early=0.1):
+        """
+        The cached value for ``key``, calling ``compute()`` to fill it when
+        it is missing. Within the last ``early`` fraction of its lifetime a
+        value is refreshed by whichever caller takes the lock first, while
+        the rest are served the current value. When the value is missing,
+        callers that lose the lock wait up to ``wait`` seconds for the
+        winner before computing it themselves.
+        """
+        timeout = self.timeout if timeout is MISSING else timeout
+        cache_key, lock_key = self.key(key), self.key(f"{key}:lock")
+        entry = self.cache.get(cache_key)
+        now = time.time()
+        if entry is not None:
+            value, refresh_at = entry
+            if now < refresh_at or not self.cache.add(lock_key, 1, lock_timeout):
+                return value
+        elif not self.cache.add(lock_key, 1, lock_timeout):
+            deadline = now + wait
+            while time.time() < deadline:
+                time.sleep(0.05)
+                entry = self.cache.get(cache_key)
+                if entry is not None:
+                    return entry[0]
+            return compute()
+
+        try:
+            value = compute()
+            refresh_at = time.time() + (timeout * (1 - early * random.random()) if timeout else float('inf'))
+            self.cache.set(cache_key, (value, refresh_at), timeout)
+            return value
+        finally:
+            self.cache.delete(lock_key)
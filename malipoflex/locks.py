@@ -0,0 +1,40 @@
+"""
+Cluster-wide locks for scheduled jobs that may run on several nodes. On
+Postgres this is a session advisory lock; other databases fall back to an
+add-only cache key, which is only cluster-wide with a shared cache.
+"""
+import uuid
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+
+
+@contextmanager
+def advisory_lock(name, timeout=600):
+    """
+    Try to take the lock ``name`` without waiting and yield whether it was
+    acquired. ``timeout`` bounds how long a cache lock outlives a crashed
+    holder; a Postgres lock is released when its connection closes.
+    """
+    if connection.vendor == 'postgresql':
+        key = zlib.crc32(name.encode())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [key])
+            acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_unlock(%s)', [key])
+        return
+
+    cache_key, token = f'lock:{name}', uuid.uuid4().hex
+    acquired = cache.add(cache_key, token, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(cache_key) == token:
+            cache.delete(cache_key)
@@ -1,4 +1,5 @@
 from pathlib import Path
+from urllib.parse import parse_qsl, urlparse
 import os
 from dotenv import load_dotenv
 
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     'vsla',
     'policy',
     'pension',
+    'notifications',
     'rest_framework',
     'rest_framework.authtoken',
     'django_filters',
@@ -46,6 +48,20 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CreatedAtCursorPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', 50)),
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'users.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.getenv('LOGIN_RATE_PER_IP', '30/min'),
+        'login_phone': os.getenv('LOGIN_RATE_PER_PHONE', '5/min'),
+    },
+    # Number of proxies in front of the app (Render's router, by default).
+    # Throttles trust only the X-Forwarded-For entries those proxies
+    # appended; 0 uses REMOTE_ADDR.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
 }
 
 MIDDLEWARE = [
@@ -95,6 +111,50 @@ else:
         }
     }
 
+def cache_config(url):
+    """
+    CACHES entry for CACHE_URL:
+      redis://host:6379/0 (or rediss://)  shared across nodes, needs redis-py
+      file:///var/cache/malipoflex       shared by the workers on one node
+      db://cache_table                   in the default database; run createcachetable
+      locmem://name                      this process only; the test runner uses it
+    Query parameters such as ?timeout=600 are passed through as TIMEOUT.
+    """
+    parsed = urlparse(url)
+    backends = {
+        'redis': ('django.core.cache.backends.redis.RedisCache', url.split('?')[0]),
+        'rediss': ('django.core.cache.backends.redis.RedisCache', url.split('?')[0]),
+        'file': ('django.core.cache.backends.filebased.FileBasedCache', parsed.path),
+        'db': ('django.core.cache.backends.db.DatabaseCache', parsed.netloc or 'cache_table'),
+        'locmem': ('django.core.cache.backends.locmem.LocMemCache', parsed.netloc),
+    }
+    if parsed.scheme not in backends:
+        raise ValueError(f"Unsupported CACHE_URL scheme: {parsed.scheme!r}")
+    backend, location = backends[parsed.scheme]
+    config = {'BACKEND': backend, 'LOCATION': location, 'KEY_PREFIX': 'malipoflex'}
+    options = dict(parse_qsl(parsed.query))
+    if 'timeout' in options:
+        config['TIMEOUT'] = int(options['timeout'])
+    return config
+
+
+# The cache holds pickled user rows, so the default lives inside the project
+# where only its owner can read it; set CACHE_URL to share it across nodes.
+CACHE_URL = os.getenv('CACHE_URL') or f"file://{BASE_DIR / '.cache'}"
+CACHES = {'default': cache_config(CACHE_URL)}
+TEST_RUNNER = 'malipoflex.test_runner.TestRunner'
+
+# The tuned hasher comes first so new and rehashed passwords use
+# PASSWORD_HASH_ITERATIONS; the rest verify hashes from other algorithms.
+PASSWORD_HASHERS = [
+    'users.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', 1_000_000))
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -147,3 +207,66 @@ DARAJA_PASSKEY = os.getenv('DARAJA_PASSKEY')
 DARAJA_CALLBACK_URL = os.getenv('DARAJA_CALLBACK_URL', 'https://my-backend-grmo.onrender.com/api/payments/daraja-callback/').strip()
 DARAJA_B2C_CALLBACK_URL = os.getenv('DARAJA_B2C_CALLBACK_URL', 'https://my-backend-grmo.onrender.com/api/payments/daraja-callback/').strip()
 DARAJA_B2B_CALLBACK_URL = os.getenv('DARAJA_B2B_CALLBACK_URL', 'https://my-backend-grmo.onrender.com/api/payments/daraja-callback/').strip()
+DARAJA_TOKEN_EXPIRY_MARGIN = int(os.getenv('DARAJA_TOKEN_EXPIRY_MARGIN', 60))
+DARAJA_TOKEN_LOCK_TIMEOUT = int(os.getenv('DARAJA_TOKEN_LOCK_TIMEOUT', 15))
+DARAJA_POOL_CONNECTIONS = int(os.getenv('DARAJA_POOL_CONNECTIONS', 4))
+DARAJA_POOL_SIZE = int(os.getenv('DARAJA_POOL_SIZE', 20))
+DARAJA_CONNECT_TIMEOUT = float(os.getenv('DARAJA_CONNECT_TIMEOUT', 5))
+DARAJA_READ_TIMEOUT = float(os.getenv('DARAJA_READ_TIMEOUT', 30))
+DARAJA_MAX_RETRIES = int(os.getenv('DARAJA_MAX_RETRIES', 3))
+DARAJA_RETRY_BACKOFF = float(os.getenv('DARAJA_RETRY_BACKOFF', 0.5))
+
+PAYMENT_DISPATCH_WORKERS = int(os.getenv('PAYMENT_DISPATCH_WORKERS', 8))
+PAYMENT_DISPATCH_BATCH_SIZE = int(os.getenv('PAYMENT_DISPATCH_BATCH_SIZE', 50))
+PAYMENT_DISPATCH_STALE_SECONDS = int(os.getenv('PAYMENT_DISPATCH_STALE_SECONDS', 300))
+
+# 'deferred' acknowledges Daraja callbacks into CallbackInbox and leaves the
+# state changes to process_callbacks; 'inline' applies them in the request.
+DARAJA_CALLBACK_MODE = os.getenv('DARAJA_CALLBACK_MODE', 'deferred')
+DARAJA_CALLBACK_P99_BUDGET_MS = float(os.getenv('DARAJA_CALLBACK_P99_BUDGET_MS', 50))
+CALLBACK_INBOX_BATCH_SIZE = int(os.getenv('CALLBACK_INBOX_BATCH_SIZE', 100))
+CALLBACK_INBOX_MAX_ATTEMPTS = int(os.getenv('CALLBACK_INBOX_MAX_ATTEMPTS', 10))
+CALLBACK_INBOX_RETRY_BACKOFF = float(os.getenv('CALLBACK_INBOX_RETRY_BACKOFF', 2))
+CALLBACK_INBOX_MAX_BACKOFF = float(os.getenv('CALLBACK_INBOX_MAX_BACKOFF', 60))
+# A callback can arrive before the dispatcher has stored its correlation id:
+# the provider call may take DARAJA_READ_TIMEOUT and a stuck row is only
+# given up after PAYMENT_DISPATCH_STALE_SECONDS, so unmatched callbacks are
+# kept for longer than both.
+CALLBACK_INBOX_RETRY_WINDOW = float(os.getenv(
+    'CALLBACK_INBOX_RETRY_WINDOW', DARAJA_READ_TIMEOUT + PAYMENT_DISPATCH_STALE_SECONDS + 300,
+))
+
+INTEREST_ACCRUAL_CHUNK_SIZE = int(os.getenv('INTEREST_ACCRUAL_CHUNK_SIZE', 1000))
+
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 500))
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+
+LOAN_RECOMPUTE_CHUNK_SIZE = int(os.getenv('LOAN_RECOMPUTE_CHUNK_SIZE', 500))
+LOAN_OVERDUE_GRACE_DAYS = int(os.getenv('LOAN_OVERDUE_GRACE_DAYS', 0))
+LOAN_DELINQUENCY_CHUNK_SIZE = int(os.getenv('LOAN_DELINQUENCY_CHUNK_SIZE', 1000))
+
+GUARANTOR_EXPIRY_HOURS = int(os.getenv('GUARANTOR_EXPIRY_HOURS', 24))
+GUARANTOR_EXPIRY_BATCH_SIZE = int(os.getenv('GUARANTOR_EXPIRY_BATCH_SIZE', 500))
+GUARANTOR_EXPIRY_INTERVAL = float(os.getenv('GUARANTOR_EXPIRY_INTERVAL', 300))
+
+AUTH_TOKEN_TTL_HOURS = int(os.getenv('AUTH_TOKEN_TTL_HOURS', 24 * 7))
+AUTH_TOKEN_CACHE_SECONDS = int(os.getenv('AUTH_TOKEN_CACHE_SECONDS', 60))
+
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 100))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 8))
+EMAIL_OUTBOX_RETRY_BACKOFF = float(os.getenv('EMAIL_OUTBOX_RETRY_BACKOFF', 30))
+EMAIL_OUTBOX_MAX_BACKOFF = float(os.getenv('EMAIL_OUTBOX_MAX_BACKOFF', 3600))
+EMAIL_OUTBOX_CLAIM_SECONDS = float(os.getenv('EMAIL_OUTBOX_CLAIM_SECONDS', 300))
+
+FCM_PROJECT_ID = os.getenv('FCM_PROJECT_ID', '')
+FCM_BASE_URL = os.getenv('FCM_BASE_URL', 'https://fcm.googleapis.com')
+FCM_CREDENTIALS_FILE = os.getenv('FCM_CREDENTIALS_FILE', '')
+FCM_ACCESS_TOKEN = os.getenv('FCM_ACCESS_TOKEN', '')
+FCM_CONNECT_TIMEOUT = float(os.getenv('FCM_CONNECT_TIMEOUT', 5))
+FCM_READ_TIMEOUT = float(os.getenv('FCM_READ_TIMEOUT', 10))
+PUSH_BATCH_SIZE = int(os.getenv('PUSH_BATCH_SIZE', 500))
+PUSH_MAX_ATTEMPTS = int(os.getenv('PUSH_MAX_ATTEMPTS', 5))
+PUSH_WORKERS = int(os.getenv('PUSH_WORKERS', 8))
+PUSH_CLAIM_SECONDS = float(os.getenv('PUSH_CLAIM_SECONDS', 300))
+PUSH_RETRY_BACKOFF = float(os.getenv('PUSH_RETRY_BACKOFF', 30))
+PUSH_MAX_BACKOFF = float(os.getenv('PUSH_MAX_BACKOFF', 3600))
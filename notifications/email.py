@@ -0,0 +1,117 @@
+"""
+Email outbox. Requests call queue_email(), which only inserts a row, and
+the send_emails worker delivers due messages in batches over one SMTP
+connection per batch. A message that fails is retried with exponential
+backoff, starting at EMAIL_OUTBOX_RETRY_BACKOFF seconds and capped at
+EMAIL_OUTBOX_MAX_BACKOFF, until it has been tried EMAIL_OUTBOX_MAX_ATTEMPTS
+times. Messages are claimed in a short transaction and sent after it
+commits, as transaction.dispatch does for payments.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(to, subject, body, from_email=None):
+    return OutboundEmail.objects.create(to=to, subject=subject, body=body, from_email=from_email or '')
+
+
+def backoff(attempts):
+    delay = settings.EMAIL_OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.EMAIL_OUTBOX_MAX_BACKOFF))
+
+
+def due():
+    return OutboundEmail.objects.filter(
+        sent_at__isnull=True, failed_at__isnull=True, next_attempt_at__lte=timezone.now(),
+    )
+
+
+def claim_batch(limit):
+    """
+    Claim up to ``limit`` due messages and return them. SKIP LOCKED lets
+    several workers drain the outbox together; a claimed message is not due
+    again for EMAIL_OUTBOX_CLAIM_SECONDS, so one left behind by a crashed
+    worker is picked up once that lapses.
+    """
+    with transaction.atomic():
+        emails = list(due().select_for_update(skip_locked=True).order_by('next_attempt_at', 'id')[:limit])
+        if emails:
+            claimed_until = timezone.now() + timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_SECONDS)
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                attempts=F('attempts') + 1, next_attempt_at=claimed_until,
+            )
+    for email in emails:
+        email.attempts += 1
+    return emails
+
+
+def send_batch(batch_size=None, max_attempts=None, connection=None):
+    """
+    Send up to ``batch_size`` due messages over one connection. The rows are
+    claimed and committed first, so no lock is held while the mail server
+    is talking. Returns ``{'sent': n, 'retrying': n, 'failed': n}``.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    max_attempts = max_attempts or settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+    counts = {'sent': 0, 'retrying': 0, 'failed': 0}
+
+    emails = claim_batch(batch_size)
+    if not emails:
+        return counts
+    connection = connection or get_connection()
+    try:
+        connection.open()
+        opened = None
+    except Exception as e:
+        logger.warning("Could not connect to the mail server: %s", e)
+        opened = e
+
+    for email in emails:
+        error = opened
+        if error is None:
+            message = EmailMessage(
+                email.subject, email.body, email.from_email or settings.DEFAULT_FROM_EMAIL, [email.to],
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as e:
+                logger.warning("Email %s failed: %s", email.pk, e)
+                error = e
+        now = timezone.now()
+        if error is None:
+            email.sent_at, email.last_error = now, ''
+            counts['sent'] += 1
+        elif email.attempts >= max_attempts:
+            email.failed_at, email.last_error = now, str(error)
+            counts['failed'] += 1
+        else:
+            email.next_attempt_at, email.last_error = now + backoff(email.attempts), str(error)
+            counts['retrying'] += 1
+    if opened is None:
+        connection.close()
+
+    OutboundEmail.objects.bulk_update(emails, ['last_error', 'sent_at', 'failed_at', 'next_attempt_at'])
+    return counts
+
+
+def drain(batch_size=None, connection=None):
+    # Messages put back for a retry are not due again straight away, so this
+    # ends once every due message has been tried once.
+    totals = {'sent': 0, 'retrying': 0, 'failed': 0}
+    while True:
+        counts = send_batch(batch_size, connection=connection)
+        if not any(counts.values()):
+            return totals
+        for outcome, n in counts.items():
+            totals[outcome] += n
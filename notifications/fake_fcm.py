@@ -0,0 +1,87 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def respond(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        fake = self.server.fake
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not re.fullmatch(r'/v1/projects/[^/]+/messages:send', self.path):
+            return self.respond(404, {'error': {'code': 404, 'status': 'NOT_FOUND'}})
+        if self.headers.get('Authorization') != f'Bearer {fake.access_token}':
+            return self.respond(401, {'error': {'code': 401, 'status': 'UNAUTHENTICATED'}})
+
+        message = payload.get('message', {})
+        if fake.take_failure():
+            return self.respond(503, {'error': {'code': 503, 'status': 'UNAVAILABLE'}})
+        if message.get('token') in fake.dead_tokens:
+            return self.respond(404, {'error': {
+                'code': 404, 'status': 'NOT_FOUND',
+                'details': [{'@type': 'type.googleapis.com/google.firebase.fcm.v1.FcmError', 'errorCode': 'UNREGISTERED'}],
+            }})
+        if message.get('token') in fake.invalid_tokens:
+            return self.respond(400, {'error': {
+                'code': 400, 'status': 'INVALID_ARGUMENT',
+                'details': [{'@type': 'type.googleapis.com/google.firebase.fcm.v1.FcmError', 'errorCode': 'INVALID_ARGUMENT'}],
+            }})
+        with fake._lock:
+            fake.messages.append(message)
+            name = f'projects/fake/messages/{len(fake.messages)}'
+        self.respond(200, {'name': name})
+
+
+class FakeFCMServer:
+    """
+    Local stand-in for the FCM HTTP v1 send endpoint, for tests and local
+    runs. Accepted messages are kept in ``messages``. Tokens in
+    ``dead_tokens`` get UNREGISTERED, tokens in ``invalid_tokens`` get
+    INVALID_ARGUMENT, and the next ``fail_next`` sends get a 503. Use it as a context manager and point FCM_BASE_URL at ``url``, with
+    FCM_ACCESS_TOKEN set to ``access_token``.
+    """
+
+    access_token = 'fake-fcm-token'
+
+    def __init__(self, dead_tokens=(), invalid_tokens=(), fail_next=0):
+        self.dead_tokens = set(dead_tokens)
+        self.invalid_tokens = set(invalid_tokens)
+        self.fail_next = fail_next
+        self.messages = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        host, port = self._server.server_address
+        self.url = f'http://{host}:{port}'
+
+    def take_failure(self):
+        with self._lock:
+            if self.fail_next:
+                self.fail_next -= 1
+                return True
+            return False
+
+    @property
+    def tokens(self):
+        return [message['token'] for message in self.messages]
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
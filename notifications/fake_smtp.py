@@ -0,0 +1,84 @@
+import socketserver
+import threading
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server.fake
+        server.connections += 1
+        self.reply("220 fake-smtp ready")
+        message = None
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.reply("250-fake-smtp")
+                self.reply("250 8BITMIME")
+            elif verb in ('HELO', 'RSET', 'NOOP'):
+                self.reply("250 OK")
+            elif verb == 'MAIL':
+                message = {'from': command.split(':', 1)[1].strip(' <>'), 'to': []}
+                self.reply("250 OK")
+            elif verb == 'RCPT':
+                message['to'].append(command.split(':', 1)[1].strip(' <>'))
+                self.reply("250 OK")
+            elif verb == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data in iter(self.rfile.readline, b''):
+                    if data in (b'.\r\n', b'.\n'):
+                        break
+                    lines.append(data.decode(errors='replace'))
+                message['data'] = ''.join(lines)
+                if server.take_failure():
+                    self.reply("451 Temporary failure, try again later")
+                else:
+                    server.messages.append(message)
+                    self.reply("250 OK: queued")
+            elif verb == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class FakeSMTPServer:
+    """
+    Local SMTP server for tests and local runs. It accepts mail on
+    127.0.0.1 on a free port, keeps accepted messages in ``messages``,
+    counts connections, and rejects the next ``fail_next`` messages with a
+    temporary error. Use it as a context manager and point EMAIL_HOST and
+    EMAIL_PORT at ``host`` and ``port``.
+    """
+
+    def __init__(self, fail_next=0):
+        self.fail_next = fail_next
+        self.messages = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self.host, self.port = self._server.server_address
+
+    def take_failure(self):
+        with self._lock:
+            if self.fail_next:
+                self.fail_next -= 1
+                return True
+            return False
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,96 @@
+"""
+Firebase Cloud Messaging client. FCM's HTTP v1 API takes one token per
+request (the legacy multicast endpoint has been retired), so
+send_multicast() sends to each token in parallel over one pooled session,
+as the Admin SDK's send_each_for_multicast does.
+
+Authentication uses FCM_ACCESS_TOKEN when set (the fake server and
+short-lived tokens minted elsewhere), otherwise the service account in
+FCM_CREDENTIALS_FILE, which needs the google-auth package.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+
+SCOPE = 'https://www.googleapis.com/auth/firebase.messaging'
+# Errors that mean the token will never work again. INVALID_ARGUMENT is left
+# out: FCM also returns it for a bad payload, which says nothing about the token.
+DEAD_TOKEN_ERRORS = frozenset({'UNREGISTERED', 'SENDER_ID_MISMATCH'})
+UNAVAILABLE = 'UNAVAILABLE'
+
+_credentials = None
+_credentials_lock = threading.Lock()
+
+
+def access_token():
+    global _credentials
+    if settings.FCM_ACCESS_TOKEN:
+        return settings.FCM_ACCESS_TOKEN
+    if not settings.FCM_CREDENTIALS_FILE:
+        raise ImproperlyConfigured("Set FCM_CREDENTIALS_FILE or FCM_ACCESS_TOKEN to send push notifications.")
+    try:
+        from google.auth.transport.requests import Request
+        from google.oauth2 import service_account
+    except ImportError:
+        raise ImproperlyConfigured("FCM_CREDENTIALS_FILE needs the google-auth package.")
+    with _credentials_lock:
+        if _credentials is None:
+            _credentials = service_account.Credentials.from_service_account_file(
+                settings.FCM_CREDENTIALS_FILE, scopes=[SCOPE],
+            )
+        if not _credentials.valid:
+            _credentials.refresh(Request())
+        return _credentials.token
+
+
+def error_code(response):
+    """The FCM error code of a failed send, e.g. UNREGISTERED, or UNAVAILABLE for transient failures."""
+    if response.status_code == 429 or response.status_code >= 500:
+        return UNAVAILABLE
+    try:
+        error = response.json()['error']
+    except (ValueError, KeyError, TypeError):
+        return UNAVAILABLE
+    for detail in error.get('details', []):
+        if detail.get('errorCode'):
+            return detail['errorCode']
+    return error.get('status') or UNAVAILABLE
+
+
+class FCMClient:
+
+    def __init__(self, base_url=None, project_id=None, workers=None):
+        self.base_url = (base_url or settings.FCM_BASE_URL).rstrip('/')
+        self.project_id = project_id or settings.FCM_PROJECT_ID
+        self.workers = workers or settings.PUSH_WORKERS
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def send(self, token, title, body, data=None, bearer=None):
+        """None on success, else the FCM error code."""
+        message = {'token': token, 'notification': {'title': title, 'body': body}}
+        if data:
+            message['data'] = {key: str(value) for key, value in data.items()}
+        try:
+            response = self.session.post(
+                f'{self.base_url}/v1/projects/{self.project_id}/messages:send',
+                json={'message': message},
+                headers={'Authorization': f'Bearer {bearer or access_token()}'},
+                timeout=(settings.FCM_CONNECT_TIMEOUT, settings.FCM_READ_TIMEOUT),
+            )
+        except requests.RequestException:
+            return UNAVAILABLE
+        return None if response.ok else error_code(response)
+
+    def send_multicast(self, tokens, title, body, data=None):
+        """``{token: None or error code}`` for one message sent to every token."""
+        bearer = access_token()
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(tokens)) or 1) as pool:
+            results = pool.map(lambda token: self.send(token, title, body, data, bearer), tokens)
+            return dict(zip(tokens, results))
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notifications.email import drain
+
+
+class Command(BaseCommand):
+    help = "Send queued emails from the email outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox instead of exiting when it is empty.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to sleep between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            totals = drain(options['batch_size'])
+            if any(totals.values()):
+                self.stdout.write(
+                    f"Sent {totals['sent']} email(s), {totals['retrying']} to retry, {totals['failed']} failed"
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notifications.fcm import FCMClient
+from notifications.push import drain
+
+
+class Command(BaseCommand):
+    help = "Send queued notifications as FCM push messages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.PUSH_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Keep polling instead of exiting when nothing is queued.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to sleep between polls with --loop.")
+
+    def handle(self, *args, **options):
+        client = FCMClient()
+        while True:
+            handled, totals = drain(client, options['batch_size'])
+            if handled:
+                summary = ", ".join(f"{outcome} {n}" for outcome, n in sorted(totals.items()))
+                self.stdout.write(f"Handled {handled} notification(s): {summary}")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
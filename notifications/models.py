@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class Notification(models.Model):
+    """A message for one user, queued by notifications.outbox and delivered by a worker."""
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=40)
+    message = models.TextField()
+    # Queuing the same event twice (e.g. a job retried after a crash) is a no-op.
+    dedupe_key = models.CharField(max_length=120, unique=True, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set once the push is delivered, or given up on; outcome says which.
+    sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    outcome = models.CharField(max_length=30, blank=True)
+    # Set while a push worker is sending the row; a claim that outlives it
+    # (a crashed worker) can be taken over.
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(sent_at__isnull=True), name='notification_unsent'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for user {self.user_id}"
+
+
+class OutboundEmail(models.Model):
+    """An email queued by notifications.email and sent by the send_emails worker."""
+
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # Set when the message runs out of attempts; it is not retried after that.
+    failed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at', 'id'],
+                condition=models.Q(sent_at__isnull=True, failed_at__isnull=True),
+                name='outbound_email_due',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to}"
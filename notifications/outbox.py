@@ -0,0 +1,24 @@
+from .models import Notification
+
+
+def enqueue(user_id, kind, message, dedupe_key=None):
+    return enqueue_many([(user_id, kind, message, dedupe_key)])
+
+
+def enqueue_many(rows):
+    """
+    Queue ``(user_id, kind, message, dedupe_key)`` rows, skipping dedupe keys
+    already queued. Returns the notifications inserted.
+    """
+    rows = list(rows)
+    keys = [dedupe_key for *_, dedupe_key in rows if dedupe_key]
+    seen = set(Notification.objects.filter(dedupe_key__in=keys).values_list('dedupe_key', flat=True)) if keys else set()
+    notifications = []
+    for user_id, kind, message, dedupe_key in rows:
+        if dedupe_key:
+            if dedupe_key in seen:
+                continue
+            seen.add(dedupe_key)
+        notifications.append(Notification(user_id=user_id, kind=kind, message=message, dedupe_key=dedupe_key))
+    # ignore_conflicts still covers a key queued concurrently after the check.
+    return Notification.objects.bulk_create(notifications, ignore_conflicts=True)
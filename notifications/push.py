@@ -0,0 +1,145 @@
+"""
+Push delivery for queued Notification rows. Requests only insert rows
+through notifications.outbox; the send_push worker claims unsent rows in
+batches, groups them by message so each distinct message goes out as one
+multicast to every recipient's firebase_token, and records the outcome.
+
+A recipient is sent one copy of a message however many rows carry it.
+Tokens FCM reports as dead are cleared from their users. Rows for users
+without a token are closed as 'no_token', and other failures are retried
+with exponential backoff, starting at PUSH_RETRY_BACKOFF seconds and
+capped at PUSH_MAX_BACKOFF, until PUSH_MAX_ATTEMPTS. Rows are claimed in a
+short transaction and sent after it commits, as transaction.dispatch does
+for payments.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from users.models import User
+from .fcm import DEAD_TOKEN_ERRORS, FCMClient
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+# FCM accepts at most 500 tokens per multicast.
+MULTICAST_LIMIT = 500
+
+TITLES = {
+    'loan_approved': "Loan approved",
+    'loan_rejected': "Loan rejected",
+    'guarantor_request': "Guarantor request",
+    'guarantor_approved': "Guarantor approved",
+    'guarantor_rejected': "Guarantor rejected",
+    'guarantor_expired': "Guarantor request expired",
+}
+
+
+def backoff(attempts):
+    delay = settings.PUSH_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.PUSH_MAX_BACKOFF))
+
+
+def claim_batch(limit, after_id=0):
+    """
+    Claim up to ``limit`` unsent notifications with ids above ``after_id``
+    for PUSH_CLAIM_SECONDS and return them with their users. SKIP LOCKED
+    lets several workers drain the outbox without claiming the same rows.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Notification.objects.select_for_update(skip_locked=True)
+            .filter(Q(claimed_until__isnull=True) | Q(claimed_until__lte=now), sent_at__isnull=True, id__gt=after_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Notification.objects.filter(pk__in=ids).update(
+            attempts=F('attempts') + 1, claimed_until=now + timedelta(seconds=settings.PUSH_CLAIM_SECONDS),
+        )
+    return list(Notification.objects.filter(pk__in=ids).select_related('user').order_by('id'))
+
+
+def send_batch(client, batch_size=None, max_attempts=None, after_id=0):
+    """
+    Push up to ``batch_size`` unsent notifications with ids above
+    ``after_id``. The rows are claimed and committed before FCM is called,
+    so no lock is held while sending. Returns the number of rows handled, a
+    count per outcome and the last id seen.
+    """
+    batch_size = batch_size or settings.PUSH_BATCH_SIZE
+    max_attempts = max_attempts or settings.PUSH_MAX_ATTEMPTS
+    counts = {}
+
+    rows = claim_batch(batch_size, after_id)
+    groups = defaultdict(list)
+    for row in rows:
+        if row.user.firebase_token:
+            groups[(row.kind, row.message)].append(row.user.firebase_token)
+
+    results, dead = {}, set()
+    for (kind, message), tokens in groups.items():
+        tokens = list(dict.fromkeys(tokens))
+        for start in range(0, len(tokens), MULTICAST_LIMIT):
+            chunk = tokens[start:start + MULTICAST_LIMIT]
+            try:
+                sent = client.send_multicast(chunk, TITLES.get(kind, "MalipoFlex"), message, {'kind': kind})
+            except Exception as e:
+                # Missing credentials or a broken transport: the rows are
+                # retried like any other failure instead of stopping the worker.
+                logger.warning("Push of %r to %s token(s) failed: %s", kind, len(chunk), e)
+                sent = dict.fromkeys(chunk, str(e) or type(e).__name__)
+            for token, error in sent.items():
+                results[(kind, message, token)] = error
+                if error in DEAD_TOKEN_ERRORS:
+                    dead.add(token)
+
+    now = timezone.now()
+    for row in rows:
+        token = row.user.firebase_token
+        if not token:
+            row.outcome = 'no_token'
+        else:
+            error = results[(row.kind, row.message, token)]
+            if error is None:
+                row.outcome = 'sent'
+            elif token in dead:
+                row.outcome = 'dead_token'
+            elif row.attempts >= max_attempts:
+                row.outcome = 'failed'
+            else:
+                row.outcome = 'retrying'
+                logger.warning("Push for notification %s failed: %s", row.pk, error)
+        if row.outcome == 'retrying':
+            row.claimed_until = now + backoff(row.attempts)
+        else:
+            row.sent_at, row.claimed_until = now, None
+        counts[row.outcome] = counts.get(row.outcome, 0) + 1
+
+    with transaction.atomic():
+        Notification.objects.bulk_update(rows, ['outcome', 'sent_at', 'claimed_until'])
+        if dead:
+            User.objects.filter(firebase_token__in=dead).update(firebase_token=None)
+    last_id = rows[-1].pk if rows else after_id
+    return len(rows), counts, last_id
+
+
+def drain(client=None, batch_size=None):
+    # Walk the unsent rows once by id so rows left for retry wait for the
+    # next drain instead of being retried straight away.
+    client = client or FCMClient()
+    totals, handled, last_id = {}, 0, 0
+    while True:
+        count, counts, last_id = send_batch(client, batch_size, after_id=last_id)
+        if count == 0:
+            return handled, totals
+        handled += count
+        for outcome, n in counts.items():
+            totals[outcome] = totals.get(outcome, 0) + n
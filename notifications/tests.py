@@ -0,0 +1,183 @@
+import socket
+from decimal import Decimal
+
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from loans.models import LoanAccount
+from savings.models import SavingsAccount
+from users.models import User
+from . import push
+from .email import claim_batch, drain, due, queue_email
+from .fake_fcm import FakeFCMServer
+from .fake_smtp import FakeSMTPServer
+from .fcm import FCMClient
+from .models import Notification, OutboundEmail
+from .outbox import enqueue, enqueue_many
+
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@override_settings(EMAIL_BACKEND=SMTP_BACKEND, EMAIL_USE_TLS=False, EMAIL_HOST='127.0.0.1',
+                   EMAIL_HOST_PASSWORD='', EMAIL_OUTBOX_RETRY_BACKOFF=0)
+class EmailOutboxTests(TestCase):
+
+    def smtp(self, server):
+        return get_connection(host=server.host, port=server.port, username='', password='')
+
+    def test_registration_queues_instead_of_sending(self):
+        with override_settings(EMAIL_PORT=unused_port()):
+            response = APIClient().post('/api/api/register/', {
+                'first_name': 'New', 'last_name': 'Member', 'user_type': 'member', 'phone_number': '+254794000000',
+                'password': 'pw-123456', 'national_id': '1234', 'next_of_kin_name': 'Kin', 'email': 'new@example.com',
+            })
+        self.assertEqual(response.status_code, 201)
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.to, email.sent_at), ('new@example.com', None))
+
+    def test_batch_is_sent_over_one_connection(self):
+        for i in range(3):
+            queue_email(f'member{i}@example.com', 'Hello', f'Message {i}')
+        with FakeSMTPServer() as server:
+            self.assertEqual(drain(connection=self.smtp(server)), {'sent': 3, 'retrying': 0, 'failed': 0})
+        self.assertEqual(server.connections, 1)
+        self.assertEqual([m['to'] for m in server.messages], [[f'member{i}@example.com'] for i in range(3)])
+        self.assertFalse(OutboundEmail.objects.filter(sent_at__isnull=True).exists())
+
+    @override_settings(EMAIL_OUTBOX_RETRY_BACKOFF=60)
+    def test_failures_back_off_then_retry(self):
+        email = queue_email('member@example.com', 'Hello', 'Body')
+        with FakeSMTPServer(fail_next=1) as server, self.assertLogs('notifications.email', 'WARNING'):
+            self.assertEqual(drain(connection=self.smtp(server)), {'sent': 0, 'retrying': 1, 'failed': 0})
+            email.refresh_from_db()
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertIn('451', email.last_error)
+
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(drain(connection=self.smtp(server))['sent'], 1)
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 2)
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=3)
+    def test_gives_up_when_the_server_stays_down(self):
+        queue_email('member@example.com', 'Hello', 'Body')
+        connection = get_connection(host='127.0.0.1', port=unused_port(), timeout=1)
+        with self.assertLogs('notifications.email', 'WARNING') as logs:
+            self.assertEqual(drain(connection=connection), {'sent': 0, 'retrying': 2, 'failed': 1})
+        self.assertEqual(len(logs.output), 3)
+        self.assertIsNotNone(OutboundEmail.objects.get().failed_at)
+
+
+    def test_messages_are_claimed_before_sending(self):
+        queue_email('member@example.com', 'Hello', 'Body')
+        seen = []
+
+        class RecordingBackend(BaseEmailBackend):
+            def send_messages(self, messages):
+                # Sent after the claim: the row is no longer due for another worker.
+                seen.append((due().exists(), OutboundEmail.objects.get().attempts))
+                return len(messages)
+
+        self.assertEqual(drain(connection=RecordingBackend()), {'sent': 1, 'retrying': 0, 'failed': 0})
+        self.assertEqual(seen, [(False, 1)])
+
+    def test_claim_left_by_a_crashed_worker_lapses(self):
+        queue_email('member@example.com', 'Hello', 'Body')
+        self.assertEqual(len(claim_batch(10)), 1)
+        self.assertFalse(due().exists())
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(len(claim_batch(10)), 1)
+
+
+@override_settings(FCM_ACCESS_TOKEN=FakeFCMServer.access_token)
+class PushFanOutTests(TestCase):
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                email=f'push{i}@example.com', password='pw', phone_number=f'+25479500000{i}', firebase_token=token,
+            )
+            for i, token in enumerate(['tok-0', 'tok-1', 'tok-dead', None])
+        ]
+
+    def client_for(self, server):
+        return FCMClient(base_url=server.url, project_id='malipoflex-test')
+
+    def test_messages_fan_out_once_per_token_and_dead_tokens_are_dropped(self):
+        enqueue_many([(user.pk, 'loan_approved', 'Approved', f'approved:{user.pk}') for user in self.users])
+        enqueue(self.users[0].pk, 'loan_approved', 'Approved', 'approved:again')
+        enqueue(self.users[0].pk, 'loan_approved', 'Approved', 'approved:again')
+        enqueue(self.users[1].pk, 'guarantor_request', 'Please respond')
+
+        with FakeFCMServer(dead_tokens={'tok-dead'}) as server:
+            handled, totals = push.drain(self.client_for(server))
+        self.assertEqual(handled, 6)
+        self.assertEqual(totals, {'sent': 4, 'dead_token': 1, 'no_token': 1})
+        self.assertEqual(sorted(server.tokens), ['tok-0', 'tok-1', 'tok-1'])
+        self.assertEqual(server.messages[0]['notification']['title'], 'Loan approved')
+        self.assertIsNone(User.objects.get(pk=self.users[2].pk).firebase_token)
+        self.assertFalse(Notification.objects.filter(sent_at__isnull=True).exists())
+
+    @override_settings(PUSH_RETRY_BACKOFF=60)
+    def test_transient_failures_back_off_then_retry(self):
+        enqueue(self.users[0].pk, 'loan_rejected', 'Rejected')
+        with FakeFCMServer(fail_next=1) as server, self.assertLogs('notifications.push', 'WARNING'):
+            self.assertEqual(push.drain(self.client_for(server))[1], {'retrying': 1})
+            self.assertGreater(Notification.objects.get().claimed_until, timezone.now())
+            self.assertEqual(push.drain(self.client_for(server)), (0, {}))
+
+            Notification.objects.update(claimed_until=timezone.now())
+            self.assertEqual(push.drain(self.client_for(server))[1], {'sent': 1})
+        self.assertEqual(Notification.objects.get().attempts, 2)
+
+    @override_settings(FCM_ACCESS_TOKEN='', FCM_CREDENTIALS_FILE='', PUSH_MAX_ATTEMPTS=2, PUSH_RETRY_BACKOFF=0)
+    def test_credential_errors_are_retried_not_raised(self):
+        enqueue(self.users[0].pk, 'loan_rejected', 'Rejected')
+        with FakeFCMServer() as server, self.assertLogs('notifications.push', 'WARNING'):
+            self.assertEqual(push.drain(self.client_for(server))[1], {'retrying': 1})
+            self.assertEqual(push.drain(self.client_for(server))[1], {'failed': 1})
+        notification = Notification.objects.get()
+        self.assertEqual((notification.attempts, notification.claimed_until), (2, None))
+        self.assertIsNotNone(notification.sent_at)
+
+    def test_invalid_argument_does_not_drop_the_token(self):
+        enqueue(self.users[0].pk, 'loan_rejected', 'Rejected')
+        with FakeFCMServer(invalid_tokens={'tok-0'}) as server, self.assertLogs('notifications.push', 'WARNING'):
+            self.assertEqual(push.drain(self.client_for(server))[1], {'retrying': 1})
+        self.assertEqual(User.objects.get(pk=self.users[0].pk).firebase_token, 'tok-0')
+
+    def test_rows_are_claimed_before_sending(self):
+        enqueue(self.users[0].pk, 'loan_rejected', 'Rejected')
+        seen = []
+
+        class RecordingClient:
+            def send_multicast(self, tokens, title, body, data=None):
+                # Called after the claim committed: another worker would skip the row.
+                seen.append(push.claim_batch(10))
+                return {token: None for token in tokens}
+
+        self.assertEqual(push.drain(RecordingClient())[1], {'sent': 1})
+        self.assertEqual(seen, [[]])
+        notification = Notification.objects.get()
+        self.assertEqual((notification.attempts, notification.claimed_until), (1, None))
+
+    def test_approval_queues_the_push_without_sending(self):
+        SavingsAccount.objects.create(member=self.users[0], member_account_balance=Decimal('1000.00'))
+        loan = LoanAccount.objects.create(
+            member=self.users[0], requested_amount=Decimal('100.00'), timeline_months=1, loan_status='PENDING_MANAGER',
+        )
+        with override_settings(FCM_BASE_URL=f'http://127.0.0.1:{unused_port()}'):
+            response = APIClient().post(f'/api/loanAccounts/{loan.pk}/approve/', {'action': 'approve'})
+        self.assertEqual(response.status_code, 200)
+        notification = Notification.objects.get()
+        self.assertEqual((notification.kind, notification.user_id, notification.sent_at),
+                         ('loan_approved', self.users[0].pk, None))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from pension.remittance import remit_pending_contributions
+
+
+class Command(BaseCommand):
+    help = "Queue one B2B transfer per pension provider for all unremitted contributions."
+
+    def handle(self, *args, **options):
+        remittances = remit_pending_contributions()
+        for trans in remittances:
+            self.stdout.write(f"Transaction {trans.id}: KES {trans.amount_transacted} to paybill {trans.paybill_number}")
+        self.stdout.write(f"Queued {len(remittances)} pension remittance(s).")
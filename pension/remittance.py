@@ -0,0 +1,65 @@
+import logging
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+
+from savings.models import SavingsContribution
+from transaction.models import Transaction
+from .models import PensionAccount
+
+logger = logging.getLogger(__name__)
+
+
+def pending_contributions():
+    provider = PensionAccount.objects.filter(
+        member=OuterRef('member'),
+        provider__status='active',
+    ).order_by('-updated_at')
+    # Shares from a failed transfer are picked up again on the next cycle.
+    return SavingsContribution.objects.filter(
+        Q(transaction_id_b2b__isnull=True) | Q(transaction_id_b2b__payment_transaction_status='failed'),
+        pension_amount__gt=0,
+    ).annotate(
+        provider_id=Subquery(provider.values('provider_id')[:1]),
+        paybill_number=Subquery(provider.values('provider__payBill_number')[:1]),
+    ).filter(provider_id__isnull=False)
+
+
+def remit_pending_contributions():
+    """
+    Group every unremitted pension share by provider paybill and queue one
+    B2B transfer per paybill. The transfers go out through the payment
+    outbox; b2b_callback credits each linked contribution on success.
+    """
+    groups = OrderedDict()
+    with transaction.atomic():
+        rows = (
+            pending_contributions()
+            .select_for_update(skip_locked=True, of=('self',))
+            .order_by('id')
+            .values_list('id', 'provider_id', 'paybill_number', 'pension_amount')
+        )
+        for pk, provider_id, paybill_number, amount in rows:
+            group = groups.setdefault(paybill_number, {'provider_id': provider_id, 'ids': [], 'total': Decimal('0.00')})
+            group['ids'].append(pk)
+            group['total'] += amount
+
+        remittances = []
+        for paybill_number, group in groups.items():
+            trans = Transaction.objects.create(
+                transaction_type='B2B',
+                account_type='pension_contribution',
+                amount_transacted=group['total'],
+                paybill_number=paybill_number,
+                provider_id=group['provider_id'],
+                payment_transaction_status='queued',
+                description=f"Pension remittance for {len(group['ids'])} contribution(s)",
+            )
+            SavingsContribution.objects.filter(pk__in=group['ids']).update(transaction_id_b2b=trans)
+            remittances.append(trans)
+
+    for trans in remittances:
+        logger.info("Queued pension remittance %s: KES %s to %s", trans.pk, trans.amount_transacted, trans.paybill_number)
+    return remittances
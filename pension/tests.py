@@ -1,6 +1,10 @@
+from decimal import Decimal
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from savings.models import SavingsAccount, SavingsContribution
+from transaction.models import Transaction
 from .models import PensionProvider, PensionAccount
+from .remittance import remit_pending_contributions
 
 User = get_user_model()
 
@@ -58,4 +62,56 @@ class PensionAccountModelTests(TestCase):
             is_opted_in=False,
             contribution_percentage=3.50,
         )
-        self.assertEqual(str(pension_account), f"PensionAccount {self.user}")
\ No newline at end of file
+        self.assertEqual(str(pension_account), f"PensionAccount {self.user}")
+
+
+class PensionRemittanceTests(TestCase):
+
+    def setUp(self):
+        self.provider_a = PensionProvider.objects.create(name='Provider A', payBill_number='600100', status='active')
+        self.provider_b = PensionProvider.objects.create(name='Provider B', payBill_number='600200', status='active')
+        self.members = []
+        for i, provider in enumerate([self.provider_a, self.provider_a, self.provider_b]):
+            member = User.objects.create_user(
+                email=f'member{i}@example.com',
+                password='testpass123',
+                phone_number=f'+25471000000{i}',
+            )
+            PensionAccount.objects.create(
+                member=member, is_opted_in=True, contribution_percentage=Decimal('10.00'), provider=provider
+            )
+            SavingsAccount.objects.create(member=member)
+            self.members.append(member)
+
+    def contribute(self, member, amount):
+        return SavingsContribution.objects.create(
+            member=member, saving=member.savings_account, contributed_amount=Decimal(amount)
+        )
+
+    def test_contribution_only_records_pension_share(self):
+        contribution = self.contribute(self.members[0], '1000.00')
+        self.assertEqual(contribution.pension_amount, Decimal('100.00'))
+        self.assertIsNone(contribution.transaction_id_b2b)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_one_transfer_per_provider_per_cycle(self):
+        for member in self.members:
+            self.contribute(member, '1000.00')
+            self.contribute(member, '500.00')
+
+        remittances = remit_pending_contributions()
+
+        self.assertEqual(len(remittances), 2)
+        totals = {t.paybill_number: t.amount_transacted for t in remittances}
+        self.assertEqual(totals, {'600100': Decimal('300.00'), '600200': Decimal('150.00')})
+        self.assertFalse(SavingsContribution.objects.filter(transaction_id_b2b__isnull=True).exists())
+        self.assertEqual(remit_pending_contributions(), [])
+
+    def test_failed_transfer_is_remitted_again(self):
+        self.contribute(self.members[2], '1000.00')
+        first, = remit_pending_contributions()
+        Transaction.objects.filter(pk=first.pk).update(payment_transaction_status='failed')
+
+        second, = remit_pending_contributions()
+        self.assertNotEqual(first.pk, second.pk)
+        self.assertEqual(second.amount_transacted, Decimal('100.00'))
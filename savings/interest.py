@@ -0,0 +1,198 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .models import InterestAccrual, InterestAccrualRun, SavingsAccount
+
+ANNUAL_RATE = Decimal('0.025')
+DAILY_RATE = (ANNUAL_RATE / Decimal('365')).quantize(Decimal('1E-10'))
+CENT = Decimal('0.01')
+
+RATES = {
+    'daily': DAILY_RATE,
+    'annual': ANNUAL_RATE,
+}
+
+
+def interest_for(balance, rate):
+    return (Decimal(balance) * rate).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def period_start(accrual_date, period):
+    """The date a run is keyed on: the day for daily runs, 1 January for annual ones."""
+    return accrual_date.replace(month=1, day=1) if period == 'annual' else accrual_date
+
+
+def queue_accrual(accrual_date, period='annual'):
+    """
+    The run for the period containing ``accrual_date``, created if there is
+    none yet, and whether it was created. A queued run is applied by
+    accrue_interest() or resume_pending().
+    """
+    if period == 'daily':
+        raise ValueError("Daily interest is posted with post_daily_interest().")
+    # Runs recorded before annual runs were keyed on 1 January may carry any
+    # date in their year.
+    run = InterestAccrualRun.objects.filter(period=period, accrual_date__year=accrual_date.year).first()
+    if run:
+        return run, False
+    return InterestAccrualRun.objects.get_or_create(
+        accrual_date=period_start(accrual_date, period),
+        period=period,
+        defaults={'rate': RATES[period]},
+    )
+
+
+def accrue_interest(accrual_date, period='daily', chunk_size=None):
+    """
+    Credit one period of interest to every savings account, at most once per
+    period: annual runs are keyed on the year of ``accrual_date``. Accounts
+    are processed in primary-key chunks, each chunk locked, updated with
+    bulk_update and checkpointed on the run in the same transaction, so an
+    interrupted run resumes where it stopped. Returns the
+    InterestAccrualRun and whether this call applied anything.
+
+    This capitalises interest into the balance; daily accrual, which only
+    records interest, is post_daily_interest.
+    """
+    if period == 'daily':
+        raise ValueError("Daily interest is posted with post_daily_interest().")
+    chunk_size = chunk_size or settings.INTEREST_ACCRUAL_CHUNK_SIZE
+    run, _ = queue_accrual(accrual_date, period)
+    applied = False
+
+    while True:
+        with transaction.atomic():
+            run = InterestAccrualRun.objects.select_for_update().get(pk=run.pk)
+            if run.completed_at:
+                return run, applied
+            accounts = list(
+                SavingsAccount.objects.select_for_update()
+                .filter(pk__gt=run.last_account_id)
+                .order_by('pk')
+                .only('pk', 'member_account_balance', 'interest_incurred')[:chunk_size]
+            )
+            if not accounts:
+                run.completed_at = timezone.now()
+                run.save(update_fields=['completed_at'])
+                return run, applied
+
+            now = timezone.now()
+            changed = []
+            for account in accounts:
+                interest = interest_for(account.member_account_balance, run.rate)
+                if interest:
+                    account.member_account_balance += interest
+                    account.interest_incurred += interest
+                    account.updated_at = now
+                    run.total_interest += interest
+                    changed.append(account)
+            SavingsAccount.objects.bulk_update(
+                changed, ['member_account_balance', 'interest_incurred', 'updated_at']
+            )
+            run.last_account_id = accounts[-1].pk
+            run.accounts_processed += len(accounts)
+            run.save(update_fields=['last_account_id', 'accounts_processed', 'total_interest'])
+            applied = True
+
+
+def resume_pending(chunk_size=None):
+    """Apply every queued or interrupted capitalising run. Returns the runs applied."""
+    applied = []
+    for run in InterestAccrualRun.objects.exclude(period='daily').filter(completed_at__isnull=True).order_by('pk'):
+        run, changed = accrue_interest(run.accrual_date, run.period, chunk_size)
+        if changed:
+            applied.append(run)
+    return applied
+
+
+def roll_forward(run, previous_date, unchanged_before):
+    """
+    Copy the previous posting's rows to the run's date, tagged with the run,
+    for every account not updated since ``unchanged_before``, in one
+    INSERT ... SELECT. Accounts that already have a row for the date (one
+    written by apply_daily_interest) are skipped.
+    """
+    ledger = connection.ops.quote_name(InterestAccrual._meta.db_table)
+    accounts = connection.ops.quote_name(SavingsAccount._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {ledger} (account_id, accrual_date, run_id, balance, rate, interest) "
+            f"SELECT a.account_id, %s, %s, a.balance, a.rate, a.interest "
+            f"FROM {ledger} a INNER JOIN {accounts} s ON s.id = a.account_id "
+            f"WHERE a.accrual_date = %s AND s.updated_at < %s "
+            f"AND NOT EXISTS (SELECT 1 FROM {ledger} t WHERE t.account_id = a.account_id AND t.accrual_date = %s)",
+            [
+                connection.ops.adapt_datefield_value(run.accrual_date),
+                run.pk,
+                connection.ops.adapt_datefield_value(previous_date),
+                connection.ops.adapt_datetimefield_value(unchanged_before),
+                connection.ops.adapt_datefield_value(run.accrual_date),
+            ],
+        )
+        return cursor.rowcount
+
+
+def post_daily_interest(accrual_date, chunk_size=None):
+    """
+    Record one day of interest in the InterestAccrual ledger and add it to
+    interest_incurred. Only accounts updated since the previous posting
+    are recomputed in Python; the rest repeat their previous row. The
+    balance itself is not touched, so posting does not mark accounts as
+    changed for the next day. Returns the run and whether it was applied.
+    """
+    chunk_size = chunk_size or settings.INTEREST_ACCRUAL_CHUNK_SIZE
+    with transaction.atomic():
+        run, created = InterestAccrualRun.objects.select_for_update().get_or_create(
+            accrual_date=accrual_date,
+            period='daily',
+            defaults={'rate': DAILY_RATE},
+        )
+        if run.completed_at:
+            return run, False
+
+        previous = (
+            InterestAccrualRun.objects.filter(period='daily', accrual_date__lt=accrual_date, completed_at__isnull=False)
+            .order_by('-accrual_date')
+            .first()
+        )
+        changed = SavingsAccount.objects.all()
+        if previous:
+            # Rolling forward first means an account updated mid-run has
+            # already been copied and is skipped below by ignore_conflicts.
+            run.accounts_rolled_forward = roll_forward(run, previous.accrual_date, previous.started_at)
+            changed = changed.filter(updated_at__gte=previous.started_at)
+
+        rows = changed.order_by('pk').values_list('pk', 'member_account_balance')
+        batch = []
+        for pk, balance in rows.iterator(chunk_size=chunk_size):
+            interest = interest_for(balance, run.rate)
+            if interest:
+                batch.append(InterestAccrual(
+                    account_id=pk, accrual_date=accrual_date, run=run,
+                    balance=balance, rate=run.rate, interest=interest,
+                ))
+            run.accounts_processed += 1
+            if len(batch) >= chunk_size:
+                InterestAccrual.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        InterestAccrual.objects.bulk_create(batch, ignore_conflicts=True)
+
+        # Only rows this run inserted are credited: a row already written by
+        # apply_daily_interest was credited when it was written and is left
+        # in place by ignore_conflicts.
+        posted = InterestAccrual.objects.filter(run=run)
+        SavingsAccount.objects.filter(pk__in=posted.values('account_id')).update(
+            interest_incurred=F('interest_incurred') + Subquery(
+                posted.filter(account_id=OuterRef('pk')).values('interest')[:1]
+            )
+        )
+
+        run.total_interest = posted.aggregate(total=Sum('interest'))['total'] or Decimal('0.00')
+        run.last_account_id = 0
+        run.completed_at = timezone.now()
+        run.save()
+    return run, True
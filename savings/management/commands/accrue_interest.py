@@ -0,0 +1,50 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from savings.interest import RATES, accrue_interest, post_daily_interest, resume_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Post daily interest to the accrual ledger, or capitalise annual interest, once per period. "
+        "With --pending, apply the capitalising runs queued by the apply_interest endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Accrual date as YYYY-MM-DD (defaults to today).")
+        parser.add_argument('--period', choices=sorted(RATES), default='daily')
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument('--pending', action='store_true', help="Apply queued or interrupted capitalising runs.")
+        parser.add_argument('--loop', action='store_true', help="With --pending, keep polling for queued runs.")
+        parser.add_argument('--interval', type=float, default=30.0, help="Seconds to sleep between polls with --loop.")
+
+    def report(self, run, applied):
+        state = "Applied" if applied else "Already applied"
+        self.stdout.write(
+            f"{state} {run.period} interest for {run.accrual_date}: "
+            f"{run.accounts_processed} account(s) recomputed, {run.accounts_rolled_forward} rolled forward, "
+            f"KES {run.total_interest}"
+        )
+
+    def handle(self, *args, **options):
+        if options['pending']:
+            while True:
+                for run in resume_pending(options['chunk_size']):
+                    self.report(run, True)
+                if not options['loop']:
+                    return
+                time.sleep(options['interval'])
+
+        try:
+            accrual_date = date.fromisoformat(options['date']) if options['date'] else timezone.localdate()
+        except ValueError:
+            raise CommandError("--date must be YYYY-MM-DD")
+
+        if options['period'] == 'daily':
+            run, applied = post_daily_interest(accrual_date, options['chunk_size'])
+        else:
+            run, applied = accrue_interest(accrual_date, options['period'], options['chunk_size'])
+        self.report(run, applied)
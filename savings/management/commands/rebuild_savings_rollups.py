@@ -0,0 +1,19 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+
+from savings.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the monthly savings rollups from the contributions table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help="Only rebuild this month, as YYYY-MM (defaults to every month).")
+
+    def handle(self, *args, **options):
+        month = options['month']
+        if month and not re.fullmatch(r'\d{4}-(0[1-9]|1[0-2])', month):
+            raise CommandError("--month must be YYYY-MM")
+        created = rebuild(month)
+        self.stdout.write(f"Rebuilt {created} monthly savings rollup(s) for {month or 'all months'}")
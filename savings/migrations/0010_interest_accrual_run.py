@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:52
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("savings", "0009_alter_savingsaccount_member"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InterestAccrualRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("accrual_date", models.DateField()),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("daily", "Daily"), ("annual", "Annual")],
+                        max_length=10,
+                    ),
+                ),
+                ("rate", models.DecimalField(decimal_places=10, max_digits=12)),
+                ("last_account_id", models.BigIntegerField(default=0)),
+                ("accounts_processed", models.PositiveIntegerField(default=0)),
+                (
+                    "total_interest",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14
+                    ),
+                ),
+                ("started_at", models.DateTimeField(auto_now_add=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("accrual_date", "period"),
+                        name="unique_interest_accrual_run",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("savings", "0010_interest_accrual_run"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InterestAccrual",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("accrual_date", models.DateField()),
+                ("balance", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("rate", models.DecimalField(decimal_places=10, max_digits=12)),
+                ("interest", models.DecimalField(decimal_places=2, max_digits=12)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="interestaccrualrun",
+            name="accounts_rolled_forward",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="savingsaccount",
+            index=models.Index(
+                fields=["updated_at"], name="savings_account_updated_at"
+            ),
+        ),
+        migrations.AddField(
+            model_name="interestaccrual",
+            name="account",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="interest_accruals",
+                to="savings.savingsaccount",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="interestaccrual",
+            index=models.Index(
+                fields=["accrual_date", "account"], name="interest_accrual_date_account"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="interestaccrual",
+            constraint=models.UniqueConstraint(
+                fields=("account", "accrual_date"), name="unique_interest_accrual"
+            ),
+        ),
+    ]
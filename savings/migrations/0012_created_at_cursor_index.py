@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("savings", "0011_interest_accrual_ledger"),
+        ("transaction", "0007_callback_inbox"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="savingscontribution",
+            index=models.Index(
+                fields=["created_at", "id"], name="contribution_created_at_id"
+            ),
+        ),
+    ]
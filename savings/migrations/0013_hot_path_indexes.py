@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("savings", "0012_created_at_cursor_index"),
+        ("transaction", "0008_created_at_cursor_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="savingscontribution",
+            index=models.Index(
+                fields=["member", "created_at"], name="contribution_member_created"
+            ),
+        ),
+    ]
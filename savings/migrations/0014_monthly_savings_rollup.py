@@ -0,0 +1,87 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:06
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    SavingsContribution = apps.get_model("savings", "SavingsContribution")
+    MonthlySavingsRollup = apps.get_model("savings", "MonthlySavingsRollup")
+    totals = (
+        SavingsContribution.objects.annotate(month=TruncMonth("created_at"))
+        .values("member_id", "month")
+        .annotate(total=Sum("contributed_amount"), count=Count("id"))
+        .order_by()
+    )
+    MonthlySavingsRollup.objects.bulk_create(
+        [
+            MonthlySavingsRollup(
+                member_id=row["member_id"],
+                year_month=row["month"].strftime("%Y-%m"),
+                total=row["total"],
+                count=row["count"],
+            )
+            for row in totals.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("savings", "0013_hot_path_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlySavingsRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "year_month",
+                    models.CharField(
+                        help_text="YYYY-MM in the project time zone", max_length=7
+                    ),
+                ),
+                (
+                    "total",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=12
+                    ),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "member",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_savings",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("member", "year_month"),
+                        name="unique_monthly_savings_rollup",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
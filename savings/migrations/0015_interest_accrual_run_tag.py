@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("savings", "0014_monthly_savings_rollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="interestaccrual",
+            name="run",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="accruals",
+                to="savings.interestaccrualrun",
+            ),
+        ),
+    ]
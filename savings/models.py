@@ -1,11 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 from decimal import Decimal, InvalidOperation
 from django.core.validators import MinValueValidator
 from pension.models import PensionAccount
 from transaction.models import Transaction
-from transaction.daraja import DarajaAPI
+from transaction import balances
+from . import rollups
 from decimal import Decimal
 from django.core.validators import MinValueValidator
 
@@ -22,18 +23,100 @@ class SavingsAccount(models.Model):
 
     class Meta:
         unique_together = ['member']
+        indexes = [
+            models.Index(fields=['updated_at'], name='savings_account_updated_at'),
+        ]
 
     def __str__(self):
         return f"{self.member.first_name}'s Savings: KES {self.member_account_balance}"
 
-    def apply_daily_interest(self):
-        annual_rate = Decimal('0.025')
-        daily_rate = annual_rate / Decimal('365')
-        interest = self.member_account_balance * daily_rate
-        self.interest_incurred += interest
-        self.member_account_balance += interest
-        self.save()
-        return interest
+    def apply_daily_interest(self, accrual_date=None):
+        from .interest import DAILY_RATE, interest_for
+        accrual_date = accrual_date or timezone.localdate()
+        interest = interest_for(self.member_account_balance, DAILY_RATE)
+        if not interest:
+            return interest
+        with transaction.atomic():
+            accrual, created = InterestAccrual.objects.get_or_create(
+                account=self,
+                accrual_date=accrual_date,
+                defaults={'balance': self.member_account_balance, 'rate': DAILY_RATE, 'interest': interest},
+            )
+            if created:
+                SavingsAccount.objects.filter(pk=self.pk).update(
+                    interest_incurred=models.F('interest_incurred') + interest
+                )
+        self.refresh_from_db(fields=['interest_incurred'])
+        return accrual.interest
+
+
+class InterestAccrualRun(models.Model):
+    PERIOD_CHOICES = [
+        ('daily', 'Daily'),
+        ('annual', 'Annual'),
+    ]
+
+    accrual_date = models.DateField()
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    rate = models.DecimalField(max_digits=12, decimal_places=10)
+    last_account_id = models.BigIntegerField(default=0)
+    accounts_processed = models.PositiveIntegerField(default=0)
+    accounts_rolled_forward = models.PositiveIntegerField(default=0)
+    total_interest = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['accrual_date', 'period'], name='unique_interest_accrual_run'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_period_display()} interest for {self.accrual_date}"
+
+class InterestAccrual(models.Model):
+    """One day's interest for one account; untouched accounts repeat the previous day's row."""
+
+    account = models.ForeignKey(SavingsAccount, on_delete=models.CASCADE, related_name='interest_accruals')
+    accrual_date = models.DateField()
+    # The posting run that inserted and credited the row; null for rows
+    # written by SavingsAccount.apply_daily_interest.
+    run = models.ForeignKey(
+        'InterestAccrualRun', null=True, blank=True, on_delete=models.SET_NULL, related_name='accruals'
+    )
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    rate = models.DecimalField(max_digits=12, decimal_places=10)
+    interest = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'accrual_date'], name='unique_interest_accrual'),
+        ]
+        indexes = [
+            models.Index(fields=['accrual_date', 'account'], name='interest_accrual_date_account'),
+        ]
+
+    def __str__(self):
+        return f"Interest {self.interest} on {self.accrual_date} for account {self.account_id}"
+
+
+class MonthlySavingsRollup(models.Model):
+    """Running total of a member's contributions for one calendar month, kept by savings.rollups."""
+
+    member = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='monthly_savings')
+    year_month = models.CharField(max_length=7, help_text="YYYY-MM in the project time zone")
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['member', 'year_month'], name='unique_monthly_savings_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.year_month} savings for member {self.member_id}: KES {self.total}"
+
 
 class SavingsContribution(models.Model):
     member = models.ForeignKey(
@@ -80,6 +163,12 @@ class SavingsContribution(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='contribution_created_at_id'),
+            models.Index(fields=['member', 'created_at'], name='contribution_member_created'),
+        ]
+
     def __str__(self):
         return f"Contribution for {self.member.first_name} ({self.member.national_id})"
 
@@ -89,57 +178,28 @@ class SavingsContribution(models.Model):
         except (InvalidOperation, ValueError, TypeError):
             raise ValueError("contributed_amount must be a valid number")
 
-        if not self.pk:
-            try:
-                pension_account = PensionAccount.objects.get(member=self.member)
-                self.pension_percentage = pension_account.contribution_percentage
-                self.pension_amount = pension_account.get_pension_amount(self.contributed_amount)
-            except PensionAccount.DoesNotExist:
-                self.pension_percentage = Decimal('0.00')
-                self.pension_amount = Decimal('0.00')
-
-            self.vsla_amount = self.contributed_amount - self.pension_amount
-            if not isinstance(self.saving.member_account_balance, Decimal):
-                self.saving.member_account_balance = Decimal(str(self.saving.member_account_balance))
-            if not isinstance(self.vsla_amount, Decimal):
-                self.vsla_amount = Decimal(str(self.vsla_amount))
-            self.saving.member_account_balance += self.vsla_amount
-            self.saving.save()
-            if self.pension_amount > 0:
-                try:
-                    pension_account = PensionAccount.objects.get(member=self.member)
-                    provider = pension_account.provider
-                    if provider and provider.status == 'active':
-                        daraja = DarajaAPI()
-                        b2b_response = daraja.b2b_payment(
-                            receiver_shortcode=provider.payBill_number,
-                            amount=self.pension_amount
-                        )
-
-                        national_id = self.member.national_id or 'N/A'
-                        description = f"Pension contribution for {self.member.first_name} (ID: {national_id})"
-
-                        b2b_transaction = Transaction.objects.create(
-                            member=self.member,
-                            transaction_type='B2B',
-                            amount_transacted=self.pension_amount,
-                            payment_transaction_status='processing',
-                            provider=provider,
-                            description=description,
-                            account_type='pension_contribution',
-                        )
-
-                        if isinstance(b2b_response, dict) and b2b_response.get('ConversationID'):
-                            b2b_transaction.checkout_request_id = b2b_response['ConversationID']
-                        else:
-                            b2b_transaction.payment_transaction_status = 'failed'
-
-                        b2b_transaction.save()
-                        self.transaction_id_b2b = b2b_transaction
-
-                except Exception:
-                    pass
-
-            self.completed_at = timezone.now()
-
-        super().save(*args, **kwargs)
\ No newline at end of file
+        if self.pk:
+            super().save(*args, **kwargs)
+            return
+
+        try:
+            pension_account = PensionAccount.objects.get(member=self.member)
+            self.pension_percentage = pension_account.contribution_percentage
+            self.pension_amount = pension_account.get_pension_amount(self.contributed_amount)
+        except PensionAccount.DoesNotExist:
+            self.pension_percentage = Decimal('0.00')
+            self.pension_amount = Decimal('0.00')
+
+        self.vsla_amount = self.contributed_amount - self.pension_amount
+        if not isinstance(self.vsla_amount, Decimal):
+            self.vsla_amount = Decimal(str(self.vsla_amount))
+        self.completed_at = timezone.now()
+
+        # The pension share is sent later by pension.remittance in one B2B
+        # transfer per provider; see the remit_pensions command.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            balances.credit_savings(self.saving_id, self.vsla_amount)
+            rollups.record_contribution(self.member_id, self.contributed_amount, self.created_at)
+        if SavingsContribution.saving.is_cached(self):
+            self.saving.refresh_from_db(fields=['member_account_balance', 'updated_at'])
@@ -0,0 +1,60 @@
+"""
+MonthlySavingsRollup keeps each member's contribution total per calendar
+month so the savings progress fields read one row instead of summing the
+month's contributions. SavingsContribution.save() adds to the row as each
+contribution is recorded; rebuild() recomputes rows from the contributions
+table, e.g. after contributions were edited or deleted.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def year_month(value=None):
+    return timezone.localtime(value).strftime('%Y-%m')
+
+
+def record_contribution(member_id, amount, created_at=None):
+    from .models import MonthlySavingsRollup
+    month = year_month(created_at)
+    increment = {'total': F('total') + amount, 'count': F('count') + 1, 'updated_at': timezone.now()}
+    if MonthlySavingsRollup.objects.filter(member_id=member_id, year_month=month).update(**increment):
+        return
+    try:
+        with transaction.atomic():
+            MonthlySavingsRollup.objects.create(member_id=member_id, year_month=month, total=amount, count=1)
+    except IntegrityError:
+        # Another contribution created the row first.
+        MonthlySavingsRollup.objects.filter(member_id=member_id, year_month=month).update(**increment)
+
+
+def rebuild(month=None):
+    """Replace the rollups for ``month`` ('YYYY-MM'), or for every month, from the contributions table."""
+    from .models import MonthlySavingsRollup, SavingsContribution
+    contributions = SavingsContribution.objects.all()
+    rollups = MonthlySavingsRollup.objects.all()
+    if month:
+        year, number = (int(part) for part in month.split('-'))
+        contributions = contributions.filter(created_at__year=year, created_at__month=number)
+        rollups = rollups.filter(year_month=month)
+
+    totals = (
+        contributions.annotate(month=TruncMonth('created_at'))
+        .values('member_id', 'month')
+        .annotate(total=Sum('contributed_amount'), count=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        rollups.delete()
+        created = MonthlySavingsRollup.objects.bulk_create(
+            [
+                MonthlySavingsRollup(
+                    member_id=row['member_id'], year_month=row['month'].strftime('%Y-%m'),
+                    total=row['total'], count=row['count'],
+                )
+                for row in totals.iterator()
+            ],
+            batch_size=1000,
+        )
+    return len(created)
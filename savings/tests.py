@@ -1,3 +1,247 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from pension.models import PensionAccount, PensionProvider
+from transaction import balances
+from . import rollups
+from .interest import DAILY_RATE, accrue_interest, interest_for, post_daily_interest
+from .models import InterestAccrual, InterestAccrualRun, MonthlySavingsRollup, SavingsAccount, SavingsContribution
+
+User = get_user_model()
+
+
+class InterestAccrualTests(TestCase):
+
+    def setUp(self):
+        self.accounts = []
+        for i, balance in enumerate(['1000.00', '333.33', '0.00', '25000.00']):
+            member = User.objects.create_user(
+                email=f'saver{i}@example.com', password='pw', phone_number=f'+25472000000{i}'
+            )
+            self.accounts.append(
+                SavingsAccount.objects.create(member=member, member_account_balance=Decimal(balance))
+            )
+
+    def balances(self):
+        return list(SavingsAccount.objects.order_by('pk').values_list('member_account_balance', flat=True))
+
+    def test_annual_interest_is_rounded_half_up(self):
+        run, applied = accrue_interest(date(2026, 1, 1), 'annual', chunk_size=2)
+        self.assertTrue(applied)
+        self.assertEqual(self.balances(), [Decimal('1025.00'), Decimal('341.66'), Decimal('0.00'), Decimal('25625.00')])
+        self.assertEqual(run.accounts_processed, 4)
+        self.assertEqual(run.total_interest, Decimal('658.33'))
+
+    def test_accrual_is_idempotent_per_date(self):
+        accrue_interest(date(2026, 1, 1), 'annual')
+        after_first = self.balances()
+        run, applied = accrue_interest(date(2026, 1, 1), 'annual')
+        self.assertFalse(applied)
+        self.assertEqual(self.balances(), after_first)
+        self.assertEqual(InterestAccrualRun.objects.count(), 1)
+
+    def test_interrupted_run_resumes_after_checkpoint(self):
+        run = InterestAccrualRun.objects.create(
+            accrual_date=date(2026, 1, 1), period='annual', rate=Decimal('0.025'),
+            last_account_id=self.accounts[1].pk, accounts_processed=2,
+        )
+        accrue_interest(run.accrual_date, 'annual')
+        self.assertEqual(self.balances()[:2], [Decimal('1000.00'), Decimal('333.33')])
+        self.assertEqual(self.balances()[3], Decimal('25625.00'))
+
+    def test_annual_run_is_keyed_on_the_year(self):
+        accrue_interest(date(2026, 1, 1), 'annual')
+        after_first = self.balances()
+        run, applied = accrue_interest(date(2026, 1, 2), 'annual')
+        self.assertFalse(applied)
+        self.assertEqual(run.accrual_date, date(2026, 1, 1))
+        self.assertEqual(self.balances(), after_first)
+
+        run, applied = accrue_interest(date(2027, 3, 5), 'annual')
+        self.assertTrue(applied)
+        self.assertEqual(run.accrual_date, date(2027, 1, 1))
+
+    def test_apply_interest_endpoint_queues_the_run(self):
+        client = APIClient()
+        response = client.post('/api/savingsAccounts/apply_interest/', {'accrual_date': '2026-06-30'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.balances()[0], Decimal('1000.00'))
+
+        call_command('accrue_interest', '--pending', stdout=StringIO())
+        self.assertEqual(self.balances()[0], Decimal('1025.00'))
+
+        response = client.post('/api/savingsAccounts/apply_interest/', {'accrual_date': '2026-07-01'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['accounts_processed'], 4)
+        self.assertNotIn('results', response.data)
+        self.assertEqual(InterestAccrualRun.objects.filter(period='annual').count(), 1)
+
+    def test_model_method_records_ledger_row_once(self):
+        account = self.accounts[3]
+        interest = account.apply_daily_interest(date(2026, 1, 1))
+        account.apply_daily_interest(date(2026, 1, 1))
+        self.assertEqual(interest, (Decimal('25000.00') * DAILY_RATE).quantize(Decimal('0.01')))
+        self.assertEqual(account.interest_incurred, interest)
+        self.assertEqual(account.member_account_balance, Decimal('25000.00'))
+        self.assertEqual(InterestAccrual.objects.filter(account=account).count(), 1)
+
+
+class DailyInterestPostingTests(TestCase):
+
+    def setUp(self):
+        self.accounts = []
+        for i, balance in enumerate(['1000.00', '20000.00', '0.00', '50000.00']):
+            member = User.objects.create_user(
+                email=f'daily{i}@example.com', password='pw', phone_number=f'+25473000000{i}'
+            )
+            self.accounts.append(
+                SavingsAccount.objects.create(member=member, member_account_balance=Decimal(balance))
+            )
+
+    def test_first_posting_computes_every_account(self):
+        run, applied = post_daily_interest(date(2026, 3, 1))
+        self.assertTrue(applied)
+        self.assertEqual(run.accounts_processed, 4)
+        self.assertEqual(run.accounts_rolled_forward, 0)
+        # The zero balance earns nothing and gets no ledger row.
+        self.assertEqual(InterestAccrual.objects.filter(accrual_date=date(2026, 3, 1)).count(), 3)
+        self.assertEqual(
+            list(SavingsAccount.objects.order_by('pk').values_list('member_account_balance', flat=True)),
+            [Decimal('1000.00'), Decimal('20000.00'), Decimal('0.00'), Decimal('50000.00')],
+        )
+
+    def test_only_changed_accounts_are_recomputed(self):
+        post_daily_interest(date(2026, 3, 1))
+        balances.credit_savings(self.accounts[0].pk, Decimal('9000.00'))
+
+        run, applied = post_daily_interest(date(2026, 3, 2))
+
+        self.assertEqual(run.accounts_processed, 1)
+        self.assertEqual(run.accounts_rolled_forward, 2)
+        day_two = dict(InterestAccrual.objects.filter(accrual_date=date(2026, 3, 2)).values_list('account_id', 'interest'))
+        self.assertEqual(day_two[self.accounts[0].pk], interest_for(Decimal('10000.00'), DAILY_RATE))
+        self.assertEqual(day_two[self.accounts[3].pk], interest_for(Decimal('50000.00'), DAILY_RATE))
+
+        account = SavingsAccount.objects.get(pk=self.accounts[3].pk)
+        self.assertEqual(account.interest_incurred, 2 * interest_for(Decimal('50000.00'), DAILY_RATE))
+
+    def test_posting_is_idempotent_per_date(self):
+        post_daily_interest(date(2026, 3, 1))
+        run, applied = post_daily_interest(date(2026, 3, 1))
+        self.assertFalse(applied)
+        account = SavingsAccount.objects.get(pk=self.accounts[1].pk)
+        self.assertEqual(account.interest_incurred, interest_for(Decimal('20000.00'), DAILY_RATE))
+
+    def test_rows_already_credited_by_the_model_method_are_not_credited_again(self):
+        account = self.accounts[3]
+        interest = account.apply_daily_interest(date(2026, 3, 1))
+
+        run, applied = post_daily_interest(date(2026, 3, 1))
+
+        self.assertTrue(applied)
+        account.refresh_from_db()
+        self.assertEqual(account.interest_incurred, interest)
+        other = SavingsAccount.objects.get(pk=self.accounts[1].pk)
+        self.assertEqual(other.interest_incurred, interest_for(Decimal('20000.00'), DAILY_RATE))
+        self.assertEqual(
+            run.total_interest,
+            interest_for(Decimal('1000.00'), DAILY_RATE) + interest_for(Decimal('20000.00'), DAILY_RATE),
+        )
+
+    def test_roll_forward_skips_rows_the_model_method_wrote(self):
+        post_daily_interest(date(2026, 3, 1))
+        account = SavingsAccount.objects.get(pk=self.accounts[3].pk)
+        daily = account.apply_daily_interest(date(2026, 3, 2))
+
+        run, applied = post_daily_interest(date(2026, 3, 2))
+
+        self.assertTrue(applied)
+        self.assertEqual(run.accounts_rolled_forward, 2)
+        account.refresh_from_db()
+        self.assertEqual(account.interest_incurred, 2 * daily)
+        self.assertEqual(InterestAccrual.objects.filter(account=account, accrual_date=date(2026, 3, 2)).count(), 1)
+        other = SavingsAccount.objects.get(pk=self.accounts[1].pk)
+        self.assertEqual(other.interest_incurred, 2 * interest_for(Decimal('20000.00'), DAILY_RATE))
+
+
+class SavingsAccountListQueryTests(TestCase):
+
+    def setUp(self):
+        self.provider = PensionProvider.objects.create(name='Fund', payBill_number='400200', status='active')
+
+    def add_accounts(self, count):
+        start = SavingsAccount.objects.count()
+        for i in range(start, start + count):
+            member = User.objects.create_user(
+                email=f'lister{i}@example.com', password='pw', phone_number=f'+25473000{i:04d}'
+            )
+            account = SavingsAccount.objects.create(member=member)
+            SavingsContribution.objects.create(member=member, saving=account, contributed_amount=Decimal('600.00'))
+            PensionAccount.objects.create(
+                member=member, provider=self.provider, contribution_percentage=Decimal('5.00'),
+            )
+
+    def list_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get('/api/savingsAccounts/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_list_runs_a_constant_number_of_queries(self):
+        self.add_accounts(2)
+        few, _ = self.list_query_count()
+        self.add_accounts(8)
+        many, response = self.list_query_count()
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 3)
+
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(len(rows), 10)
+        for row in rows:
+            self.assertEqual(row['progress_percentage'], 60.0)
+            self.assertEqual(row['progress_tier'], 'On Track')
+            self.assertEqual(row['pension_provider_name'], 'Fund')
+            self.assertEqual(row['pension_percentage'], Decimal('5.00'))
+
+
+class MonthlySavingsRollupTests(TestCase):
+
+    def setUp(self):
+        self.member = User.objects.create_user(email='roller@example.com', password='pw', phone_number='+254750000000')
+        self.account = SavingsAccount.objects.create(member=self.member)
+
+    def contribute(self, amount):
+        return SavingsContribution.objects.create(member=self.member, saving=self.account, contributed_amount=Decimal(amount))
+
+    def rollup(self):
+        return MonthlySavingsRollup.objects.get(member=self.member, year_month=rollups.year_month())
+
+    def test_contributions_update_the_current_month(self):
+        self.contribute('250.00')
+        self.contribute('300.00')
+        rollup = self.rollup()
+        self.assertEqual((rollup.total, rollup.count), (Decimal('550.00'), 2))
+
+        response = APIClient().get(f'/api/savingsAccounts/{self.account.id}/')
+        self.assertEqual(response.data['progress_percentage'], 55.0)
+        self.assertEqual(response.data['progress_tier'], 'On Track')
+
+    def test_rebuild_recomputes_from_contributions(self):
+        self.contribute('250.00')
+        last_month = self.contribute('100.00')
+        SavingsContribution.objects.filter(pk=last_month.pk).update(created_at=timezone.now() - timedelta(days=40))
+        MonthlySavingsRollup.objects.update(total=Decimal('1.00'), count=9)
 
-# Create your tests here.
+        call_command('rebuild_savings_rollups', stdout=StringIO())
+        rollup = self.rollup()
+        self.assertEqual((rollup.total, rollup.count), (Decimal('250.00'), 1))
+        self.assertEqual(MonthlySavingsRollup.objects.count(), 2)
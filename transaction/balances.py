@@ -0,0 +1,75 @@
+"""
+Every change to a savings, loan or pension balance goes through this module.
+Amounts are added in the database with F() expressions, so concurrent
+callbacks cannot overwrite each other and no row has to be read first.
+
+Lock order, to keep concurrent settlements from deadlocking: Transaction,
+then SavingsAccount, then LoanAccount, then GuarantorExposure, then
+PensionAccount, and by ascending
+primary key within a table. Callers that lock a Transaction with
+select_for_update() must do so before calling in here.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+
+
+def credit_savings(saving_id, amount):
+    from savings.models import SavingsAccount
+    return SavingsAccount.objects.filter(pk=saving_id).update(
+        member_account_balance=F('member_account_balance') + Decimal(amount),
+        updated_at=timezone.now(),
+    )
+
+
+def credit_pensions(amounts_by_member):
+    """Add ``{member_id: amount}`` to each member's pension account, creating missing ones."""
+    from pension.models import PensionAccount
+    amounts = {member_id: Decimal(amount) for member_id, amount in amounts_by_member.items() if amount}
+    if not amounts:
+        return 0
+
+    with transaction.atomic():
+        existing = set(
+            PensionAccount.objects.filter(member_id__in=amounts).values_list('member_id', flat=True)
+        )
+        PensionAccount.objects.bulk_create(
+            [PensionAccount(member_id=member_id) for member_id in sorted(amounts) if member_id not in existing]
+        )
+        list(PensionAccount.objects.select_for_update().filter(member_id__in=amounts).order_by('pk').values_list('pk'))
+        return PensionAccount.objects.filter(member_id__in=amounts).update(
+            total_pension_amount=F('total_pension_amount') + Case(
+                *[When(member_id=member_id, then=Value(amount)) for member_id, amount in amounts.items()],
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ),
+            updated_at=timezone.now(),
+        )
+
+
+def apply_loan_repayment(loan_id, amount):
+    """
+    Add a repayment to the loan, move its next due date past the
+    installments now covered and mark it COMPLETED once the total
+    repayment is covered. Returns the locked, up-to-date loan.
+    """
+    from loans import exposure
+    from loans.amortization import next_due_date
+    from loans.models import LoanAccount
+    with transaction.atomic():
+        LoanAccount.objects.filter(pk=loan_id).update(
+            total_loan_repaid=F('total_loan_repaid') + Decimal(amount),
+            updated_at=timezone.now(),
+        )
+        loan = LoanAccount.objects.select_for_update().get(pk=loan_id)
+        changes = {}
+        if loan.next_due_date:
+            loan.next_due_date = changes['next_due_date'] = next_due_date(loan)
+        if loan.loan_status not in ('COMPLETED', 'PAID') and loan.outstanding_balance == 0:
+            loan.loan_status = changes['loan_status'] = 'COMPLETED'
+        if changes:
+            LoanAccount.objects.filter(pk=loan_id).update(**changes)
+        if changes.get('loan_status') == 'COMPLETED':
+            exposure.refresh_loan(loan_id)
+    return loan
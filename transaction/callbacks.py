@@ -0,0 +1,125 @@
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import balances
+from .models import CallbackReceipt, Transaction
+
+logger = logging.getLogger(__name__)
+
+SETTLED = 'settled'
+DUPLICATE = 'duplicate'
+IGNORED = 'ignored'
+MISSING_ID = 'missing_id'
+NOT_FOUND = 'not_found'
+
+
+def parse_stk_callback(data):
+    # Daraja nests the result under Body.stkCallback; older payloads we
+    # received were flat.
+    callback = data.get('Body', {}).get('stkCallback') or data
+    result_code = callback.get('ResultCode', callback.get('ResponseCode'))
+    return callback.get('CheckoutRequestID'), str(result_code) == '0'
+
+
+def parse_result_callback(data):
+    result = data.get('Result', {})
+    return result.get('ConversationID'), str(result.get('ResultCode')) == '0'
+
+
+def settle_savings(trans):
+    from savings.models import SavingsContribution
+    contribution = SavingsContribution.objects.filter(transaction_id_c2b=trans).first()
+    if contribution:
+        SavingsContribution.objects.filter(pk=contribution.pk).update(completed_at=timezone.now())
+        balances.credit_savings(contribution.saving_id, contribution.vsla_amount)
+        logger.info("Savings account %s credited with %s", contribution.saving_id, contribution.vsla_amount)
+
+
+def settle_loan_repayment(trans):
+    from loans.models import LoanRepayment
+    repayment = LoanRepayment.objects.filter(transaction=trans).first()
+    if repayment:
+        loan = balances.apply_loan_repayment(repayment.loan_id, repayment.loan_amount_repaid)
+        if loan.loan_status == 'COMPLETED':
+            logger.info("Loan %s marked as COMPLETED", loan.pk)
+
+
+def settle_loan_disbursement(trans):
+    from loans.models import LoanAccount
+    loan = LoanAccount.objects.filter(transaction_id_b2c=trans).first()
+    if loan:
+        loan.disbursed_at = timezone.now()
+        loan.loan_status = 'DISBURSED'
+        loan.save()
+        logger.info("Loan %s disbursed successfully", loan.pk)
+
+
+def settle_pension_remittance(trans):
+    from savings.models import SavingsContribution
+    # One remittance settles every contribution it batched.
+    contributions = SavingsContribution.objects.filter(transaction_id_b2b=trans)
+    totals = contributions.values('member_id').annotate(total=Sum('pension_amount')).order_by('member_id')
+    balances.credit_pensions({row['member_id']: row['total'] for row in totals})
+    contributions.update(completed_at=timezone.now())
+    logger.info("Pension remittance %s credited", trans.pk)
+
+
+SETTLERS = {
+    ('C2B', 'savings'): settle_savings,
+    ('C2B', 'loan_repayment'): settle_loan_repayment,
+    ('B2C', 'loan_disbursement'): settle_loan_disbursement,
+    ('B2B', 'pension_contribution'): settle_pension_remittance,
+}
+
+CALLBACKS = {
+    'stk': ('C2B', parse_stk_callback),
+    'b2c': ('B2C', parse_result_callback),
+    'b2b': ('B2B', parse_result_callback),
+}
+
+
+def process_callback(callback_type, data):
+    """
+    Apply one Daraja result callback. Each correlation id is settled at most
+    once: the receipt insert and the locked transaction update commit
+    together, so a redelivered callback finds the receipt and does nothing.
+    """
+    transaction_type, parse = CALLBACKS[callback_type]
+    correlation_id, succeeded = parse(data)
+    if not correlation_id:
+        return MISSING_ID
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                CallbackReceipt.objects.create(
+                    callback_type=callback_type,
+                    correlation_id=correlation_id,
+                    succeeded=succeeded,
+                )
+        except IntegrityError:
+            return DUPLICATE
+
+        trans = Transaction.objects.select_for_update().filter(
+            checkout_request_id=correlation_id,
+            transaction_type=transaction_type,
+        ).first()
+        if trans is None:
+            # Keep no receipt so a redelivery after the dispatcher records
+            # the correlation id can still settle the payment.
+            transaction.set_rollback(True)
+            return NOT_FOUND
+        if trans.payment_transaction_status != 'processing':
+            return IGNORED
+
+        trans.payment_transaction_status = 'success' if succeeded else 'failed'
+        trans.completed_at = timezone.now()
+        trans.save(update_fields=['payment_transaction_status', 'completed_at', 'updated_at'])
+
+        settle = SETTLERS.get((trans.transaction_type, trans.account_type))
+        if succeeded and settle:
+            settle(trans)
+    return SETTLED
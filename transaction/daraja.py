@@ -1,8 +1,156 @@
 import requests
 import base64
 import datetime
+import hashlib
+import logging
+import os
+import threading
+import time
 from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class DarajaTokenManager:
+    """
+    Caches the Daraja OAuth token in the Django cache so every worker that
+    shares the cache reuses it until shortly before it expires. Only one
+    caller refreshes at a time; the others wait for the new token.
+    """
+
+    def __init__(self, consumer_key, consumer_secret, base_url, expiry_margin=None, lock_timeout=None):
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.base_url = base_url
+        self.expiry_margin = settings.DARAJA_TOKEN_EXPIRY_MARGIN if expiry_margin is None else expiry_margin
+        self.lock_timeout = settings.DARAJA_TOKEN_LOCK_TIMEOUT if lock_timeout is None else lock_timeout
+        digest = hashlib.sha256(f"{base_url}:{consumer_key}".encode()).hexdigest()[:16]
+        self.cache_key = f"daraja_token_{digest}"
+        self.lock_key = f"{self.cache_key}_lock"
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'refreshes': 0, 'failures': 0}
+
+    def stats(self):
+        return dict(self._counters)
+
+    def get_token(self):
+        token = cache.get(self.cache_key)
+        if token:
+            self._counters['hits'] += 1
+            return token
+        self._counters['misses'] += 1
+
+        with self._lock:
+            token = cache.get(self.cache_key)
+            if token:
+                return token
+            deadline = time.monotonic() + self.lock_timeout
+            while True:
+                if cache.add(self.lock_key, 1, timeout=self.lock_timeout):
+                    try:
+                        return self._refresh()
+                    finally:
+                        cache.delete(self.lock_key)
+                if time.monotonic() >= deadline:
+                    return self._refresh()
+                time.sleep(0.05)
+                token = cache.get(self.cache_key)
+                if token:
+                    return token
+
+    def invalidate(self):
+        cache.delete(self.cache_key)
+
+    def _refresh(self):
+        url = f"{self.base_url}/oauth/v1/generate?grant_type=client_credentials"
+        try:
+            response = get_session().get(
+                url,
+                auth=HTTPBasicAuth(self.consumer_key, self.consumer_secret),
+                timeout=get_timeout(),
+            )
+            response.raise_for_status()
+            data = response.json()
+        except Exception:
+            self._counters['failures'] += 1
+            logger.warning("Daraja access token refresh failed", exc_info=True)
+            return None
+
+        token = data.get('access_token')
+        if not token:
+            self._counters['failures'] += 1
+            return None
+        try:
+            expires_in = int(data.get('expires_in', 3599))
+        except (TypeError, ValueError):
+            expires_in = 3599
+        cache.set(self.cache_key, token, timeout=max(expires_in - self.expiry_margin, 1))
+        self._counters['refreshes'] += 1
+        logger.info("Daraja access token refreshed (%s)", self.stats())
+        return token
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def build_session():
+    # Only GETs (the OAuth call) are retried on status errors; payment POSTs
+    # are never replayed once sent, because Daraja does not dedupe them.
+    retry = Retry(
+        total=settings.DARAJA_MAX_RETRIES,
+        backoff_factor=settings.DARAJA_RETRY_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.DARAJA_POOL_CONNECTIONS,
+        pool_maxsize=settings.DARAJA_POOL_SIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    # Sessions are kept per process so forked gunicorn workers never share
+    # sockets inherited from the master.
+    pid = os.getpid()
+    session = _sessions.get(pid)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(pid)
+            if session is None:
+                session = build_session()
+                _sessions.clear()
+                _sessions[pid] = session
+    return session
+
+
+def get_timeout():
+    return (settings.DARAJA_CONNECT_TIMEOUT, settings.DARAJA_READ_TIMEOUT)
+
+
+_token_managers = {}
+_token_managers_lock = threading.Lock()
+
+
+def get_token_manager(consumer_key, consumer_secret, base_url):
+    key = (consumer_key, consumer_secret, base_url)
+    with _token_managers_lock:
+        manager = _token_managers.get(key)
+        if manager is None:
+            manager = DarajaTokenManager(consumer_key, consumer_secret, base_url)
+            _token_managers[key] = manager
+        return manager
+
 
 class DarajaAPI:
     def __init__(self):
@@ -12,27 +160,31 @@ class DarajaAPI:
         self.passkey = settings.DARAJA_PASSKEY
         self.base_url = "https://sandbox.safaricom.co.ke"
         self.callback_url = settings.DARAJA_CALLBACK_URL
+        self.token_manager = get_token_manager(self.consumer_key, self.consumer_secret, self.base_url)
+        self.session = get_session()
 
     def get_access_token(self):
-        url = f"{self.base_url}/oauth/v1/generate?grant_type=client_credentials"
-        try:
-            response = requests.get(url, auth=HTTPBasicAuth(self.consumer_key, self.consumer_secret), timeout=10)
-            response.raise_for_status()
-            return response.json().get('access_token')
-            
-        except Exception:
-            return None
+        return self.token_manager.get_token()
 
-    def stk_push(self, phone_number, amount, account_reference, transaction_desc):
+    def _post(self, path, payload):
         access_token = self.get_access_token()
         if not access_token:
             return {"error": "Failed to get access token"}
-        timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-        password = base64.b64encode(f"{self.business_shortcode}{self.passkey}{timestamp}".encode()).decode()
         headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json"
         }
+        try:
+            response = self.session.post(f"{self.base_url}{path}", headers=headers, json=payload, timeout=get_timeout())
+            if response.status_code == 401:
+                self.token_manager.invalidate()
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def stk_push(self, phone_number, amount, account_reference, transaction_desc):
+        timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+        password = base64.b64encode(f"{self.business_shortcode}{self.passkey}{timestamp}".encode()).decode()
         payload = {
             "BusinessShortCode": self.business_shortcode,
             "Password": password,
@@ -46,21 +198,9 @@ class DarajaAPI:
             "AccountReference": account_reference,
             "TransactionDesc": transaction_desc,
         }
-        url = f"{self.base_url}/mpesa/stkpush/v1/processrequest"
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            return response.json()
-        except Exception as e:
-            return {"error": str(e)}
+        return self._post("/mpesa/stkpush/v1/processrequest", payload)
 
     def b2c_payment(self, phone_number, amount):
-        access_token = self.get_access_token()
-        if not access_token:
-            return {"error": "Failed to get access token"}
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
         payload = {
             "InitiatorName": "testapi",
             "SecurityCredential": "Safaricom999!*!",
@@ -73,21 +213,9 @@ class DarajaAPI:
             "ResultURL": f"{self.callback_url}/b2c-callback/",
             "Occasion": "LoanPayment"
         }
-        url = f"{self.base_url}/mpesa/b2c/v1/paymentrequest"
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            return response.json()
-        except Exception as e:
-            return {"error": str(e)}
+        return self._post("/mpesa/b2c/v1/paymentrequest", payload)
 
     def b2b_payment(self, receiver_shortcode, amount):
-        access_token = self.get_access_token()
-        if not access_token:
-            return {"error": "Failed to get access token"}
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
         payload = {
             "Initiator": "testapi",
             "SecurityCredential": "Safaricom999!*!",
@@ -102,13 +230,4 @@ class DarajaAPI:
             "QueueTimeOutURL": f"{self.callback_url}/b2b-callback/",
             "ResultURL": f"{self.callback_url}/b2b-callback/"
         }
-        url = f"{self.base_url}/mpesa/b2b/v1/paymentrequest"
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            return response.json()
-        except Exception as e:
-            return {"error": str(e)}
-
-
-
-           
\ No newline at end of file
+        return self._post("/mpesa/b2b/v1/paymentrequest", payload)
@@ -0,0 +1,110 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Transaction
+
+logger = logging.getLogger(__name__)
+
+
+def claim_batch(limit):
+    """
+    Move up to ``limit`` queued transactions to ``dispatching`` and return
+    them. SKIP LOCKED lets several dispatchers drain the outbox on Postgres
+    without claiming the same rows.
+    """
+    with transaction.atomic():
+        ids = list(
+            Transaction.objects.select_for_update(skip_locked=True)
+            .filter(payment_transaction_status='queued')
+            .order_by('id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Transaction.objects.filter(pk__in=ids, payment_transaction_status='queued').update(
+            payment_transaction_status='dispatching',
+            dispatch_attempts=F('dispatch_attempts') + 1,
+            updated_at=timezone.now(),
+        )
+    return list(Transaction.objects.filter(pk__in=ids, payment_transaction_status='dispatching').order_by('id'))
+
+
+def send(trans, client):
+    if trans.transaction_type == 'C2B':
+        response = client.stk_push(
+            phone_number=trans.recipient_phone_number,
+            amount=trans.amount_transacted,
+            account_reference=trans.account_reference or '',
+            transaction_desc=trans.description or '',
+        )
+        reference_key = 'CheckoutRequestID'
+    elif trans.transaction_type == 'B2C':
+        response = client.b2c_payment(phone_number=trans.recipient_phone_number, amount=trans.amount_transacted)
+        reference_key = 'ConversationID'
+    else:
+        response = client.b2b_payment(receiver_shortcode=trans.paybill_number, amount=trans.amount_transacted)
+        reference_key = 'ConversationID'
+    # Only an accepted request is waiting on a callback.
+    reference = response.get(reference_key) if str(response.get('ResponseCode')) == '0' else None
+    return response, reference
+
+
+def record_result(trans, response, reference):
+    if reference:
+        fields = {'payment_transaction_status': 'processing', 'checkout_request_id': reference}
+    else:
+        logger.warning("Dispatch of transaction %s failed: %s", trans.pk, response)
+        fields = {'payment_transaction_status': 'failed', 'completed_at': timezone.now()}
+    Transaction.objects.filter(pk=trans.pk, payment_transaction_status='dispatching').update(
+        updated_at=timezone.now(), **fields
+    )
+
+
+def expire_stale_dispatches(stale_after=None):
+    """
+    Rows stuck in ``dispatching`` belong to a worker that died mid-request.
+    The provider may or may not have seen the request, so they are marked
+    ``timeout`` for reconciliation instead of being sent again.
+    """
+    if stale_after is None:
+        stale_after = timedelta(seconds=settings.PAYMENT_DISPATCH_STALE_SECONDS)
+    return Transaction.objects.filter(
+        payment_transaction_status='dispatching',
+        updated_at__lt=timezone.now() - stale_after,
+    ).update(payment_transaction_status='timeout', updated_at=timezone.now())
+
+
+def drain_outbox(client, workers=None, batch_size=None, max_batches=None):
+    """
+    Send queued transactions until the outbox is empty. Provider calls run on
+    a thread pool; all database writes stay on the calling thread.
+    """
+    workers = workers or settings.PAYMENT_DISPATCH_WORKERS
+    batch_size = batch_size or settings.PAYMENT_DISPATCH_BATCH_SIZE
+    counts = {'dispatched': 0, 'failed': 0, 'timed_out': expire_stale_dispatches()}
+    batches = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while max_batches is None or batches < max_batches:
+            claimed = claim_batch(batch_size)
+            if not claimed:
+                break
+            batches += 1
+            # Record each result as soon as it arrives, so one slow provider
+            # call does not hold back the correlation ids of the others.
+            futures = {pool.submit(send, trans, client): trans for trans in claimed}
+            for future in as_completed(futures):
+                trans = futures[future]
+                try:
+                    response, reference = future.result()
+                except Exception as e:
+                    response, reference = {"error": str(e)}, None
+                record_result(trans, response, reference)
+                counts['dispatched' if reference else 'failed'] += 1
+    return counts
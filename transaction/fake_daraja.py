@@ -0,0 +1,57 @@
+import time
+import uuid
+
+
+class FakeDarajaAPI:
+    """
+    In-process stand-in for DarajaAPI used by tests and by
+    ``dispatch_payments --fake`` for local runs. Responses mirror the shape
+    of the sandbox's success payloads.
+    """
+
+    def __init__(self, latency=0, fail=False):
+        self.latency = latency
+        self.fail = fail
+        self.calls = []
+
+    def _respond(self, kind, **kwargs):
+        self.calls.append((kind, kwargs))
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail:
+            return {"errorCode": "500.001.1001", "errorMessage": "Fake failure"}
+        return None
+
+    def stk_push(self, phone_number, amount, account_reference, transaction_desc):
+        error = self._respond('stk_push', phone_number=phone_number, amount=amount)
+        if error:
+            return error
+        return {
+            "MerchantRequestID": uuid.uuid4().hex,
+            "CheckoutRequestID": f"ws_CO_{uuid.uuid4().hex}",
+            "ResponseCode": "0",
+            "ResponseDescription": "Success. Request accepted for processing",
+            "CustomerMessage": "Success. Request accepted for processing",
+        }
+
+    def b2c_payment(self, phone_number, amount):
+        error = self._respond('b2c_payment', phone_number=phone_number, amount=amount)
+        if error:
+            return error
+        return {
+            "ConversationID": f"AG_{uuid.uuid4().hex}",
+            "OriginatorConversationID": uuid.uuid4().hex,
+            "ResponseCode": "0",
+            "ResponseDescription": "Accept the service request successfully.",
+        }
+
+    def b2b_payment(self, receiver_shortcode, amount):
+        error = self._respond('b2b_payment', receiver_shortcode=receiver_shortcode, amount=amount)
+        if error:
+            return error
+        return {
+            "ConversationID": f"AG_{uuid.uuid4().hex}",
+            "OriginatorConversationID": uuid.uuid4().hex,
+            "ResponseCode": "0",
+            "ResponseDescription": "Accept the service request successfully.",
+        }
@@ -0,0 +1,87 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import callbacks
+from .models import CallbackInbox
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(callback_type, payload):
+    return CallbackInbox.objects.create(callback_type=callback_type, payload=payload)
+
+
+def backoff(attempts):
+    delay = settings.CALLBACK_INBOX_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.CALLBACK_INBOX_MAX_BACKOFF))
+
+
+def should_retry(item, outcome, now, max_attempts):
+    """
+    Callbacks whose transaction is not known yet (the dispatcher has not
+    recorded the correlation id) are retried until CALLBACK_INBOX_RETRY_WINDOW
+    after receipt; ones that raised are also capped at ``max_attempts``.
+    """
+    if now - item.received_at >= timedelta(seconds=settings.CALLBACK_INBOX_RETRY_WINDOW):
+        return False
+    if outcome == 'error':
+        return item.attempts < max_attempts
+    return outcome == callbacks.NOT_FOUND
+
+
+def process_batch(batch_size=None, max_attempts=None, after_id=0):
+    """
+    Apply up to ``batch_size`` due callbacks in a single transaction, each
+    behind its own savepoint so one bad payload cannot undo the rest.
+    Callbacks left for a retry are not due again until their backoff has
+    passed.
+    """
+    batch_size = batch_size or settings.CALLBACK_INBOX_BATCH_SIZE
+    max_attempts = max_attempts or settings.CALLBACK_INBOX_MAX_ATTEMPTS
+    counts = {}
+
+    with transaction.atomic():
+        items = list(
+            CallbackInbox.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True, next_attempt_at__lte=timezone.now(), id__gt=after_id)
+            .order_by('id')[:batch_size]
+        )
+        now = timezone.now()
+        for item in items:
+            item.attempts += 1
+            try:
+                with transaction.atomic():
+                    outcome = callbacks.process_callback(item.callback_type, item.payload)
+            except Exception as e:
+                logger.exception("Callback inbox item %s failed", item.pk)
+                outcome, item.last_error = 'error', str(e)
+            item.outcome = outcome
+            if should_retry(item, outcome, now, max_attempts):
+                item.next_attempt_at = now + backoff(item.attempts)
+            else:
+                item.processed_at = now
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+        CallbackInbox.objects.bulk_update(
+            items, ['attempts', 'outcome', 'last_error', 'processed_at', 'next_attempt_at']
+        )
+    last_id = items[-1].pk if items else after_id
+    return len(items), counts, last_id
+
+
+def drain(batch_size=None):
+    # Walk the inbox once by id so items left for retry wait for the next
+    # drain instead of being retried straight away.
+    totals, processed, last_id = {}, 0, 0
+    while True:
+        count, counts, last_id = process_batch(batch_size, after_id=last_id)
+        if count == 0:
+            break
+        processed += count
+        for outcome, n in counts.items():
+            totals[outcome] = totals.get(outcome, 0) + n
+    return processed, totals
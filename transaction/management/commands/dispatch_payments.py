@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from transaction.daraja import DarajaAPI
+from transaction.dispatch import drain_outbox
+from transaction.fake_daraja import FakeDarajaAPI
+
+
+class Command(BaseCommand):
+    help = "Send queued STK push, B2C and B2B transactions to Daraja."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.PAYMENT_DISPATCH_WORKERS)
+        parser.add_argument('--batch-size', type=int, default=settings.PAYMENT_DISPATCH_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox instead of exiting when it is empty.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep between polls with --loop.")
+        parser.add_argument('--fake', action='store_true', help="Use the in-process fake Daraja client.")
+        parser.add_argument('--fake-latency', type=float, default=0.0)
+
+    def handle(self, *args, **options):
+        client = FakeDarajaAPI(latency=options['fake_latency']) if options['fake'] else DarajaAPI()
+        while True:
+            counts = drain_outbox(client, workers=options['workers'], batch_size=options['batch_size'])
+            if any(counts.values()):
+                self.stdout.write(
+                    f"Dispatched {counts['dispatched']}, failed {counts['failed']}, "
+                    f"timed out {counts['timed_out']}"
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
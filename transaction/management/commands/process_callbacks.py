@@ -0,0 +1,25 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from transaction.inbox import drain
+
+
+class Command(BaseCommand):
+    help = "Apply Daraja callbacks that were acknowledged into the callback inbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.CALLBACK_INBOX_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Keep polling the inbox instead of exiting when it is empty.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            processed, totals = drain(options['batch_size'])
+            if processed:
+                summary = ", ".join(f"{outcome} {n}" for outcome, n in sorted(totals.items()))
+                self.stdout.write(f"Processed {processed} callback(s): {summary}")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
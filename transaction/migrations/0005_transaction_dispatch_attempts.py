@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0004_alter_transaction_options_transaction_description_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='dispatch_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='payment_transaction_status',
+            field=models.CharField(choices=[('initiated', 'Initiated'), ('dispatching', 'Dispatching'), ('success', 'Success'), ('failed', 'Failed'), ('timeout', 'Timeout'), ('processing', 'Processing')], default='initiated', max_length=20),
+        ),
+    ]
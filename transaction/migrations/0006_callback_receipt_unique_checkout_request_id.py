@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:47
+
+from django.db import migrations, models
+
+
+def blank_ids_to_null(apps, schema_editor):
+    Transaction = apps.get_model("transaction", "Transaction")
+    Transaction.objects.filter(checkout_request_id="").update(checkout_request_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transaction", "0005_transaction_dispatch_attempts"),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_ids_to_null, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="transaction",
+            name="checkout_request_id",
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name="CallbackReceipt",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "callback_type",
+                    models.CharField(
+                        choices=[
+                            ("stk", "STK Push"),
+                            ("b2c", "B2C Result"),
+                            ("b2b", "B2B Result"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("correlation_id", models.CharField(max_length=100)),
+                ("succeeded", models.BooleanField()),
+                ("received_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("callback_type", "correlation_id"),
+                        name="unique_callback_receipt",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pension", "0007_rename_pension_provider_pensionprovider"),
+        ("transaction", "0008_created_at_cursor_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("payment_transaction_status", "initiated")),
+                fields=["id"],
+                name="transaction_outbox",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("payment_transaction_status", "dispatching")),
+                fields=["updated_at"],
+                name="transaction_dispatching",
+            ),
+        ),
+    ]
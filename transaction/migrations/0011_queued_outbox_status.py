@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def park_initiated(apps, schema_editor):
+    # Rows left in 'initiated' may have been sent by the old synchronous
+    # views and often lack a recipient, so they go to reconciliation rather
+    # than to the dispatcher.
+    Transaction = apps.get_model("transaction", "Transaction")
+    Transaction.objects.filter(payment_transaction_status="initiated").update(payment_transaction_status="timeout")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pension", "0007_rename_pension_provider_pensionprovider"),
+        ("transaction", "0010_callback_inbox_next_attempt"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="transaction",
+            name="transaction_outbox",
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="payment_transaction_status",
+            field=models.CharField(
+                choices=[
+                    ("initiated", "Initiated"),
+                    ("queued", "Queued"),
+                    ("dispatching", "Dispatching"),
+                    ("success", "Success"),
+                    ("failed", "Failed"),
+                    ("timeout", "Timeout"),
+                    ("processing", "Processing"),
+                ],
+                default="initiated",
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                condition=models.Q(("payment_transaction_status", "queued")),
+                fields=["id"],
+                name="transaction_outbox",
+            ),
+        ),
+        migrations.RunPython(park_initiated, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from pension.models import PensionProvider 
@@ -17,6 +18,10 @@ class Transaction(models.Model):
     ]
     STATUS_CHOICES = [
         ('initiated', 'Initiated'),
+        # Waiting for the dispatch_payments worker; set only by the code that
+        # queues a payment, never by default.
+        ('queued', 'Queued'),
+        ('dispatching', 'Dispatching'),
         ('success', 'Success'),
         ('failed', 'Failed'),
         ('timeout', 'Timeout'),
@@ -40,13 +45,14 @@ class Transaction(models.Model):
         limit_choices_to={'user_type': 'MANAGER'}
     )
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPE_CHOICES)
-    checkout_request_id = models.CharField(max_length=100, blank=True, null=True)
+    checkout_request_id = models.CharField(max_length=100, blank=True, null=True, unique=True)
     account_reference = models.CharField(max_length=50, blank=True, null=True)
     amount_transacted = models.DecimalField(max_digits=10, decimal_places=2)
     paybill_number = models.CharField(max_length=30, blank=True)
     recipient_phone_number = models.CharField(max_length=20, blank=True)
     account_type = models.CharField(max_length=20, choices=ACCOUNT_TYPE_CHOICES)
     payment_transaction_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='initiated')
+    dispatch_attempts = models.PositiveSmallIntegerField(default=0)
     callback_url = models.CharField(max_length=225, blank=True)
     provider = models.ForeignKey(
         PensionProvider,
@@ -67,10 +73,67 @@ class Transaction(models.Model):
         if self.account_type == 'loan_disbursement' and not self.manager:
             raise ValidationError("Manager is required for loan disbursement.")
 
+    def save(self, *args, **kwargs):
+        # checkout_request_id is unique, so blanks must be stored as NULL.
+        if not self.checkout_request_id:
+            self.checkout_request_id = None
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Transaction {self.id} - {self.transaction_type} - KES {self.amount_transacted}"
 
     class Meta:
         verbose_name = "Transaction"
         verbose_name_plural = "Transactions"
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='transaction_created_at_id'),
+            models.Index(fields=['id'], condition=Q(payment_transaction_status='queued'), name='transaction_outbox'),
+            models.Index(
+                fields=['updated_at'], condition=Q(payment_transaction_status='dispatching'),
+                name='transaction_dispatching',
+            ),
+        ]
+
+
+class CallbackReceipt(models.Model):
+    CALLBACK_TYPE_CHOICES = [
+        ('stk', 'STK Push'),
+        ('b2c', 'B2C Result'),
+        ('b2b', 'B2B Result'),
+    ]
+
+    callback_type = models.CharField(max_length=10, choices=CALLBACK_TYPE_CHOICES)
+    correlation_id = models.CharField(max_length=100)
+    succeeded = models.BooleanField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.callback_type} callback {self.correlation_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['callback_type', 'correlation_id'], name='unique_callback_receipt'),
+        ]
+
+
+class CallbackInbox(models.Model):
+    """Raw Daraja callbacks, acknowledged on receipt and applied later by process_callbacks."""
+
+    callback_type = models.CharField(max_length=10, choices=CallbackReceipt.CALLBACK_TYPE_CHOICES)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Unapplied items are not picked up again before this time.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    outcome = models.CharField(max_length=20, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.callback_type} callback #{self.id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=Q(processed_at__isnull=True), name='callback_inbox_pending'),
+        ]
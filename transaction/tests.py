@@ -1,3 +1,387 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import balances
+from .daraja import DarajaAPI, DarajaTokenManager, get_session
+from .dispatch import drain_outbox, record_result
+from .fake_daraja import FakeDarajaAPI
+from .inbox import drain
+from .models import CallbackInbox, CallbackReceipt, Transaction
+
+
+class DarajaTokenManagerTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.manager = DarajaTokenManager('key', 'secret', 'https://daraja.test')
+
+    def _token_response(self, token='abc123', expires_in='3599'):
+        response = mock.Mock()
+        response.json.return_value = {'access_token': token, 'expires_in': expires_in}
+        response.raise_for_status.return_value = None
+        return response
+
+    def test_token_is_fetched_once_and_reused(self):
+        with mock.patch('transaction.daraja.requests.Session.get', return_value=self._token_response()) as get:
+            self.assertEqual(self.manager.get_token(), 'abc123')
+            self.assertEqual(self.manager.get_token(), 'abc123')
+            self.assertEqual(self.manager.get_token(), 'abc123')
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(self.manager.stats(), {'hits': 2, 'misses': 1, 'refreshes': 1, 'failures': 0})
+
+    def test_token_is_shared_between_managers(self):
+        other = DarajaTokenManager('key', 'secret', 'https://daraja.test')
+        with mock.patch('transaction.daraja.requests.Session.get', return_value=self._token_response()) as get:
+            self.manager.get_token()
+            self.assertEqual(other.get_token(), 'abc123')
+        self.assertEqual(get.call_count, 1)
+
+    def test_failed_refresh_is_not_cached(self):
+        with mock.patch('transaction.daraja.requests.Session.get', side_effect=Exception("down")):
+            self.assertIsNone(self.manager.get_token())
+        with mock.patch('transaction.daraja.requests.Session.get', return_value=self._token_response('fresh')):
+            self.assertEqual(self.manager.get_token(), 'fresh')
+        self.assertEqual(self.manager.stats()['failures'], 1)
+
+    def test_invalidate_forces_refresh(self):
+        with mock.patch('transaction.daraja.requests.Session.get', return_value=self._token_response()) as get:
+            self.manager.get_token()
+            self.manager.invalidate()
+            self.manager.get_token()
+        self.assertEqual(get.call_count, 2)
+
+
+class DarajaSessionTests(TestCase):
+
+    def test_clients_share_one_pooled_session(self):
+        self.assertIs(DarajaAPI().session, DarajaAPI().session)
+        self.assertIs(DarajaAPI().session, get_session())
+
+    def test_only_idempotent_requests_are_retried(self):
+        adapter = get_session().get_adapter('https://sandbox.safaricom.co.ke')
+        retry = adapter.max_retries
+        self.assertIn('GET', retry.allowed_methods)
+        self.assertNotIn('POST', retry.allowed_methods)
+
+    def test_unauthorized_response_drops_cached_token(self):
+        api = DarajaAPI()
+        response = mock.Mock(status_code=401)
+        response.json.return_value = {'errorCode': '404.001.03'}
+        with mock.patch.object(api.token_manager, 'get_token', return_value='stale'), \
+                mock.patch.object(api.token_manager, 'invalidate') as invalidate, \
+                mock.patch.object(api.session, 'post', return_value=response):
+            api.b2c_payment('254700000000', 100)
+        invalidate.assert_called_once()
+
+
+class PaymentOutboxTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_stk_push_view_queues_without_calling_daraja(self):
+        with mock.patch('transaction.daraja.DarajaAPI.stk_push') as stk_push:
+            response = self.client.post('/daraja/stk-push/', {
+                'phone_number': '254700000000',
+                'amount': '150.00',
+                'account_reference': 'SAV-1',
+                'transaction_desc': 'Savings',
+            }, format='json')
+        self.assertEqual(response.status_code, 202)
+        stk_push.assert_not_called()
+        trans = Transaction.objects.get(pk=response.data['transaction_id'])
+        self.assertEqual(trans.payment_transaction_status, 'queued')
+        self.assertEqual(trans.recipient_phone_number, '254700000000')
+
+    def test_drain_outbox_sends_every_queued_payment(self):
+        for i in range(5):
+            Transaction.objects.create(
+                transaction_type='C2B', account_type='savings', amount_transacted=Decimal('10.00'),
+                recipient_phone_number=f'25470000000{i}',
+                payment_transaction_status='queued',
+            )
+        Transaction.objects.create(
+            transaction_type='B2B', account_type='pension_contribution', amount_transacted=Decimal('5.00'),
+            paybill_number='600000',
+            payment_transaction_status='queued',
+        )
+        fake = FakeDarajaAPI()
+        counts = drain_outbox(fake, workers=4, batch_size=2)
+
+        self.assertEqual(counts['dispatched'], 6)
+        self.assertEqual(len(fake.calls), 6)
+        self.assertFalse(Transaction.objects.exclude(payment_transaction_status='processing').exists())
+        self.assertFalse(Transaction.objects.filter(checkout_request_id__isnull=True).exists())
+        self.assertEqual(drain_outbox(fake)['dispatched'], 0)
+
+    def test_results_are_recorded_as_calls_complete(self):
+        slow, fast = [
+            Transaction.objects.create(
+                transaction_type='B2C', account_type='loan_disbursement', amount_transacted=Decimal('10.00'),
+                recipient_phone_number=phone,
+                payment_transaction_status='queued',
+            )
+            for phone in ('254700000001', '254700000002')
+        ]
+        fast_recorded = threading.Event()
+
+        class SlowFirstDaraja(FakeDarajaAPI):
+            def b2c_payment(self, phone_number, amount):
+                if phone_number == slow.recipient_phone_number:
+                    fast_recorded.wait(timeout=5)
+                return super().b2c_payment(phone_number, amount)
+
+        recorded = []
+
+        def record(trans, response, reference):
+            record_result(trans, response, reference)
+            recorded.append(trans.pk)
+            if trans.pk == fast.pk:
+                fast_recorded.set()
+
+        with mock.patch('transaction.dispatch.record_result', side_effect=record):
+            drain_outbox(SlowFirstDaraja(), workers=2)
+        self.assertEqual(recorded, [fast.pk, slow.pk])
+
+    def test_failed_dispatch_marks_transaction_failed(self):
+        trans = Transaction.objects.create(
+            transaction_type='B2C', account_type='loan_disbursement', amount_transacted=Decimal('10.00'),
+            recipient_phone_number='254700000000',
+            payment_transaction_status='queued',
+        )
+        counts = drain_outbox(FakeDarajaAPI(fail=True))
+        trans.refresh_from_db()
+        self.assertEqual(counts['failed'], 1)
+        self.assertEqual(trans.payment_transaction_status, 'failed')
+        self.assertEqual(trans.dispatch_attempts, 1)
+
+    def test_transactions_api_cannot_queue_payments(self):
+        response = self.client.post('/api/transactions/', {
+            'transaction_type': 'B2C', 'account_type': 'loan_disbursement', 'amount_transacted': '10.00',
+            'payment_transaction_status': 'queued',
+        }, format='json')
+        self.assertEqual(response.status_code, 405)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_only_queued_rows_are_dispatched(self):
+        Transaction.objects.create(
+            transaction_type='C2B', account_type='savings', amount_transacted=Decimal('10.00'),
+        )
+        fake = FakeDarajaAPI()
+        self.assertEqual(drain_outbox(fake)['dispatched'], 0)
+        self.assertEqual(fake.calls, [])
+
+    def test_rejected_b2c_request_is_not_marked_processing(self):
+        trans = Transaction.objects.create(
+            transaction_type='B2C', account_type='loan_disbursement', amount_transacted=Decimal('10.00'),
+            recipient_phone_number='254700000000', payment_transaction_status='queued',
+        )
+
+        class RejectingDaraja(FakeDarajaAPI):
+            def b2c_payment(self, phone_number, amount):
+                return {'ConversationID': 'AG_rejected', 'ResponseCode': '1', 'ResponseDescription': 'Rejected'}
+
+        with self.assertLogs('transaction.dispatch', 'WARNING'):
+            counts = drain_outbox(RejectingDaraja())
+        trans.refresh_from_db()
+        self.assertEqual(counts['failed'], 1)
+        self.assertEqual(trans.payment_transaction_status, 'failed')
+
+    def test_stale_dispatching_rows_are_timed_out_not_resent(self):
+        trans = Transaction.objects.create(
+            transaction_type='B2C', account_type='loan_disbursement', amount_transacted=Decimal('10.00'),
+            payment_transaction_status='dispatching',
+        )
+        Transaction.objects.filter(pk=trans.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        fake = FakeDarajaAPI()
+        counts = drain_outbox(fake)
+        trans.refresh_from_db()
+        self.assertEqual(counts['timed_out'], 1)
+        self.assertEqual(trans.payment_transaction_status, 'timeout')
+        self.assertEqual(fake.calls, [])
+
+
+@override_settings(DARAJA_CALLBACK_MODE='inline')
+class CallbackIngestionTests(TestCase):
+
+    def setUp(self):
+        from savings.models import SavingsAccount, SavingsContribution
+        self.client = APIClient()
+        self.member = get_user_model().objects.create_user(
+            email='member@example.com', password='testpass123', phone_number='+254700000010'
+        )
+        self.saving = SavingsAccount.objects.create(member=self.member)
+        self.trans = Transaction.objects.create(
+            member=self.member, transaction_type='C2B', account_type='savings',
+            amount_transacted=Decimal('100.00'), payment_transaction_status='processing',
+            checkout_request_id='ws_CO_1',
+        )
+        SavingsContribution.objects.create(
+            member=self.member, saving=self.saving, contributed_amount=Decimal('100.00'),
+            transaction_id_c2b=self.trans,
+        )
+
+    def stk_payload(self, checkout_request_id='ws_CO_1', result_code=0):
+        return {'Body': {'stkCallback': {
+            'MerchantRequestID': 'm-1',
+            'CheckoutRequestID': checkout_request_id,
+            'ResultCode': result_code,
+            'ResultDesc': 'The service request is processed successfully.',
+        }}}
+
+    def test_redelivered_callback_is_a_no_op(self):
+        self.saving.refresh_from_db()
+        opening = self.saving.member_account_balance
+        for _ in range(3):
+            response = self.client.post('/daraja/callback/', self.stk_payload(), format='json')
+            self.assertEqual(response.json()['ResultCode'], 0)
+
+        self.saving.refresh_from_db()
+        self.trans.refresh_from_db()
+        self.assertEqual(self.trans.payment_transaction_status, 'success')
+        self.assertEqual(self.saving.member_account_balance, opening + Decimal('100.00'))
+        self.assertEqual(CallbackReceipt.objects.count(), 1)
+
+    def test_flat_legacy_payload_is_accepted(self):
+        payload = {'CheckoutRequestID': 'ws_CO_1', 'ResponseCode': '0'}
+        response = self.client.post('/daraja/callback/', payload, format='json')
+        self.assertEqual(response.json()['ResultCode'], 0)
+        self.trans.refresh_from_db()
+        self.assertEqual(self.trans.payment_transaction_status, 'success')
+
+    def test_unknown_id_does_not_settle_another_transaction(self):
+        other = Transaction.objects.create(
+            transaction_type='B2C', account_type='loan_disbursement', amount_transacted=Decimal('50.00'),
+            payment_transaction_status='processing', checkout_request_id='AG_known',
+        )
+        payload = {'Result': {'ConversationID': 'AG_unknown', 'ResultCode': 0}}
+        response = self.client.post('/daraja/b2c-callback/', payload, format='json')
+
+        self.assertEqual(response.json()['ResultCode'], 1)
+        other.refresh_from_db()
+        self.assertEqual(other.payment_transaction_status, 'processing')
+        self.assertFalse(CallbackReceipt.objects.exists())
+
+    def test_blank_checkout_ids_do_not_collide(self):
+        Transaction.objects.create(transaction_type='B2C', account_type='loan_disbursement',
+                                   amount_transacted=Decimal('1.00'), checkout_request_id='')
+        Transaction.objects.create(transaction_type='B2C', account_type='loan_disbursement',
+                                   amount_transacted=Decimal('1.00'), checkout_request_id='')
+        self.assertEqual(Transaction.objects.filter(checkout_request_id__isnull=True).count(), 2)
+
+
+@override_settings(DARAJA_CALLBACK_MODE='deferred')
+class CallbackInboxTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.trans = Transaction.objects.create(
+            transaction_type='B2C', account_type='loan_disbursement', amount_transacted=Decimal('50.00'),
+            payment_transaction_status='processing', checkout_request_id='AG_1',
+        )
+
+    def test_callback_is_acknowledged_without_touching_transaction(self):
+        payload = {'Result': {'ConversationID': 'AG_1', 'ResultCode': 0}}
+        response = self.client.post('/daraja/b2c-callback/', payload, format='json')
+
+        self.assertEqual(response.json(), {'ResultCode': 0, 'ResultDesc': 'Accepted'})
+        self.assertEqual(CallbackInbox.objects.get().payload, payload)
+        self.trans.refresh_from_db()
+        self.assertEqual(self.trans.payment_transaction_status, 'processing')
+
+    def test_drain_applies_and_dedupes_queued_callbacks(self):
+        payload = {'Result': {'ConversationID': 'AG_1', 'ResultCode': 0}}
+        self.client.post('/daraja/b2c-callback/', payload, format='json')
+        self.client.post('/daraja/b2c-callback/', payload, format='json')
+
+        processed, totals = drain()
+
+        self.assertEqual(processed, 2)
+        self.assertEqual(totals, {'settled': 1, 'duplicate': 1})
+        self.trans.refresh_from_db()
+        self.assertEqual(self.trans.payment_transaction_status, 'success')
+        self.assertFalse(CallbackInbox.objects.filter(processed_at__isnull=True).exists())
+
+    def test_unmatched_callback_stays_pending_for_retry(self):
+        payload = {'Result': {'ConversationID': 'AG_later', 'ResultCode': 0}}
+        self.client.post('/daraja/b2c-callback/', payload, format='json')
+        drain()
+        item = CallbackInbox.objects.get()
+        self.assertIsNone(item.processed_at)
+        self.assertEqual(item.attempts, 1)
+        self.assertGreater(item.next_attempt_at, timezone.now())
+        drain()
+        item.refresh_from_db()
+        self.assertEqual(item.attempts, 1)
+
+        CallbackInbox.objects.update(next_attempt_at=timezone.now())
+        Transaction.objects.create(
+            transaction_type='B2C', account_type='loan_disbursement', amount_transacted=Decimal('10.00'),
+            payment_transaction_status='processing', checkout_request_id='AG_later',
+        )
+        drain()
+        item.refresh_from_db()
+        self.assertEqual(item.outcome, 'settled')
+        self.assertIsNotNone(item.processed_at)
+
+
+    @override_settings(CALLBACK_INBOX_MAX_ATTEMPTS=2)
+    def test_unmatched_callback_is_kept_for_the_retry_window_not_an_attempt_count(self):
+        payload = {'Result': {'ConversationID': 'AG_slow', 'ResultCode': 0}}
+        self.client.post('/daraja/b2c-callback/', payload, format='json')
+        for _ in range(5):
+            CallbackInbox.objects.update(next_attempt_at=timezone.now())
+            drain()
+        item = CallbackInbox.objects.get()
+        self.assertEqual((item.attempts, item.processed_at), (5, None))
+
+        CallbackInbox.objects.update(
+            next_attempt_at=timezone.now(), received_at=timezone.now() - timedelta(hours=1),
+        )
+        drain()
+        item.refresh_from_db()
+        self.assertEqual(item.outcome, 'not_found')
+        self.assertIsNotNone(item.processed_at)
+
+
+class BalanceServiceTests(TestCase):
+
+    def setUp(self):
+        from savings.models import SavingsAccount
+        User = get_user_model()
+        self.member = User.objects.create_user(email='a@example.com', password='pw', phone_number='+254700000020')
+        self.other = User.objects.create_user(email='b@example.com', password='pw', phone_number='+254700000021')
+        self.saving = SavingsAccount.objects.create(member=self.member, member_account_balance=Decimal('1000.00'))
+
+    def test_credit_savings_adds_in_database(self):
+        stale = type(self.saving).objects.get(pk=self.saving.pk)
+        balances.credit_savings(self.saving.pk, Decimal('25.50'))
+        balances.credit_savings(self.saving.pk, Decimal('4.50'))
+        stale.refresh_from_db()
+        self.assertEqual(stale.member_account_balance, Decimal('1030.00'))
+
+    def test_credit_pensions_creates_missing_accounts(self):
+        from pension.models import PensionAccount
+        PensionAccount.objects.create(member=self.member, total_pension_amount=Decimal('10.00'))
+        balances.credit_pensions({self.member.pk: Decimal('5.00'), self.other.pk: Decimal('7.25')})
+        totals = dict(PensionAccount.objects.values_list('member_id', 'total_pension_amount'))
+        self.assertEqual(totals, {self.member.pk: Decimal('15.00'), self.other.pk: Decimal('7.25')})
+
+    def test_loan_is_completed_when_fully_repaid(self):
+        from loans.models import LoanAccount
+        loan = LoanAccount.objects.create(
+            member=self.member, requested_amount=Decimal('1200.00'), timeline_months=12,
+            interest_rate=Decimal('5.00'), loan_status='DISBURSED',
+        )
+        self.assertEqual(balances.apply_loan_repayment(loan.pk, Decimal('600.00')).loan_status, 'DISBURSED')
+        loan = balances.apply_loan_repayment(loan.pk, Decimal('660.00'))
+        self.assertEqual(loan.total_loan_repaid, Decimal('1260.00'))
+        self.assertEqual(loan.loan_status, 'COMPLETED')
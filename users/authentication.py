@@ -0,0 +1,81 @@
+"""
+Token authentication with expiring tokens and the token-to-user lookup
+cached in the shared cache, so every worker that shares the cache skips the
+token and user queries for AUTH_TOKEN_CACHE_SECONDS after the first request
+with a token. Entries are keyed on a digest of the token rather than the
+token itself.
+
+Tokens expire AUTH_TOKEN_TTL_HOURS after they are issued. Issue, rotate and
+revoke them with the functions below, which drop the cached entry; a change
+to the user, such as deactivation, is picked up once the entry expires.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from malipoflex.cache import Namespace
+
+token_cache = Namespace('auth_token')
+
+
+def cache_key(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def expires_at(token):
+    return token.created + timedelta(hours=settings.AUTH_TOKEN_TTL_HOURS)
+
+
+def is_expired(token, now=None):
+    return expires_at(token) <= (now or timezone.now())
+
+
+def revoke_token(user):
+    for key in Token.objects.filter(user=user).values_list('key', flat=True):
+        token_cache.delete(cache_key(key))
+    Token.objects.filter(user=user).delete()
+
+
+def rotate_token(user):
+    """Replace the user's token with a new one."""
+    with transaction.atomic():
+        revoke_token(user)
+        return Token.objects.create(user=user)
+
+
+def issue_token(user):
+    """The user's current token, or a new one if it is missing or has expired."""
+    token = Token.objects.filter(user=user).first()
+    if token is None or is_expired(token):
+        token = rotate_token(user)
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        now = timezone.now()
+        cached = token_cache.get(cache_key(key))
+        if cached is None:
+            try:
+                token = Token.objects.select_related('user').get(key=key)
+            except Token.DoesNotExist:
+                raise AuthenticationFailed('Invalid token.')
+            cached = (token.user, expires_at(token))
+            ttl = min(settings.AUTH_TOKEN_CACHE_SECONDS, (cached[1] - now).total_seconds())
+            if ttl > 0:
+                token_cache.set(cache_key(key), cached, timeout=ttl)
+
+        user, expiry = cached
+        if expiry <= now:
+            token_cache.delete(cache_key(key))
+            raise AuthenticationFailed('Token has expired.')
+        if not user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        return (user, Token(key=key, user=user))
@@ -0,0 +1,16 @@
+"""
+PBKDF2 with the iteration count taken from PASSWORD_HASH_ITERATIONS, so the
+cost of a login can be tuned per deployment. It keeps the pbkdf2_sha256
+algorithm name: a stored hash with a different iteration count still
+verifies, and Django rehashes it with the configured count on the user's
+next successful login.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
@@ -51,6 +51,11 @@ class User(AbstractUser):
     USERNAME_FIELD = 'phone_number'
     REQUIRED_FIELDS = ['first_name','last_name','password','email']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='user_created_at_id'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.user_type})"
 
@@ -1,3 +1,129 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .authentication import rotate_token
+from .models import User
+from .throttling import LoginIPThrottle
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='member@example.com', password='pw', phone_number='+254792000000', user_type='member',
+        )
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post('/api/api/login/', {'phone_number': self.user.phone_number, 'password': 'pw'})
+        self.assertEqual(response.status_code, 200)
+        return response.data['token']
+
+    def profile(self, key):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        return self.client.get('/api/api/profile/')
+
+    def test_lookup_is_cached_after_the_first_request(self):
+        key = self.login()
+        self.assertEqual(self.login(), key)
+        self.assertEqual(self.profile(key).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.profile(key)
+        self.assertEqual(response.data['phone_number'], self.user.phone_number)
+        self.assertEqual(len(queries), 0)
+
+    def test_expired_tokens_are_rejected_and_replaced_at_login(self):
+        key = self.login()
+        Token.objects.filter(key=key).update(created=Token.objects.get().created - timedelta(days=8))
+        self.assertEqual(self.profile(key).status_code, 401)
+        fresh = self.login()
+        self.assertNotEqual(fresh, key)
+        self.assertEqual(self.profile(fresh).status_code, 200)
+
+    def test_rotation_and_logout_drop_the_cached_entry(self):
+        key = self.login()
+        self.assertEqual(self.profile(key).status_code, 200)
+        rotated = rotate_token(self.user).key
+        self.assertEqual(self.profile(key).status_code, 401)
+
+        self.assertEqual(self.profile(rotated).status_code, 200)
+        self.assertEqual(self.client.post('/api/api/logout/').status_code, 204)
+        self.assertEqual(self.profile(rotated).status_code, 401)
+        self.assertFalse(Token.objects.exists())
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='burst@example.com', password='pw', phone_number='+254793000000', user_type='member',
+        )
+        self.client = APIClient()
+
+    def login(self, password, phone_number=None):
+        return self.client.post('/api/api/login/', {
+            'phone_number': phone_number or self.user.phone_number, 'password': password,
+        })
+
+    def test_phone_is_throttled_before_hashing(self):
+        for _ in range(5):
+            self.assertEqual(self.login('wrong').status_code, 400)
+        with CaptureQueriesContext(connection) as queries, mock.patch('api.serializers.authenticate') as authenticate:
+            response = self.login('pw')
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(authenticate.called)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(self.login('pw', phone_number='+254793000001').status_code, 400)
+
+    def test_ip_is_throttled_across_phones(self):
+        with mock.patch.object(LoginIPThrottle, 'rate', '2/min', create=True):
+            self.assertEqual(self.login('wrong', phone_number='+254793000001').status_code, 400)
+            self.assertEqual(self.login('wrong', phone_number='+254793000002').status_code, 400)
+            self.assertEqual(self.login('pw').status_code, 429)
+
+    def login_via_proxy(self, phone_number, forwarded_for):
+        return self.client.post('/api/api/login/', {
+            'phone_number': phone_number, 'password': 'wrong',
+        }, HTTP_X_FORWARDED_FOR=forwarded_for)
+
+    def test_spoofed_forwarded_for_is_still_throttled(self):
+        # Behind the deployment's one proxy only the entry it appended counts.
+        with mock.patch.object(LoginIPThrottle, 'rate', '2/min', create=True):
+            for i in range(3):
+                response = self.login_via_proxy(f'+25479300001{i}', f'198.51.100.{i}, 203.0.113.7')
+        self.assertEqual(response.status_code, 429)
+
+    def test_clients_behind_the_proxy_are_throttled_apart(self):
+        with mock.patch.object(LoginIPThrottle, 'rate', '2/min', create=True):
+            for i in range(3):
+                response = self.login_via_proxy(f'+25479300001{i}', f'203.0.113.{i}')
+                self.assertEqual(response.status_code, 400)
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        rest_framework = {**settings.REST_FRAMEWORK, 'NUM_PROXIES': 0}
+        with override_settings(REST_FRAMEWORK=rest_framework), \
+                mock.patch.object(LoginIPThrottle, 'rate', '2/min', create=True):
+            for i in range(3):
+                response = self.login_via_proxy(f'+25479300001{i}', f'198.51.100.{i}')
+        self.assertEqual(response.status_code, 429)
+
+    def test_login_rehashes_to_the_tuned_cost_and_records_latency(self):
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.user.set_password('pw')
+            self.user.save()
+        with self.assertLogs('users.login', 'INFO') as logs:
+            self.assertEqual(self.login('pw').status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertRegex(logs.output[0], r'Login succeeded in [\d.]+ms')
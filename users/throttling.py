@@ -0,0 +1,27 @@
+"""
+Login rate limits, checked by DRF before the view runs and so before any
+password is hashed. Counters live in the default cache, so every worker
+sharing it enforces the same limits. Rates are DEFAULT_THROTTLE_RATES
+entries, set from LOGIN_RATE_PER_IP and LOGIN_RATE_PER_PHONE.
+"""
+import hashlib
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginIPThrottle(SimpleRateThrottle):
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginPhoneThrottle(SimpleRateThrottle):
+    scope = 'login_phone'
+
+    def get_cache_key(self, request, view):
+        phone_number = str(request.data.get('phone_number', '')).strip()
+        if not phone_number:
+            return None
+        ident = hashlib.sha256(phone_number.encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}